@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Analysis Cache
+A bounded, thread-safe LRU cache for per-text NLP results shared by chatbot instances.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+_MISSING = object()
+
+# Result kinds whose computation ignores letter case can share a lowercased key
+CASE_INSENSITIVE_KINDS = {'intent', 'emotions'}
+
+
+def normalize_text(text: str, lowercase: bool = False) -> str:
+    """Collapse whitespace (and optionally case) so equivalent inputs share a cache key."""
+    text = _WHITESPACE.sub(' ', text.strip())
+    return text.lower() if lowercase else text
+
+
+def estimate_size(value: Any) -> int:
+    """Rough memory footprint of a cached value, including container contents."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+class AnalysisCache:
+    """
+    LRU cache of analysis results keyed on (namespace, kind, normalized text).
+
+    Bounded both by entry count and by an estimate of stored bytes; the least
+    recently used entries are evicted first. All operations hold a lock, so a
+    single cache can be shared by every bot instance and thread in a process.
+    Cached values must be immutable (tuples, strings, numbers).
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, namespace: str, kind: str, text: str) -> Tuple[str, str, str]:
+        return (namespace, kind, normalize_text(text, lowercase=kind in CASE_INSENSITIVE_KINDS))
+
+    def lookup(self, namespace: str, kind: str, text: str, default: Any = None) -> Any:
+        """Return the cached result for text, or default on a miss."""
+        key = self._key(namespace, kind, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def store(self, namespace: str, kind: str, text: str, value: Any):
+        """Store the result for text, evicting least recently used entries as needed."""
+        if self.max_entries <= 0:
+            return
+        key = self._key(namespace, kind, text)
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes_used += size
+            while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, namespace: str, kind: str, text: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for text, computing and storing it on a miss."""
+        value = self.lookup(namespace, kind, text, _MISSING)
+        if value is _MISSING:
+            # Computed outside the lock; a racing duplicate computation is harmless
+            value = compute()
+            self.store(namespace, kind, text, value)
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes_used,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> AnalysisCache:
+    """
+    Get the process-wide cache used by bots that are not given their own.
+
+    Its limits come from CHATBOT_CACHE_ENTRIES and CHATBOT_CACHE_BYTES.
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = AnalysisCache(
+                    max_entries=int(os.environ.get('CHATBOT_CACHE_ENTRIES', 10000)),
+                    max_bytes=int(os.environ.get('CHATBOT_CACHE_BYTES', 16 * 1024 * 1024))
+                )
+    return _shared_cache
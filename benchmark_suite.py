@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Measures get_response and the NLP analysis stages of all three chatbots.
+
+Each case runs a seeded message corpus through one bot method and reports
+ops/sec, p50/p99 latency and peak traced memory. Results can be saved as
+JSON and compared against a saved baseline; any regression beyond the
+tolerance exits with status 1.
+
+    python3 benchmark_suite.py --json baseline.json
+    python3 benchmark_suite.py --baseline baseline.json
+    python3 benchmark_suite.py --no-nltk --only nlp
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import nlp_chatbot
+import nlp_pool
+from analysis_cache import AnalysisCache
+from enhanced_chatbot import EnhancedChatBot
+from intent_matcher import IntentMatcher
+from message_corpus import TOPICS, distinct_corpus, realistic_corpus, synthetic_corpus, synthetic_intents
+from simple_chatbot import SimpleChatBot
+
+DEFAULT_SIZE = 2000
+DEFAULT_HISTORY = 5000
+DEFAULT_TOLERANCE = 0.25
+
+
+def _cascade(patterns: Dict[str, Any]) -> Callable[[str], Any]:
+    """The plain first-match loop IntentMatcher replaces, as a reference."""
+    compiled = [(intent, re.compile(pattern, re.IGNORECASE)) for intent, spec in patterns.items()
+                for pattern in ([spec] if isinstance(spec, str) else spec)]
+
+    def match(text: str):
+        for intent, pattern in compiled:
+            found = pattern.search(text)
+            if found:
+                return intent, found
+        return None
+    return match
+
+
+def _enhanced_with_history(turns: int, seed: int) -> EnhancedChatBot:
+    """An enhanced bot whose memory already holds `turns` past messages."""
+    bot = EnhancedChatBot(seed=seed)
+    for message in realistic_corpus(turns // 2, seed) + synthetic_corpus(turns - turns // 2, seed):
+        bot.add_to_history(message, "ok")
+    return bot
+
+
+def _nlp_bot(seed: int) -> nlp_chatbot.NLPChatBot:
+    # A private cache so every case starts cold and runs don't influence each other
+    return nlp_chatbot.NLPChatBot(cache=AnalysisCache(), seed=seed)
+
+
+def build_cases(history: int, seed: int) -> Dict[str, Tuple[Callable[[], Callable[[str], Any]], str]]:
+    """Benchmark cases: name -> (setup returning the callable to time, corpus name).
+
+    Every setup builds fresh bots seeded with seed, so each pass makes the same response choices.
+    """
+    return {
+        'simple.get_response': (lambda: SimpleChatBot(seed=seed).get_response, 'realistic'),
+        'simple.get_response[synthetic]': (lambda: SimpleChatBot(seed=seed).get_response, 'synthetic'),
+        'enhanced.get_response': (lambda: EnhancedChatBot(seed=seed).get_response, 'realistic'),
+        'enhanced.get_response[long_history]': (
+            lambda: _enhanced_with_history(history, seed).get_response, 'memory'),
+        'enhanced.search_context[long_history]': (
+            lambda: _enhanced_with_history(history, seed).search_context, 'memory'),
+        'nlp.get_response': (lambda: _nlp_bot(seed).get_response, 'realistic'),
+        'nlp.get_response[synthetic]': (lambda: _nlp_bot(seed).get_response, 'synthetic'),
+        'nlp.extract_keywords': (lambda: _nlp_bot(seed).extract_keywords, 'synthetic'),
+        # Every message new, so the scorer runs each time; [cached] repeats texts like real chats do
+        'nlp.analyze_sentiment': (lambda: _nlp_bot(seed).analyze_sentiment, 'distinct'),
+        'nlp.analyze_sentiment[cached]': (lambda: _nlp_bot(seed).analyze_sentiment, 'realistic'),
+        # Keyword-dispatched matching against the first-match cascade, on a real and on large tables
+        'intent.match[8]': (lambda: IntentMatcher(nlp_chatbot.INTENT_PATTERNS).match, 'realistic'),
+        'intent.cascade[8]': (lambda: _cascade(nlp_chatbot.INTENT_PATTERNS), 'realistic'),
+        'intent.match[200]': (lambda: IntentMatcher(synthetic_intents(200, seed)).match, 'synthetic'),
+        'intent.cascade[200]': (lambda: _cascade(synthetic_intents(200, seed)), 'synthetic'),
+        'intent.match[500]': (lambda: IntentMatcher(synthetic_intents(500, seed)).match, 'synthetic'),
+        'intent.cascade[500]': (lambda: _cascade(synthetic_intents(500, seed)), 'synthetic'),
+        # Session creation, which must not rebuild the shared NLP components
+        'nlp.new_session': (lambda: lambda message: nlp_chatbot.NLPChatBot(seed=seed), 'realistic'),
+    }
+
+
+def build_corpora(size: int, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    return {
+        'realistic': realistic_corpus(size, seed),
+        'synthetic': synthetic_corpus(size, seed),
+        'distinct': distinct_corpus(size, seed),
+        # Memory queries always take the search_context path
+        'memory': [f"Do you remember what I said about {rng.choice(TOPICS)}?" for _ in range(size)]
+    }
+
+
+def _percentile(ordered: array, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_case(setup: Callable[[], Callable[[str], Any]], messages: List[str]) -> Dict[str, float]:
+    """Time each call separately and summarize throughput and latency."""
+    call = setup()
+    for message in messages[:min(100, len(messages))]:
+        call(message)  # warm caches and lazy imports
+
+    call = setup()
+    timings = array('d')
+    clock = time.perf_counter
+    gc.collect()
+    for message in messages:
+        start = clock()
+        call(message)
+        timings.append(clock() - start)
+
+    total = sum(timings)
+    ordered = array('d', sorted(timings))
+    return {
+        'ops': len(timings),
+        'ops_per_sec': round(len(timings) / total, 1) if total else 0.0,
+        'mean_us': round(total / len(timings) * 1e6, 2),
+        'p50_us': round(_percentile(ordered, 0.50) * 1e6, 2),
+        'p99_us': round(_percentile(ordered, 0.99) * 1e6, 2)
+    }
+
+
+def trace_case(setup: Callable[[], Callable[[str], Any]], messages: List[str]) -> float:
+    """Peak traced memory (KiB) of building the case and running it, in a separate pass."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        call = setup()
+        for message in messages:
+            call(message)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round((peak - baseline) / 1024, 1)
+
+
+def run_suite(size: int = DEFAULT_SIZE, history: int = DEFAULT_HISTORY, seed: int = 0,
+              patterns: List[str] = None) -> Dict[str, Any]:
+    """Run every selected case and return the results document."""
+    corpora = build_corpora(size, seed)
+    cases = build_cases(history, seed)
+    if patterns:
+        cases = {name: case for name, case in cases.items()
+                 if any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in patterns)}
+
+    probe = nlp_chatbot.NLPChatBot(cache=AnalysisCache(), lazy=True)
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'nltk_available': nlp_pool.NLTK_AVAILABLE,
+            'nlp_enabled': probe.nlp_enabled,
+            'size': size,
+            'history': history,
+            'seed': seed
+        },
+        'cases': {}
+    }
+    for name, (setup, corpus) in cases.items():
+        stats = time_case(setup, corpora[corpus])
+        stats['peak_kib'] = trace_case(setup, corpora[corpus])
+        stats['corpus'] = corpus
+        results['cases'][name] = stats
+        print(f"  {name:<40} {stats['ops_per_sec']:>11,.0f} ops/s   p50 {stats['p50_us']:>9.1f} µs   "
+              f"p99 {stats['p99_us']:>9.1f} µs   peak {stats['peak_kib']:>9,.1f} KiB")
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every case that is slower or hungrier than the baseline by more than tolerance."""
+    regressions = []
+    for name, stats in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        if stats['ops_per_sec'] < before['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {stats['ops_per_sec']:,.0f} ops/s vs {before['ops_per_sec']:,.0f} baseline")
+        if stats['p99_us'] > before['p99_us'] * (1 + tolerance) * 2:
+            # p99 is noisy, so it only fails at twice the tolerance
+            regressions.append(f"{name}: p99 {stats['p99_us']:.1f} µs vs {before['p99_us']:.1f} µs baseline")
+        if stats['peak_kib'] > before['peak_kib'] * (1 + tolerance) + 64:
+            regressions.append(f"{name}: peak {stats['peak_kib']:,.1f} KiB vs {before['peak_kib']:,.1f} KiB baseline")
+    return regressions
+
+
+def main():
+    """Run the suite, optionally save results and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the chatbots' response and analysis paths.")
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help=f"messages per case (default: {DEFAULT_SIZE})")
+    parser.add_argument('--history', type=int, default=DEFAULT_HISTORY,
+                        help=f"turns of history for the long-history cases (default: {DEFAULT_HISTORY})")
+    parser.add_argument('--seed', type=int, default=0, help="corpus and response seed (default: 0)")
+    parser.add_argument('--only', action='append', metavar='PATTERN', help="run only cases whose name contains PATTERN")
+    parser.add_argument('--no-nltk', action='store_true', help="run as if nltk were not installed")
+    parser.add_argument('--json', metavar='FILE', help="write the results to FILE as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against results saved with --json")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown before a case fails (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    if args.no_nltk:
+        # Same code paths as an install without the optional library
+        nlp_pool.NLTK_AVAILABLE = False
+
+    print(f"⏱️  Chatbot benchmark ({args.size:,} messages per case, seed {args.seed})")
+    print("=" * 100)
+    results = run_suite(args.size, args.history, args.seed, args.only)
+    print(f"NLP {'enabled' if results['meta']['nlp_enabled'] else 'disabled (fallback paths)'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('nlp_enabled') != results['meta']['nlp_enabled']:
+            print("⚠️  Baseline was recorded with a different NLP setup; NLP cases are not comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
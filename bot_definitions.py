@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Bot Definitions
+Read-only response and pattern tables, built once per process and shared by every bot instance.
+
+Each bot module declares its default tables; get_definition() freezes them
+(dicts become mappingproxies, lists become tuples), compiles the patterns
+and builds the IntentMatcher the first time a bot of that type is created.
+Every later instance only holds references, so creating a session costs no
+table construction and the tables can be shared safely between threads.
+
+A JSON file named by CHATBOT_DEFINITIONS can override the defaults:
+
+    {"enhanced": {"name": "Max",
+                  "responses": {"goodbye": ["See you{name}!"]},
+                  "patterns": {"weather": "\\\\b(weather|forecast)\\\\b"}}}
+
+Response categories given in the file replace the defaults; patterns for
+existing intents are replaced in place (keeping their priority) and new
+intents are tried after the built-in ones. "{bot_name}" in a template is
+replaced by the bot's name.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
+
+from intent_matcher import IntentMatcher, PatternSpec
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _fill_bot_name(value: Any, name: str) -> Any:
+    if isinstance(value, str):
+        return value.replace('{bot_name}', name)
+    if isinstance(value, Mapping):
+        return {key: _fill_bot_name(item, name) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fill_bot_name(item, name) for item in value]
+    return value
+
+
+def _compile(spec: PatternSpec, flags: int):
+    if isinstance(spec, re.Pattern):
+        return spec
+    if isinstance(spec, str):
+        return re.compile(spec, flags)
+    return tuple(_compile(pattern, flags) for pattern in spec)
+
+
+class BotDefinition:
+    """The shared, read-only tables behind one bot type."""
+
+    __slots__ = ('bot_type', 'name', 'responses', 'patterns', 'matcher')
+
+    def __init__(self, bot_type: str, name: str, responses: Dict[str, Any],
+                 patterns: Dict[str, PatternSpec], flags: int = re.IGNORECASE):
+        self.bot_type = bot_type
+        self.name = name
+        self.responses = freeze(_fill_bot_name(responses, name))
+        compiled = {intent: _compile(spec, flags) for intent, spec in patterns.items()}
+        self.patterns = MappingProxyType(compiled)
+        self.matcher = IntentMatcher(compiled, flags)
+
+
+def session_rng(seed: int = None) -> random.Random:
+    """
+    A response generator for one session.
+
+    Unseeded sessions are seeded from the shared module generator, which is
+    about twice as fast as letting Random() read os.urandom.
+    """
+    return random.Random(random.getrandbits(64) if seed is None else seed)
+
+
+def load_overrides(path: str = None) -> Dict[str, Dict[str, Any]]:
+    """Read the CHATBOT_DEFINITIONS file (or path); no file means no overrides."""
+    path = path or os.environ.get('CHATBOT_DEFINITIONS')
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path}: expected an object keyed by bot type")
+    return overrides
+
+
+_definitions: Dict[str, BotDefinition] = {}
+_definitions_lock = threading.Lock()
+
+
+def get_definition(bot_type: str, name: str, responses: Dict[str, Any],
+                   patterns: Dict[str, PatternSpec]) -> BotDefinition:
+    """
+    Return the process-wide definition for bot_type, building it on first use.
+
+    name, responses and patterns are the module's defaults; overrides from
+    the CHATBOT_DEFINITIONS file are applied on top of them.
+    """
+    definition = _definitions.get(bot_type)
+    if definition is None:
+        with _definitions_lock:
+            definition = _definitions.get(bot_type)
+            if definition is None:
+                override = load_overrides().get(bot_type, {})
+                definition = BotDefinition(
+                    bot_type,
+                    override.get('name', name),
+                    {**responses, **override.get('responses', {})},
+                    {**patterns, **override.get('patterns', {})}
+                )
+                _definitions[bot_type] = definition
+    return definition
+
+
+def reset_definitions():
+    """Forget the built definitions, e.g. after changing CHATBOT_DEFINITIONS."""
+    with _definitions_lock:
+        _definitions.clear()
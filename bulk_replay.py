@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Bulk Replay
+Stream a large file of logged user messages through a chatbot across all cores.
+
+Input is either JSONL (one object per line with a "message", "user" or
+"text" field and an optional "conversation", "conversation_id" or
+"session_id") or plain text (one message per line, conversations separated
+by blank lines). JSONL lines without a conversation id are replayed as
+one-message conversations, and transcript lines other than turns are skipped.
+
+The file is memory-mapped and processed in two parallel passes:
+  1. index:  workers scan newline-aligned byte ranges and record, per shard,
+             the offset and conversation hash of every message
+  2. replay: each shard (a fixed subset of conversations) is replayed in one
+             worker with a fresh bot state per conversation, and results are
+             streamed to a part file that is appended to the output at the end
+Responses are seeded per conversation, so a replay is reproducible for a
+given --seed regardless of the number of workers.
+
+Results are grouped by conversation, with turns in order, but conversations
+come out in shard order (by hash), not in input order. Each result carries
+its "conversation" (the id, or the line offset for id-less ones) and "turn",
+so sort on those when the input order matters.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from intent_matcher import GENERAL_INTENT
+
+MESSAGE_FIELDS = ('message', 'user', 'text')
+CONVERSATION_FIELDS = ('conversation', 'conversation_id', 'session_id', 'session')
+
+# Index chunks are at least this large so small files don't fan out needlessly
+MIN_CHUNK_BYTES = 1 << 20
+SHARDS_PER_WORKER = 4
+OFFSET_MASK = (1 << 64) - 1
+
+
+def _hash_key(value: Any) -> int:
+    """
+    Stable 64-bit hash of a conversation id (the built-in hash() is salted per process).
+
+    Ids are hashed as JSON, so 1, "1" and true stay different conversations.
+    """
+    data = value if isinstance(value, bytes) else json.dumps(
+        value, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _position_key(position: int) -> int:
+    """Key of a conversation without an id, named by the offset of its first line; never equal to an id's."""
+    return _hash_key(b'\x00@%d' % position)
+
+
+def _parse_record(line: bytes) -> Tuple[Optional[str], Any]:
+    """(message, conversation id) of a JSONL line; message is None for lines to skip."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None
+    if not isinstance(record, dict) or record.get('type', 'turn') != 'turn':
+        return None, None
+    message = next((record[field] for field in MESSAGE_FIELDS if field in record), None)
+    if not isinstance(message, str):
+        return None, None
+    conversation = next((record[field] for field in CONVERSATION_FIELDS if field in record), None)
+    return message, conversation
+
+
+def _open_map(f) -> Optional[mmap.mmap]:
+    size = os.fstat(f.fileno()).st_size
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+
+def split_ranges(path: str, text_format: bool, chunks: int) -> List[Tuple[int, int]]:
+    """
+    Cut the file into about `chunks` byte ranges that no record straddles.
+
+    JSONL ranges end on a line break; text ranges end on a blank line, so a
+    conversation never spans two ranges.
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return []
+    step = max(MIN_CHUNK_BYTES, -(-size // max(1, chunks)))
+    separator = b'\n\n' if text_format else b'\n'
+    ranges = []
+    with open(path, 'rb') as f:
+        mm = _open_map(f)
+        try:
+            start = 0
+            while start < size:
+                cut = mm.find(separator, min(start + step, size) - 1)
+                end = size if cut == -1 else cut + len(separator)
+                ranges.append((start, end))
+                start = end
+        finally:
+            mm.close()
+    return ranges
+
+
+def index_range(path: str, text_format: bool, start: int, end: int,
+                shards: int) -> Tuple[List[array], List[array], int]:
+    """
+    Pass 1: find every message in [start, end) and assign it to a shard.
+
+    Returns per-shard arrays of conversation keys and line offsets, plus the
+    number of non-blank lines that were skipped.
+    """
+    keys = [array('Q') for _ in range(shards)]
+    offsets = [array('Q') for _ in range(shards)]
+    skipped = 0
+    with open(path, 'rb') as f:
+        mm = _open_map(f)
+        try:
+            position = start
+            paragraph = None
+            while position < end:
+                newline = mm.find(b'\n', position, end)
+                if newline == -1:
+                    newline = end
+                line = mm[position:newline]
+                if not line.strip():
+                    paragraph = None
+                    position = newline + 1
+                    continue
+                if text_format:
+                    if paragraph is None:
+                        paragraph = _position_key(position)
+                    key = paragraph
+                else:
+                    message, conversation = _parse_record(line)
+                    if message is None:
+                        skipped += 1
+                        position = newline + 1
+                        continue
+                    key = _hash_key(conversation) if conversation is not None else _position_key(position)
+                shard = key % shards
+                keys[shard].append(key)
+                offsets[shard].append(position)
+                position = newline + 1
+        finally:
+            mm.close()
+    return keys, offsets, skipped
+
+
+def _replay_turn(bot, message: str) -> Tuple[str, str, Optional[str]]:
+    """Run one turn and return (response, intent, sentiment)."""
+    if hasattr(bot, 'analyze'):
+        analysis = bot.analyze(message)
+        response = bot.get_response(message, analysis)
+        bot.add_to_history(message, response, analysis=analysis)
+        return response, analysis.intent, analysis.sentiment[0]
+    # The same match picks the response and is reported, so the two cannot disagree
+    match = bot.match_intent(message)
+    response = bot.get_response(message, match)
+    if hasattr(bot, 'add_to_history'):
+        bot.add_to_history(message, response)
+    return response, match.intent if match else GENERAL_INTENT, None
+
+
+def replay_shard(path: str, text_format: bool, bot_type: str, keys: array, offsets: array,
+                 output_path: str, seed: int) -> Dict[str, Any]:
+    """
+    Pass 2: replay one shard's conversations and stream the results to output_path.
+
+    Messages are ordered by (conversation, file position), so only one
+    conversation's state is alive at a time. One bot is built per worker and
+    reset between conversations, keeping NLP models and caches warm.
+    """
+    from chat_server import BOT_CLASSES
+    from session_store import SessionState
+
+    bot = BOT_CLASSES[bot_type]()
+    # Pack (key, offset) into one int: sorting plain ints is much cheaper than tuples
+    order = sorted((key << 64) | offset for key, offset in zip(keys, offsets))
+    intents = Counter()
+    conversations = 0
+    current = None
+    started = time.perf_counter()
+
+    with open(path, 'rb') as f, open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as out:
+        mm = _open_map(f)
+        try:
+            for packed in order:
+                key, position = packed >> 64, packed & OFFSET_MASK
+                newline = mm.find(b'\n', position)
+                line = mm[position:newline if newline != -1 else len(mm)]
+                if text_format:
+                    message, conversation = line.decode('utf-8', 'replace').strip(), None
+                else:
+                    message, conversation = _parse_record(line)
+                if key != current:
+                    current = key
+                    conversation_id = conversation if conversation is not None else position
+                    bot.load_state(SessionState(bot_type))
+                    bot.rng.seed(f"{seed}:{conversation_id}")
+                    conversations += 1
+                    turn = 0
+                response, intent, sentiment = _replay_turn(bot, message)
+                intents[intent] += 1
+                result = {
+                    'conversation': conversation_id,
+                    'turn': turn,
+                    'message': message,
+                    'response': response,
+                    'intent': intent
+                }
+                if sentiment is not None:
+                    result['sentiment'] = sentiment
+                out.write(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+                out.write('\n')
+                turn += 1
+        finally:
+            if mm is not None:
+                mm.close()
+
+    return {
+        'messages': len(order),
+        'conversations': conversations,
+        'intents': dict(intents),
+        'seconds': time.perf_counter() - started
+    }
+
+
+def replay_file(path: str, output, bot_type: str = 'simple', workers: int = None,
+                text_format: bool = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Replay every message in path, write JSONL results to the output stream and return a summary.
+
+    Each conversation's results are contiguous and in turn order; the
+    conversations themselves follow shard order, not the order of the input.
+    """
+    workers = workers or os.cpu_count() or 1
+    if text_format is None:
+        text_format = not path.endswith(('.jsonl', '.json', '.ndjson'))
+    shards = workers * SHARDS_PER_WORKER
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ranges = split_ranges(path, text_format, shards)
+        indexed = list(pool.map(index_range, *zip(*[
+            (path, text_format, start, end, shards) for start, end in ranges
+        ]))) if ranges else []
+        indexed_at = time.perf_counter()
+
+        with tempfile.TemporaryDirectory(prefix='bulk-replay-') as parts_dir:
+            futures = []
+            for shard in range(shards):
+                keys, offsets = array('Q'), array('Q')
+                for chunk_keys, chunk_offsets, _ in indexed:
+                    keys.extend(chunk_keys[shard])
+                    offsets.extend(chunk_offsets[shard])
+                if not offsets:
+                    continue
+                part = os.path.join(parts_dir, f"part-{shard:05d}.jsonl")
+                futures.append((part, pool.submit(replay_shard, path, text_format, bot_type,
+                                                  keys, offsets, part, seed)))
+
+            summaries = []
+            for part, future in futures:
+                summaries.append(future.result())
+                with open(part, 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, output, 1 << 20)
+                os.remove(part)
+
+    elapsed = time.perf_counter() - started
+    messages = sum(s['messages'] for s in summaries)
+    intents = Counter()
+    for s in summaries:
+        intents.update(s['intents'])
+    return {
+        'bot': bot_type,
+        'workers': workers,
+        'shards': len(summaries),
+        'messages': messages,
+        'conversations': sum(s['conversations'] for s in summaries),
+        'skipped_lines': sum(skipped for _, _, skipped in indexed),
+        'index_seconds': round(indexed_at - started, 3),
+        'elapsed_seconds': round(elapsed, 3),
+        'messages_per_second': round(messages / elapsed, 1) if elapsed else 0.0,
+        'intents': dict(intents.most_common())
+    }
+
+
+def main():
+    """Parse arguments, run the replay and print a throughput report."""
+    parser = argparse.ArgumentParser(description="Replay logged user messages through a chatbot in parallel.")
+    parser.add_argument('input', help="JSONL file, or plain text with blank lines between conversations")
+    parser.add_argument('-o', '--output', default='-', help="JSONL results file (default: stdout)")
+    parser.add_argument('--bot', choices=('simple', 'enhanced', 'nlp'), default='simple')
+    parser.add_argument('--format', choices=('auto', 'jsonl', 'text'), default='auto',
+                        help="input format (default: from the file extension)")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for response selection (default: 0)")
+    parser.add_argument('--summary', metavar='FILE', help="also write the summary to FILE as JSON")
+    args = parser.parse_args()
+
+    text_format = None if args.format == 'auto' else args.format == 'text'
+    if args.output == '-':
+        try:
+            summary = replay_file(args.input, sys.stdout, args.bot, args.workers, text_format, args.seed)
+        except BrokenPipeError:
+            # Output piped into head or similar; stop quietly
+            sys.stderr.close()
+            return
+    else:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            summary = replay_file(args.input, output, args.bot, args.workers, text_format, args.seed)
+
+    report = sys.stderr if args.output == '-' else sys.stdout
+    print(f"📊 Replayed {summary['messages']:,} messages in {summary['conversations']:,} conversations "
+          f"through the {summary['bot']} bot", file=report)
+    print(f"⏱️  {summary['elapsed_seconds']:.2f}s total ({summary['index_seconds']:.2f}s indexing) "
+          f"with {summary['workers']} workers: {summary['messages_per_second']:,.0f} messages/sec",
+          file=report)
+    if summary['skipped_lines']:
+        print(f"⚠️  Skipped {summary['skipped_lines']:,} unreadable or non-message lines", file=report)
+    top = ', '.join(f"{intent} {count:,}" for intent, count in list(summary['intents'].items())[:5])
+    if top:
+        print(f"🎯 Top intents: {top}", file=report)
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
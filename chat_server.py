@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Asyncio Chat Server
+Hosts many concurrent chat sessions over a small local HTTP/JSON protocol.
+
+Endpoints:
+    POST   /sessions                 {"bot": "simple"|"enhanced"|"nlp"} -> {"session_id": ...}
+    POST   /sessions/<id>/messages   {"message": "..."}                 -> {"response": ...}
+    GET    /sessions/<id>/stats                                         -> bot statistics
+    DELETE /sessions/<id>                                               -> {"deleted": true}
+    GET    /health                                                      -> server status
+    GET    /metrics[?format=json]                                       -> stage latency metrics
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from simple_chatbot import SimpleChatBot
+from enhanced_chatbot import EnhancedChatBot
+from nlp_chatbot import NLPChatBot
+from nlp_pool import get_nlp_pool, warm_up
+from session_store import SessionStore
+from instrumentation import StageMetrics, get_metrics, instrument
+
+BOT_CLASSES = {
+    'simple': SimpleChatBot,
+    'enhanced': EnhancedChatBot,
+    'nlp': NLPChatBot
+}
+
+# Bots whose turns do enough CPU work to be moved off the event loop
+EXECUTOR_BOTS = {'nlp'}
+
+MAX_BODY_BYTES = 64 * 1024
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 410: 'Gone', 413: 'Payload Too Large', 500: 'Internal Server Error'
+}
+
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ChatServer:
+    """
+    Asyncio HTTP/JSON server hosting chat sessions for all three bot classes.
+
+    Requests for different sessions run concurrently; turns within a session
+    are serialized by a per-session lock. NLP turns run on a thread pool so
+    the event loop keeps accepting connections while sentiment analysis runs.
+    Sessions are kept in a SessionStore, which compacts idle sessions and
+    spills long-idle ones to spill_dir. With instrument set, every bot times
+    its stages into the process-wide metrics served at /metrics.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, workers: int = 4,
+                 spill_dir: str = None, idle_seconds: float = 300, spill_seconds: float = 3600,
+                 sweep_interval: float = 30, instrument: bool = False):
+        self.host = host
+        self.port = port
+        self.instrument = instrument
+        self.store = SessionStore(self._build_bot, spill_dir, idle_seconds, spill_seconds)
+        self.locks: Dict[str, list] = {}  # session_id -> [lock, turns waiting or running]
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-worker')
+        self.sweep_interval = sweep_interval
+        self.started = time.time()
+        self.turns = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start listening; returns once the socket is bound."""
+        # Build the shared NLP components while the first clients connect
+        warm_up()
+        await self._listen()
+
+    async def _listen(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        await self._stop_listening()
+        self.executor.shutdown(wait=False)
+
+    async def _stop_listening(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # Session operations
+
+    def _build_bot(self, bot_type: str):
+        bot = BOT_CLASSES[bot_type]()
+        return instrument(bot) if self.instrument else bot
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            busy = list(self.locks)
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.store.sweep, None, busy)
+
+    async def create_session(self, bot_type: str) -> str:
+        if bot_type not in BOT_CLASSES:
+            raise HTTPError(400, f"Unknown bot type: {bot_type!r}")
+        session_id = uuid.uuid4().hex
+        if bot_type in EXECUTOR_BOTS:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.store.create, session_id, bot_type)
+        else:
+            self.store.create(session_id, bot_type)
+        return session_id
+
+    def check_session(self, session_id: str):
+        if session_id not in self.store:
+            raise HTTPError(404, f"No such session: {session_id}")
+
+    async def delete_session(self, session_id: str):
+        try:
+            self.store.delete(session_id)
+        except KeyError:
+            raise HTTPError(404, f"No such session: {session_id}")
+
+    async def send_message(self, session_id: str, message: str) -> str:
+        # Locks only exist while a session has turns in flight, so idle
+        # sessions cost nothing here
+        entry = self.locks.get(session_id)
+        if entry is None:
+            entry = self.locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                response = await self._run_turn(session_id, message)
+                self.turns += 1
+                return response
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[session_id]
+
+    async def _run_turn(self, session_id: str, message: str) -> str:
+        if self.store.is_active(session_id) and self.store.bot_type(session_id) not in EXECUTOR_BOTS:
+            return self._respond(session_id, message)
+        # NLP turns, and rehydrating sessions from disk, run off the loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._respond, session_id, message)
+
+    def _respond(self, session_id: str, message: str) -> str:
+        return self.store.get_bot(session_id).respond(message)
+
+    async def session_stats(self, session_id: str) -> Dict[str, Any]:
+        bot = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.store.get_bot, session_id)
+        if not hasattr(bot, 'get_stats'):
+            return {'bot': self.store.bot_type(session_id)}
+        return bot.get_stats()
+
+    async def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'turns': self.turns,
+            **self.store.get_stats(),
+            'nlp': get_nlp_pool().stats(),
+            'uptime_seconds': round(time.time() - self.started, 3)
+        }
+
+    async def collect_metrics(self) -> Tuple[StageMetrics, List[str]]:
+        """Stage latency metrics plus extra Prometheus lines for server-level counters."""
+        return get_metrics(), [
+            "# HELP chatbot_turns_total Chat turns answered since the server started.",
+            "# TYPE chatbot_turns_total counter",
+            f"chatbot_turns_total {self.turns}"
+        ]
+
+    # HTTP handling
+
+    async def _route(self, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Any]:
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+
+        if parts == ['health']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET")
+            return 200, await self.health()
+
+        if parts == ['metrics']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET")
+            metrics, lines = await self.collect_metrics()
+            if 'format=json' in path.partition('?')[2].split('&'):
+                return 200, metrics.to_json()
+            return 200, metrics.to_prometheus() + '\n'.join(lines) + '\n'
+
+        if parts == ['sessions']:
+            if method != 'POST':
+                raise HTTPError(405, "Use POST to create a session")
+            bot_type = body.get('bot', 'simple')
+            session_id = await self.create_session(bot_type)
+            return 201, {'session_id': session_id, 'bot': bot_type}
+
+        if len(parts) >= 2 and parts[0] == 'sessions':
+            session_id = parts[1]
+            self.check_session(session_id)
+            if len(parts) == 2:
+                if method != 'DELETE':
+                    raise HTTPError(405, "Use DELETE to end a session")
+                await self.delete_session(session_id)
+                return 200, {'deleted': True}
+            if parts[2:] == ['messages']:
+                if method != 'POST':
+                    raise HTTPError(405, "Use POST to send a message")
+                message = body.get('message')
+                if not isinstance(message, str) or not message.strip():
+                    raise HTTPError(400, "Body must include a non-empty 'message' string")
+                response = await self.send_message(session_id, message.strip())
+                return 200, {'session_id': session_id, 'response': response}
+            if parts[2:] == ['stats']:
+                if method != 'GET':
+                    raise HTTPError(405, "Use GET")
+                return 200, await self.session_stats(session_id)
+
+        raise HTTPError(404, f"Unknown path: {path}")
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        raw = await reader.readexactly(length) if length else b''
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+        return method.upper(), path, body, keep_alive
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, body, keep_alive = request
+                    status, payload = await self._route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                if isinstance(payload, str):
+                    # Plain-text responses (Prometheus metrics)
+                    data = payload.encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+
+def main():
+    """Run the chat server until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve chat sessions over local HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4, help="threads for NLP turns (default: 4)")
+    parser.add_argument('--spill-dir', help="directory for sessions evicted to disk (default: keep in memory)")
+    parser.add_argument('--idle-seconds', type=float, default=300, help="compact sessions idle this long")
+    parser.add_argument('--spill-seconds', type=float, default=3600, help="spill sessions idle this long")
+    parser.add_argument('--instrument', action='store_true', help="record per-stage latency for /metrics")
+    args = parser.parse_args()
+
+    server = ChatServer(args.host, args.port, args.workers, args.spill_dir,
+                        args.idle_seconds, args.spill_seconds, instrument=args.instrument)
+
+    async def run():
+        await server.start()
+        print(f"🤖 Chat server listening on http://{server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n👋 Chat server stopped.")
+
+
+if __name__ == "__main__":
+    main()
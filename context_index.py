@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Context Index
+An incremental inverted index with BM25 ranking over a session's conversation turns.
+"""
+
+import heapq
+import math
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from text_utils import content_words
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class ContextIndex:
+    """
+    Index documents (conversation turns) as they arrive and rank them against a query.
+
+    Each term maps to a postings list of (document id, term frequency), so a
+    query only touches the documents that share a term with it. Scoring is
+    BM25: rare terms count for more than common ones, and repeated terms
+    saturate instead of dominating. Document ids are the caller's, usually
+    the turn's position in the history.
+    """
+
+    def __init__(self, ignore: Iterable[str] = ()):
+        self.ignore = frozenset(ignore)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths = array('I')
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def terms(self, text: str) -> List[str]:
+        return [term for term in content_words(text) if term not in self.ignore]
+
+    def add(self, text: str) -> int:
+        """Index a document and return its id."""
+        doc_id = len(self.doc_lengths)
+        terms = self.terms(text)
+        for term, frequency in Counter(terms).items():
+            self.postings.setdefault(term, []).append((doc_id, frequency))
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        return doc_id
+
+    def search(self, query: str, limit: int = 2) -> List[Tuple[int, float]]:
+        """Return up to limit (doc_id, score) pairs, best first."""
+        count = len(self.doc_lengths)
+        if not count:
+            return []
+        average_length = self.total_length / count or 1.0
+
+        scores: Dict[int, float] = {}
+        get = scores.get
+        lengths = self.doc_lengths
+        base = BM25_K1 * (1 - BM25_B)
+        per_length = BM25_K1 * BM25_B / average_length
+        for term in set(self.terms(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            weight = math.log(1 + (count - df + 0.5) / (df + 0.5)) * (BM25_K1 + 1)
+            for doc_id, frequency in postings:
+                scores[doc_id] = get(doc_id, 0.0) + weight * frequency / (
+                    frequency + base + per_length * lengths[doc_id])
+
+        # Ties go to the most recent turn
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Conversation Archive
+Compressed, indexed storage for many saved conversations in a handful of files.
+
+Conversations are stored as the same session_info/conversation/
+mood_analysis/stats documents that save_conversation writes, but each one
+is a zlib frame appended to a segment file instead of a pretty-printed
+JSON file of its own:
+
+    archive/index.sqlite3       session_id, bot, user_name, start/end time, turns -> (segment, offset, length)
+    archive/segment-000001.cba  frames: magic b'CBAR' | length u32 | crc32 u32 | zlib(compact JSON)
+
+Segments are append-only and roll over at segment_bytes. Reads go through
+memory maps, so fetching one session is an index lookup and one slice, and
+a date-range scan walks the matching frames in file order. Archiving a
+session again makes the index point at the new copy.
+
+    python3 conversation_archive.py import conversations/
+    python3 conversation_archive.py scan --since 2025-01-01 --until 2025-02-01
+    python3 conversation_archive.py export <session_id> -o session.json
+    python3 conversation_archive.py check
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from transcript_log import DEFAULT_LOG_DIR, load_transcript
+
+DEFAULT_ARCHIVE_DIR = os.environ.get('CHATBOT_ARCHIVE_DIR', os.path.join(DEFAULT_LOG_DIR, 'archive'))
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+FORMAT_VERSION = 1
+_FRAME = struct.Struct('<4sII')
+_MAGIC = b'CBAR'
+_INDEX_NAME = 'index.sqlite3'
+
+# Preset zlib dictionary: conversations are small, so most of what they share
+# (keys and common values) would otherwise be paid for again in every frame.
+# Changing it needs a new FORMAT_VERSION.
+_ZDICT = (
+    b'"conversation":[{"timestamp":"","user":"","bot":"","sentiment":"neutral","keywords":[],'
+    b'"intent":"general"},"sentiment":"positive","sentiment":"negative","intent":"greeting",'
+    b'"intent":"question","intent":"goodbye","intent":"name_response","intent":"how_are_you",'
+    b'"mood_analysis":{"average_mood":"neutral","mood_trend":"insufficient_data","mood_distribution":'
+    b'{"positive":,"neutral":,"negative":}},"stats":{"session_duration":"0:","messages_exchanged":,'
+    b'"user_name":"Unknown","nlp_enabled":false,"average_mood":"","mood_trend":"","total_keywords":'
+    b',"cache":{"entries":,"bytes":,"hits":,"misses":,"hit_rate":}},"session_info":{"start_time":'
+    b'"","end_time":"","user_name":null,"nlp_enabled":false,"bot":"},"stats":{"session_duration":'
+    b'"That\'s interesting! Tell me more about your thoughts on that." I see. What\'s your '
+    b'Hello! How can I help you today? Nice to meet you, I\'ll remember that. Goodbye! '
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    bot TEXT,
+    user_name TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    turns INTEGER,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_start ON sessions (start_time);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (user_name);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = ('session_id', 'bot', 'user_name', 'start_time', 'end_time', 'turns', 'segment', 'offset', 'length')
+
+
+class ArchiveError(Exception):
+    """The archive is damaged or was written in an unsupported format."""
+
+
+def compress_document(document: Dict[str, Any], level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zdict=_ZDICT)
+    data = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_document(payload: bytes) -> Dict[str, Any]:
+    decompressor = zlib.decompressobj(zdict=_ZDICT)
+    return json.loads(decompressor.decompress(payload) + decompressor.flush())
+
+
+def describe(document: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str], int]:
+    """(bot, user_name, start_time, end_time, turns) of a conversation document."""
+    info = document.get('session_info', {})
+    bot = info.get('bot') or ('nlp' if 'nlp_enabled' in info or 'mood_analysis' in document else 'enhanced')
+    user_name = info.get('user_name') or None
+    return bot, user_name, info.get('start_time'), info.get('end_time'), len(document.get('conversation', ()))
+
+
+class ConversationArchive:
+    """
+    Append-only compressed segments plus a sqlite index, read through memory maps.
+
+    Safe to share between threads. Only one process should write to an
+    archive at a time; any number may read it.
+    """
+
+    def __init__(self, directory: str = DEFAULT_ARCHIVE_DIR, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 level: int = 6):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, _INDEX_NAME), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        version = self._db.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+        if version is None:
+            with self._db:
+                self._db.execute("INSERT INTO meta VALUES ('format_version', ?)", (str(FORMAT_VERSION),))
+        elif int(version[0]) != FORMAT_VERSION:
+            raise ArchiveError(f"{directory}: archive format {version[0]} is not supported")
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._segment = self._last_segment()
+        self._writer = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.cba")
+
+    def _last_segment(self) -> int:
+        segments = [int(name[8:14]) for name in os.listdir(self.directory)
+                    if name.startswith('segment-') and name.endswith('.cba')]
+        return max(segments, default=1)
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for segment_map in self._maps.values():
+                segment_map.close()
+            self._maps.clear()
+            self._db.close()
+
+    def __enter__(self) -> 'ConversationArchive':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Writing
+
+    def _open_writer(self):
+        if self._writer is not None and self._writer.tell() >= self.segment_bytes:
+            self._writer.close()
+            self._writer = None
+            self._segment += 1
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._segment), 'ab')
+            if self._writer.tell() >= self.segment_bytes:
+                self._writer.close()
+                self._segment += 1
+                self._writer = open(self._segment_path(self._segment), 'ab')
+        return self._writer
+
+    def append_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Archive (session_id, document) pairs with one index transaction; returns the count."""
+        rows = []
+        with self._lock:
+            for session_id, document in items:
+                payload = compress_document(document, self.level)
+                writer = self._open_writer()
+                offset = writer.tell()
+                writer.write(_FRAME.pack(_MAGIC, len(payload), zlib.crc32(payload)) + payload)
+                rows.append((session_id, *describe(document), self._segment, offset, _FRAME.size + len(payload)))
+            if self._writer is not None:
+                self._writer.flush()
+            with self._db:
+                self._db.executemany(f"INSERT OR REPLACE INTO sessions VALUES ({', '.join('?' * len(_COLUMNS))})",
+                                     rows)
+        return len(rows)
+
+    def append(self, session_id: str, document: Dict[str, Any]):
+        """Archive one conversation document."""
+        self.append_many([(session_id, document)])
+
+    # Reading
+
+    def _map(self, segment: int, end: int) -> mmap.mmap:
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < end:
+            # Not mapped yet, or the segment has grown since it was mapped
+            if segment_map is not None:
+                segment_map.close()
+            with open(self._segment_path(segment), 'rb') as f:
+                segment_map = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return segment_map
+
+    def _read(self, segment: int, offset: int, length: int) -> Dict[str, Any]:
+        with self._lock:
+            frame = self._map(segment, offset + length)[offset:offset + length]
+        magic, size, checksum = _FRAME.unpack_from(frame)
+        payload = frame[_FRAME.size:]
+        if magic != _MAGIC or size != len(payload) or zlib.crc32(payload) != checksum:
+            raise ArchiveError(f"Damaged frame at segment {segment}, offset {offset}")
+        return decompress_document(payload)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The archived document for session_id, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT segment, offset, length FROM sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+        return self._read(*row) if row else None
+
+    def _select(self, since: str, until: str, user_name: str, order: str) -> Tuple[str, List[str]]:
+        clauses, params = [], []
+        if since:
+            clauses.append("COALESCE(end_time, start_time) >= ?")
+            params.append(since)
+        if until:
+            clauses.append("start_time < ?")
+            params.append(until)
+        if user_name:
+            clauses.append("user_name = ? COLLATE NOCASE")
+            params.append(user_name)
+        query = f"SELECT {', '.join(_COLUMNS)} FROM sessions"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return query + f" ORDER BY {order}", params
+
+    def find(self, since: str = None, until: str = None, user_name: str = None,
+             limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Index entries of sessions active in [since, until), oldest first.
+
+        since and until are ISO dates or datetimes ("2025-01-01" or
+        "2025-01-01T12:00:00"), compared with the sessions' start and end times.
+        """
+        query, params = self._select(since, until, user_name, 'start_time')
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def scan(self, since: str = None, until: str = None,
+             user_name: str = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (session_id, document) for the sessions find() selects.
+
+        Frames are read in file order, and index rows are streamed from a
+        connection of the scan's own, so a scan over millions of sessions
+        holds neither the index nor the documents in memory.
+        """
+        query, params = self._select(since, until, user_name, 'segment, offset')
+        index = sqlite3.connect(os.path.join(self.directory, _INDEX_NAME))
+        try:
+            cursor = index.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    break
+                for session_id, *_, segment, offset, length in rows:
+                    yield session_id, self._read(segment, offset, length)
+        finally:
+            index.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions, turns, first, last = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(turns), 0), MIN(start_time), MAX(end_time) FROM sessions").fetchone()
+            live_bytes = self._db.execute("SELECT COALESCE(SUM(length), 0) FROM sessions").fetchone()[0]
+        segments = [name for name in os.listdir(self.directory) if name.endswith('.cba')]
+        total_bytes = sum(os.path.getsize(os.path.join(self.directory, name)) for name in segments)
+        return {
+            'sessions': sessions,
+            'turns': turns,
+            'first_start': first,
+            'last_end': last,
+            'segments': len(segments),
+            'segment_bytes': total_bytes,
+            'superseded_bytes': total_bytes - live_bytes
+        }
+
+    # Import and export
+
+    def import_path(self, path: str, batch_size: int = 1000) -> int:
+        """
+        Archive saved conversations from a .json file, a .jsonl transcript or a
+        directory of them; the file name (without extension) becomes the session ID.
+        """
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith(('.json', '.jsonl')))
+            paths = [os.path.join(path, name) for name in names]
+        else:
+            paths = [path]
+
+        def documents():
+            for file_path in paths:
+                session_id = os.path.splitext(os.path.basename(file_path))[0]
+                if file_path.endswith('.jsonl'):
+                    yield session_id, load_transcript(file_path)
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        yield session_id, json.load(f)
+
+        imported = 0
+        batch = []
+        for item in documents():
+            batch.append(item)
+            if len(batch) >= batch_size:
+                imported += self.append_many(batch)
+                batch = []
+        if batch:
+            imported += self.append_many(batch)
+        return imported
+
+    def export(self, session_id: str, path: str) -> bool:
+        """Write one session as a save_conversation-style JSON file; False if it is not archived."""
+        document = self.get(session_id)
+        if document is None:
+            return False
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+        return True
+
+    def export_range(self, directory: str, since: str = None, until: str = None, user_name: str = None) -> int:
+        """Write every matching session to directory as <session_id>.json; returns the count."""
+        os.makedirs(directory, exist_ok=True)
+        exported = 0
+        for session_id, document in self.scan(since, until, user_name):
+            with open(os.path.join(directory, f"{session_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+            exported += 1
+        return exported
+
+
+_shared_archives: Dict[str, ConversationArchive] = {}
+_shared_archives_lock = threading.Lock()
+
+
+def get_archive(directory: str = None) -> ConversationArchive:
+    """Get the process-wide archive for a directory (CHATBOT_ARCHIVE_DIR by default)."""
+    directory = os.path.abspath(directory or DEFAULT_ARCHIVE_DIR)
+    with _shared_archives_lock:
+        archive = _shared_archives.get(directory)
+        if archive is None:
+            archive = _shared_archives[directory] = ConversationArchive(directory)
+        return archive
+
+
+def new_session_id(prefix: str = 'conversation') -> str:
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def check_bots() -> List[str]:
+    """
+    Archive a short session from each bot into a new, empty archive and read it back.
+
+    Returns a description of every problem found (none means the check passed).
+    """
+    import tempfile
+    from enhanced_chatbot import EnhancedChatBot
+    from nlp_chatbot import NLPChatBot
+
+    problems = []
+    for bot_class in (EnhancedChatBot, NLPChatBot):
+        bot = bot_class(seed=0)
+        for message in ("Hello, my name is Ann", "Can you help me with something?"):
+            bot.respond(message)
+        with tempfile.TemporaryDirectory() as directory, ConversationArchive(directory) as archive:
+            session_id = bot.archive_conversation(archive)
+            name = bot_class.__name__
+            if session_id not in archive or len(archive) != 1:
+                problems.append(f"{name}: the first session went to another archive")
+            elif archive.get(session_id)['conversation'] != json.loads(
+                    json.dumps(bot.conversation_document()['conversation'], ensure_ascii=False)):
+                problems.append(f"{name}: the archived turns do not read back unchanged")
+    return problems
+
+
+def main():
+    """Import, look up, scan and export archived conversations."""
+    parser = argparse.ArgumentParser(description="Manage the compressed conversation archive.")
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_DIR, help=f"archive directory (default: {DEFAULT_ARCHIVE_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help="archive .json files and .jsonl transcripts")
+    importer.add_argument('paths', nargs='+', help="files or directories")
+    importer.add_argument('--remove', action='store_true', help="delete the imported files afterwards")
+
+    show = commands.add_parser('get', help="print one archived session as JSON")
+    show.add_argument('session_id')
+
+    for name, description in (('scan', "list sessions in a date range"), ('export', "write sessions as JSON files")):
+        command = commands.add_parser(name, help=description)
+        command.add_argument('session_id', nargs='?', help="export just this session")
+        command.add_argument('--since', help="ISO date or datetime (inclusive)")
+        command.add_argument('--until', help="ISO date or datetime (exclusive)")
+        command.add_argument('--user', help="only sessions with this user name")
+        command.add_argument('-o', '--output', help="output file (one session) or directory")
+
+    commands.add_parser('stats', help="show archive totals")
+    commands.add_parser('check', help="verify that each bot archives into the archive it is given")
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        problems = check_bots()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ Sessions from every bot land in the archive they are given and read back unchanged")
+        return
+
+    with ConversationArchive(args.archive) as archive:
+        if args.command == 'import':
+            total = 0
+            for path in args.paths:
+                count = archive.import_path(path)
+                total += count
+                if args.remove:
+                    files = ([os.path.join(path, name) for name in os.listdir(path) if name.endswith(('.json', '.jsonl'))]
+                             if os.path.isdir(path) else [path])
+                    for file_path in files:
+                        os.remove(file_path)
+            print(f"📦 Archived {total:,} conversations in {args.archive}")
+        elif args.command == 'get':
+            document = archive.get(args.session_id)
+            if document is None:
+                print(f"❌ No archived session {args.session_id}")
+                sys.exit(1)
+            json.dump(document, sys.stdout, indent=2, ensure_ascii=False)
+            print()
+        elif args.command == 'scan':
+            entries = archive.find(args.since, args.until, args.user)
+            for entry in entries:
+                print(f"{entry['session_id']:<40} {entry['bot'] or '':<9} {entry['start_time'] or '':<26} "
+                      f"{entry['turns']:>5} turns  {entry['user_name'] or ''}")
+            print(f"🔎 {len(entries):,} sessions")
+        elif args.command == 'export':
+            if args.session_id:
+                output = args.output or f"{args.session_id}.json"
+                if not archive.export(args.session_id, output):
+                    print(f"❌ No archived session {args.session_id}")
+                    sys.exit(1)
+                print(f"💾 Exported {args.session_id} to {output}")
+            else:
+                directory = args.output or 'exported'
+                count = archive.export_range(directory, args.since, args.until, args.user)
+                print(f"💾 Exported {count:,} sessions to {directory}")
+        elif args.command == 'stats':
+            for key, value in archive.get_stats().items():
+                print(f"   {key.replace('_', ' ').capitalize()}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Conversation History
+A bounded ring buffer of conversation turns with running statistics over the whole session.
+"""
+
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+DEFAULT_HISTORY_LIMIT = 1000
+# Keywords whose counts are kept; the rest of a long session's vocabulary is forgotten
+DEFAULT_KEYWORD_LIMIT = 2000
+
+
+class ConversationHistory:
+    """
+    Keep the most recent turns in a ring buffer and roll older ones into aggregates.
+
+    Totals are updated as turns are appended, so session-wide statistics
+    (turn count, sentiment and intent counts, distinct keywords) cost the
+    same however long the session has been running. It behaves like the list
+    of turn dicts it replaces for len(), iteration, indexing and slicing, over
+    the retained turns only.
+
+    Keyword counts are capped at keyword_limit: when a quarter more have
+    piled up, only the most frequent keyword_limit are kept, so a long
+    session's spills and snapshots stay bounded.
+    """
+
+    def __init__(self, limit: int = DEFAULT_HISTORY_LIMIT, entries: Iterable[Dict[str, Any]] = (),
+                 keyword_limit: int = DEFAULT_KEYWORD_LIMIT):
+        self.limit = limit
+        self.keyword_limit = keyword_limit
+        self._turns = deque(maxlen=limit)
+        self.total_turns = 0
+        self.sentiment_counts = Counter()
+        self.intent_counts = Counter()
+        self.keyword_counts = Counter()
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: Dict[str, Any]):
+        """Add a turn; the oldest retained turn drops out once the buffer is full."""
+        self._turns.append(entry)
+        self.total_turns += 1
+        if 'sentiment' in entry:
+            self.sentiment_counts[entry['sentiment']] += 1
+        if 'intent' in entry:
+            self.intent_counts[entry['intent']] += 1
+        keywords = entry.get('keywords')
+        if keywords:
+            self.keyword_counts.update(keywords)
+            if len(self.keyword_counts) > self.keyword_limit + self.keyword_limit // 4:
+                self._trim_keywords()
+
+    def _trim_keywords(self):
+        """Keep only the keyword_limit most frequent keywords (earlier ones win ties)."""
+        if len(self.keyword_counts) > self.keyword_limit:
+            self.keyword_counts = Counter(dict(self.keyword_counts.most_common(self.keyword_limit)))
+
+    def prepend(self, entries: Iterable[Dict[str, Any]]):
+        """
+        Put back turns older than every retained one (oldest first), as many as there is room for.
+
+        The running totals are left alone: they are expected to count these
+        turns already (see restore_aggregates).
+        """
+        room = self.limit - len(self._turns)
+        if room > 0:
+            self._turns.extendleft(reversed(list(entries)[-room:]))
+
+    @property
+    def distinct_keywords(self) -> int:
+        """Distinct keywords being counted, at most a quarter over keyword_limit."""
+        return len(self.keyword_counts)
+
+    @property
+    def dropped_turns(self) -> int:
+        """Turns that only survive in the aggregates."""
+        return self.total_turns - len(self._turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __bool__(self) -> bool:
+        return bool(self._turns)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._turns)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return list(self._turns)[index]
+        return self._turns[index]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self._turns)
+
+    def get_aggregates(self) -> Dict[str, Any]:
+        """Session-wide totals, in a form that can be saved and passed to restore_aggregates."""
+        self._trim_keywords()
+        return {
+            'total_turns': self.total_turns,
+            'sentiment_counts': dict(self.sentiment_counts),
+            'intent_counts': dict(self.intent_counts),
+            'keyword_counts': dict(self.keyword_counts)
+        }
+
+    def restore_aggregates(self, aggregates: Dict[str, Any]):
+        """Replace the running totals with previously saved ones."""
+        self.total_turns = max(aggregates.get('total_turns', 0), len(self._turns))
+        self.sentiment_counts = Counter(aggregates.get('sentiment_counts', {}))
+        self.intent_counts = Counter(aggregates.get('intent_counts', {}))
+        self.keyword_counts = Counter(aggregates.get('keyword_counts', {}))
+        self._trim_keywords()
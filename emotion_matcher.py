@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Emotion Matcher
+Whole-word emotion detection against a lexicon of words and phrases, ranked by intensity.
+
+The lexicon lives in data/emotion_lexicon.txt (term<TAB>emotion). Terms may
+be phrases ("fed up", "over the moon"); matching is by whole tokens, so
+"down" never fires on "download" and "mad" never fires on "made".
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from text_utils import tokenize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+EMOTION_LEXICON_PATH = os.path.join(DATA_DIR, 'emotion_lexicon.txt')
+
+
+def read_emotion_lexicon(path: str = EMOTION_LEXICON_PATH) -> List[Tuple[str, str]]:
+    """Parse (term, emotion) pairs from the term<TAB>emotion lexicon file."""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            term, _, emotion = line.partition('\t')
+            entries.append((term.lower(), emotion.strip()))
+    return entries
+
+
+class EmotionMatcher:
+    """
+    Count emotion terms in text with one hash lookup per token.
+
+    Single-word terms map straight to their emotions. Phrases are indexed by
+    their first word and checked against the tokens that follow, longest
+    first, so a message is scanned once whatever the size of the lexicon.
+    Tokens consumed by a phrase are not matched again on their own.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self.phrases: Dict[str, List[Tuple[Tuple[str, ...], Tuple[str, ...]]]] = {}
+        self.emotions: List[str] = []
+        words: Dict[str, List[str]] = {}
+        phrases: Dict[Tuple[str, ...], List[str]] = {}
+        for term, emotion in entries:
+            if emotion not in self.emotions:
+                self.emotions.append(emotion)
+            tokens = tuple(tokenize(term))
+            if len(tokens) == 1:
+                words.setdefault(tokens[0], []).append(emotion)
+            elif tokens:
+                phrases.setdefault(tokens, []).append(emotion)
+        self.words: Dict[str, Tuple[str, ...]] = {word: tuple(emotions) for word, emotions in words.items()}
+        for tokens, emotions in phrases.items():
+            self.phrases.setdefault(tokens[0], []).append((tokens, tuple(emotions)))
+        for candidates in self.phrases.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    def __len__(self) -> int:
+        return len(self.words) + sum(len(candidates) for candidates in self.phrases.values())
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """Matched terms per emotion, in order of each emotion's first match."""
+        tokens = tokenize(text)
+        words, phrases = self.words, self.phrases
+        counts: Dict[str, int] = {}
+        i, length = 0, len(tokens)
+        while i < length:
+            token = tokens[i]
+            step, emotions = 1, None
+            for phrase, phrase_emotions in phrases.get(token, ()):
+                if tuple(tokens[i:i + len(phrase)]) == phrase:
+                    step, emotions = len(phrase), phrase_emotions
+                    break
+            if emotions is None:
+                emotions = words.get(token)
+            if emotions:
+                for emotion in emotions:
+                    counts[emotion] = counts.get(emotion, 0) + 1
+            i += step
+        return counts
+
+    def rank(self, text: str) -> List[Tuple[str, int]]:
+        """(emotion, count) pairs, strongest first; ties keep the order they appeared in."""
+        return sorted(self.counts(text).items(), key=lambda item: -item[1])
+
+    def detect(self, text: str) -> List[str]:
+        """Emotion names, strongest first."""
+        return [emotion for emotion, _ in self.rank(text)]
+
+
+_default_matcher: Optional[EmotionMatcher] = None
+_default_matcher_lock = threading.Lock()
+
+
+def get_emotion_matcher() -> EmotionMatcher:
+    """The process-wide matcher over the bundled lexicon, loaded on first use."""
+    global _default_matcher
+    if _default_matcher is None:
+        with _default_matcher_lock:
+            if _default_matcher is None:
+                _default_matcher = EmotionMatcher(read_emotion_lexicon())
+    return _default_matcher
@@ -5,84 +5,125 @@ A more sophisticated chatbot that remembers conversation context and user inform
 """
 
 import re
-import random
 import json
+import os
 from datetime import datetime
 from typing import Dict, List, Any
 
+from bot_definitions import get_definition, session_rng
+from session_store import SessionState
+from session_snapshot import DEFAULT_RESTORE_TAIL, SessionSnapshot, SnapshotError, encode_state
+from transcript_log import DEFAULT_LOG_DIR, get_transcript_logger
+from conversation_archive import ConversationArchive, get_archive, new_session_id
+from context_index import ContextIndex
+from instrumentation import format_stage_table, instrument, instrumentation_enabled
+
+_UNSET = object()
+
+# Words in a memory query that say "remember" rather than what to remember
+MEMORY_WORDS = {'remember', 'recall', 'said', 'say', 'talked', 'talk', 'earlier', 'before', 'mentioned'}
+
+# Default response templates; "{bot_name}" is filled in with the bot's name
+RESPONSES = {
+    'greetings': [
+        "Hello{name}! How can I help you today?",
+        "Hi there{name}! What's on your mind?",
+        "Hey{name}! Nice to see you!",
+        "Hello{name}! I'm here to chat with you."
+    ],
+    'how_are_you': [
+        "I'm doing great, thank you for asking! How are you feeling today?",
+        "I'm fantastic! How has your day been so far?",
+        "I'm doing well. How about you? Anything interesting happening?",
+        "All good here! Thanks for asking. What's new with you?"
+    ],
+    'name_questions': [
+        "My name is {bot_name}. What's yours?",
+        "I'm {bot_name}! What should I call you?",
+        "You can call me {bot_name}. I'd love to know your name!"
+    ],
+    'name_provided': [
+        "Nice to meet you, {user_name}! I'll remember that.",
+        "Great to meet you, {user_name}! How are you doing today?",
+        "Hello {user_name}! That's a lovely name. I'm glad to know you!"
+    ],
+    'help': [
+        "I can chat with you about various topics! I also remember our conversation, so feel free to reference things we've talked about before.",
+        "I'm here to have a conversation with you. I can remember what we discuss, so our chat can be more natural!",
+        "I can help with conversations and I'll remember what we talk about. What interests you?"
+    ],
+    'goodbye': [
+        "Goodbye{name}! It was wonderful chatting with you!",
+        "See you later{name}! Have a great day!",
+        "Bye{name}! Thanks for the great conversation!",
+        "Farewell{name}! I've enjoyed our chat!"
+    ],
+    'weather': [
+        "I don't have access to real weather data, but I hope it's nice where you are! How's the weather on your end?",
+        "I can't check the weather, but I hope you're having a beautiful day! What's it like outside?",
+        "Weather-wise, I'm not connected to any weather services, but I'm curious - how's the weather where you are?"
+    ],
+    'memory_reference': [
+        "Yes, I remember we talked about that! {context}",
+        "Right, you mentioned that earlier. {context}",
+        "I recall our conversation about that. {context}"
+    ],
+    'default': [
+        "That's interesting{name}! Tell me more about that.",
+        "I see{name}. What else would you like to talk about?",
+        "Hmm{name}, I'm not sure how to respond to that. Can you elaborate?",
+        "That's a good point{name}. What's your take on it?",
+        "I'd love to hear more about that{name}!",
+        "Could you tell me more about that{name}?"
+    ]
+}
+
+# Intent patterns in priority order
+PATTERNS = {
+    'greetings': r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b',
+    'how_are_you': r'\b(how are you|how\'re you|how do you feel|what\'s up)\b',
+    'name_questions': r'\b(what\'s your name|your name|who are you|what are you called)\b',
+    'name_response': r'\b(my name is|i\'m|call me|i am)\s+(\w+)',
+    'help': r'\b(help|what can you do|commands|assist)\b',
+    'goodbye': r'\b(bye|goodbye|see you|farewell|exit|quit)\b',
+    'weather': r'\b(weather|temperature|sunny|rainy|cloudy|hot|cold)\b',
+    'remember': r'\b(remember|recall|you said|we talked|earlier|before)\b'
+}
+
 class EnhancedChatBot:
-    def __init__(self):
-        self.name = "Enhanced ChatBot"
+    # Methods timed by instrument(), by stage name
+    STAGES = {
+        'match_intent': 'intent',
+        'search_context': 'context',
+        'format_response': 'format',
+        'get_response': 'response',
+        'add_to_history': 'history'
+    }
+
+    def __init__(self, seed: int = None):
+        # Tables are built once per process and shared read-only by every instance
+        self.definition = get_definition('enhanced', "Enhanced ChatBot", RESPONSES, PATTERNS)
+        self.name = self.definition.name
+        self.responses = self.definition.responses
+        self.patterns = self.definition.patterns
+        self.matcher = self.definition.matcher
+        # Each session draws responses from its own generator
+        self.rng = session_rng(seed)
+        self.instrumentation = None
         self.user_name = None
         self.conversation_history = []
         self.user_info = {}
         self.session_start = datetime.now()
+        self.transcript = None
+        # (snapshot, count) of turns restore() has not decoded yet
+        self._older_history = None
         
-        self.responses = {
-            'greetings': [
-                "Hello{name}! How can I help you today?",
-                "Hi there{name}! What's on your mind?",
-                "Hey{name}! Nice to see you!",
-                "Hello{name}! I'm here to chat with you."
-            ],
-            'how_are_you': [
-                "I'm doing great, thank you for asking! How are you feeling today?",
-                "I'm fantastic! How has your day been so far?",
-                "I'm doing well. How about you? Anything interesting happening?",
-                "All good here! Thanks for asking. What's new with you?"
-            ],
-            'name_questions': [
-                f"My name is {self.name}. What's yours?",
-                f"I'm {self.name}! What should I call you?",
-                f"You can call me {self.name}. I'd love to know your name!"
-            ],
-            'name_provided': [
-                "Nice to meet you, {user_name}! I'll remember that.",
-                "Great to meet you, {user_name}! How are you doing today?",
-                "Hello {user_name}! That's a lovely name. I'm glad to know you!"
-            ],
-            'help': [
-                "I can chat with you about various topics! I also remember our conversation, so feel free to reference things we've talked about before.",
-                "I'm here to have a conversation with you. I can remember what we discuss, so our chat can be more natural!",
-                "I can help with conversations and I'll remember what we talk about. What interests you?"
-            ],
-            'goodbye': [
-                "Goodbye{name}! It was wonderful chatting with you!",
-                "See you later{name}! Have a great day!",
-                "Bye{name}! Thanks for the great conversation!",
-                "Farewell{name}! I've enjoyed our chat!"
-            ],
-            'weather': [
-                "I don't have access to real weather data, but I hope it's nice where you are! How's the weather on your end?",
-                "I can't check the weather, but I hope you're having a beautiful day! What's it like outside?",
-                "Weather-wise, I'm not connected to any weather services, but I'm curious - how's the weather where you are?"
-            ],
-            'memory_reference': [
-                "Yes, I remember we talked about that! {context}",
-                "Right, you mentioned that earlier. {context}",
-                "I recall our conversation about that. {context}"
-            ],
-            'default': [
-                "That's interesting{name}! Tell me more about that.",
-                "I see{name}. What else would you like to talk about?",
-                "Hmm{name}, I'm not sure how to respond to that. Can you elaborate?",
-                "That's a good point{name}. What's your take on it?",
-                "I'd love to hear more about that{name}!",
-                "Could you tell me more about that{name}?"
-            ]
-        }
+        # Index of everything the user has said, for memory references. Words that
+        # only ask the bot to remember are not worth matching on.
+        self.context_index = ContextIndex(ignore=MEMORY_WORDS)
         
-        # Compile regex patterns
-        self.patterns = {
-            'greetings': re.compile(r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b', re.IGNORECASE),
-            'how_are_you': re.compile(r'\b(how are you|how\'re you|how do you feel|what\'s up)\b', re.IGNORECASE),
-            'name_questions': re.compile(r'\b(what\'s your name|your name|who are you|what are you called)\b', re.IGNORECASE),
-            'name_response': re.compile(r'\b(my name is|i\'m|call me|i am)\s+(\w+)', re.IGNORECASE),
-            'help': re.compile(r'\b(help|what can you do|commands|assist)\b', re.IGNORECASE),
-            'goodbye': re.compile(r'\b(bye|goodbye|see you|farewell|exit|quit)\b', re.IGNORECASE),
-            'weather': re.compile(r'\b(weather|temperature|sunny|rainy|cloudy|hot|cold)\b', re.IGNORECASE),
-            'remember': re.compile(r'\b(remember|recall|you said|we talked|earlier|before)\b', re.IGNORECASE)
-        }
+        if instrumentation_enabled():
+            instrument(self)
 
     def extract_name(self, user_input: str) -> str:
         """Extract user's name from their input."""
@@ -99,81 +140,203 @@ class EnhancedChatBot:
     def add_to_history(self, user_input: str, bot_response: str):
         """Add interaction to conversation history."""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.conversation_history.append({
+        entry = {
             'timestamp': timestamp,
             'user': user_input,
             'bot': bot_response
-        })
+        }
+        self.conversation_history.append(entry)
+        self.context_index.add(user_input)
+        if self.transcript:
+            self.transcript.log_turn(entry)
 
     def search_context(self, query: str) -> str:
         """Search conversation history for relevant context."""
-        query_words = query.lower().split()
-        relevant_context = []
-        
-        for entry in self.conversation_history[-10:]:  # Look at last 10 interactions
-            user_text = entry['user'].lower()
-            if any(word in user_text for word in query_words):
-                relevant_context.append(f"You said: '{entry['user']}'")
+        # Rank every past turn by BM25 relevance and quote the best two
+        self.load_history()
+        matches = self.context_index.search(query, limit=2)
+        relevant_context = [f"You said: '{self.conversation_history[doc_id]['user']}'"
+                            for doc_id, _ in matches]
         
         if relevant_context:
-            return " ".join(relevant_context[:2])  # Return up to 2 most relevant
+            return " ".join(relevant_context)
         return "something we discussed earlier"
 
-    def get_response(self, user_input: str) -> str:
-        """Generate a response based on user input and conversation context."""
+    def match_intent(self, user_input: str):
+        """Find the intent get_response would act on, given the current conversation."""
+        # Name and memory checks take precedence over the other patterns,
+        # but only apply when there is no name yet / something to remember
+        skip = []
+        if self.user_name:
+            skip.append('name_response')
+        if not self.conversation_history:
+            skip.append('remember')
+        return self.matcher.match(user_input.strip(), skip=skip, prefer=('name_response', 'remember'))
+
+    def get_response(self, user_input: str, match=_UNSET) -> str:
+        """
+        Generate a response based on user input and conversation context.
+        
+        match is the result of match_intent(user_input) when the caller already has it.
+        """
         user_input = user_input.strip()
+        if match is _UNSET:
+            match = self.match_intent(user_input)
         
-        # Check if user is providing their name
-        if not self.user_name:
-            name = self.extract_name(user_input)
-            if name:
-                self.user_name = name
-                self.user_info['name'] = name
-                response = random.choice(self.responses['name_provided'])
-                return self.format_response(response)
+        if match and match.intent == 'name_response':
+            name = match.group(2).capitalize()
+            self.user_name = name
+            if self.transcript:
+                self.transcript.log_meta(user_name=name)
+            self.user_info['name'] = name
+            response = self.rng.choice(self.responses['name_provided'])
+            return self.format_response(response)
         
         # Check for memory references
-        if self.patterns['remember'].search(user_input) and self.conversation_history:
+        if match and match.intent == 'remember':
             context = self.search_context(user_input)
-            response = random.choice(self.responses['memory_reference'])
+            response = self.rng.choice(self.responses['memory_reference'])
             return self.format_response(response.format(context=context))
         
         # Check other patterns
-        for intent, pattern in self.patterns.items():
-            if intent in ['name_response', 'remember']:  # Skip already handled patterns
-                continue
-            if pattern.search(user_input):
-                response = random.choice(self.responses[intent])
-                return self.format_response(response)
+        if match:
+            response = self.rng.choice(self.responses[match.intent])
+            return self.format_response(response)
         
         # Default response
-        response = random.choice(self.responses['default'])
+        response = self.rng.choice(self.responses['default'])
         return self.format_response(response)
 
+    def respond(self, user_input: str) -> str:
+        """Handle one chat turn (response plus history) without any terminal I/O."""
+        response = self.get_response(user_input)
+        self.add_to_history(user_input, response)
+        return response
+
+    def export_state(self) -> SessionState:
+        """Copy the per-user data into a compact SessionState."""
+        self.load_history()
+        state = SessionState('enhanced', self.session_start.timestamp())
+        state.user_name = self.user_name
+        state.user_info = dict(self.user_info) or None
+        if self.conversation_history:
+            state.history = [
+                (datetime.strptime(entry['timestamp'], "%Y-%m-%d %H:%M:%S").timestamp(),
+                 entry['user'], entry['bot'])
+                for entry in self.conversation_history
+            ]
+        return state
+
+    def load_state(self, state: SessionState):
+        """Restore per-user data from a SessionState."""
+        self.session_start = datetime.fromtimestamp(state.session_start)
+        self.user_name = state.user_name
+        self.user_info = dict(state.user_info or {})
+        self.conversation_history = [self._history_entry(turn) for turn in state.history or ()]
+        self._older_history = None
+        self._rebuild_context_index()
+
+    @staticmethod
+    def _history_entry(turn) -> Dict[str, Any]:
+        timestamp, user, bot = turn
+        return {
+            'timestamp': datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            'user': user,
+            'bot': bot
+        }
+
+    def _rebuild_context_index(self):
+        self.context_index = ContextIndex(ignore=MEMORY_WORDS)
+        for entry in self.conversation_history:
+            self.context_index.add(entry['user'])
+
+    def snapshot(self) -> bytes:
+        """The session's user data and full history in the binary snapshot format."""
+        return encode_state(self.export_state())
+
+    def restore(self, data, tail: int = DEFAULT_RESTORE_TAIL):
+        """
+        Resume a session from snapshot() bytes (or a read_snapshot() mapping).
+
+        Only the last tail turns are decoded now; older ones are decoded the
+        first time something needs them (memory references, saving, export).
+        tail=None decodes everything at once.
+        """
+        snapshot = SessionSnapshot(data)
+        if snapshot.bot_type != 'enhanced':
+            raise SnapshotError(f"snapshot is of a {snapshot.bot_type!r} session, not 'enhanced'")
+        self.load_state(snapshot.to_state(tail))
+        older = snapshot.older_turns(tail)
+        if older:
+            self._older_history = (snapshot, older)
+
+    def load_history(self):
+        """Decode the turns restore() left in the snapshot and put them back in front."""
+        if self._older_history is None:
+            return
+        snapshot, older = self._older_history
+        self._older_history = None
+        self.conversation_history[:0] = [self._history_entry(turn) for turn in snapshot.history(0, older)]
+        self._rebuild_context_index()
+
     def get_stats(self) -> Dict[str, Any]:
         """Get conversation statistics."""
         duration = datetime.now() - self.session_start
-        return {
+        stats = {
             'session_duration': str(duration).split('.')[0],  # Remove microseconds
-            'messages_exchanged': len(self.conversation_history),
+            'messages_exchanged': len(self.conversation_history) + (self._older_history or (None, 0))[1],
             'user_name': self.user_name or "Unknown"
         }
+        if self.instrumentation:
+            stats['stages'] = self.instrumentation.summary(self.instrumentation_label)
+        return stats
 
-    def save_conversation(self, filename: str = None):
-        """Save conversation history to a JSON file."""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"/Users/pratyushpandey/python-chatbot/conversation_{timestamp}.json"
-        
-        conversation_data = {
+    def start_transcript(self, directory: str = None, session_id: str = None) -> str:
+        """Stream this session to an append-only JSONL transcript; returns its path."""
+        if not session_id:
+            session_id = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        logger = get_transcript_logger(directory)
+        self.transcript = logger.open_session(session_id, start_time=self.session_start.isoformat(),
+                                              user_name=self.user_name, bot='enhanced')
+        return self.transcript.path
+
+    def end_transcript(self) -> str:
+        """Write the closing stats line and release the transcript; returns its path."""
+        if not self.transcript:
+            return None
+        path = self.transcript.close(stats=self.get_stats())
+        self.transcript = None
+        return path
+
+    def conversation_document(self) -> Dict[str, Any]:
+        """The session_info/conversation/stats document that save_conversation writes."""
+        self.load_history()
+        return {
             'session_info': {
                 'start_time': self.session_start.isoformat(),
                 'end_time': datetime.now().isoformat(),
-                'user_name': self.user_name
+                'user_name': self.user_name,
+                'bot': 'enhanced'
             },
             'conversation': self.conversation_history,
             'stats': self.get_stats()
         }
+
+    def archive_conversation(self, archive: ConversationArchive = None, session_id: str = None) -> str:
+        """Append the conversation to the compressed archive (CHATBOT_ARCHIVE_DIR by default); returns its ID."""
+        session_id = session_id or new_session_id('conversation')
+        # An empty archive is falsy (it has a length), so test for None explicitly
+        (archive if archive is not None else get_archive()).append(session_id, self.conversation_document())
+        return session_id
+
+    def save_conversation(self, filename: str = None):
+        """Save conversation history to a JSON file."""
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            os.makedirs(DEFAULT_LOG_DIR, exist_ok=True)
+            filename = os.path.join(DEFAULT_LOG_DIR, f"conversation_{timestamp}.json")
+        
+        conversation_data = self.conversation_document()
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
@@ -190,6 +353,9 @@ class EnhancedChatBot:
         print("   Type 'quit', 'bye', or 'stats' for statistics, or just start chatting!")
         print("=" * 70)
         
+        # Stream the conversation to disk as it happens
+        self.start_transcript()
+        
         while True:
             try:
                 user_input = input("👤 You: ").strip()
@@ -204,16 +370,19 @@ class EnhancedChatBot:
                     print(f"   Duration: {stats['session_duration']}")
                     print(f"   Messages: {stats['messages_exchanged']}")
                     print(f"   Your name: {stats['user_name']}")
+                    if 'stages' in stats:
+                        print("⏱️  Stage Latency:")
+                        print("\n".join(format_stage_table(stats['stages'])))
                     continue
                 
                 # Check for exit commands
                 if re.search(r'\b(quit|exit|bye|goodbye)\b', user_input, re.IGNORECASE):
-                    response = random.choice(self.responses['goodbye'])
+                    response = self.rng.choice(self.responses['goodbye'])
                     response = self.format_response(response)
                     print(f"🤖 {self.name}: {response}")
                     
-                    # Save conversation
-                    filename = self.save_conversation()
+                    # Close the streamed transcript
+                    filename = self.end_transcript()
                     if filename:
                         print(f"💾 Conversation saved to: {filename}")
                     
@@ -230,7 +399,7 @@ class EnhancedChatBot:
                 
             except KeyboardInterrupt:
                 print(f"\n🤖 {self.name}: Goodbye! Thanks for chatting!")
-                filename = self.save_conversation()
+                filename = self.end_transcript()
                 if filename:
                     print(f"💾 Conversation saved to: {filename}")
                 break
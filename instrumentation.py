@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Instrumentation
+Opt-in per-stage latency histograms for the chatbots, exportable as JSON or Prometheus text.
+
+instrument(bot) replaces the bot's stage methods with timed wrappers on that
+instance only; the class is untouched, so uninstrumented bots pay nothing.
+Bots list their stages in a STAGES class attribute (method name -> stage).
+Stage times are inclusive: get_response's "response" stage contains the
+sentiment, intent and keyword stages it triggers.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+# Histogram upper bounds in seconds (1-2.5-5 steps from 5 µs to 10 s); one more bucket holds +Inf
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+METRIC_NAME = 'chatbot_stage_latency_seconds'
+
+
+def instrumentation_enabled() -> bool:
+    """Whether CHATBOT_INSTRUMENT asks every new bot to be instrumented."""
+    return os.environ.get('CHATBOT_INSTRUMENT') == '1'
+
+
+class LatencyHistogram:
+    """Bucketed latency counts with sum, count and max, safe to record from many threads."""
+
+    __slots__ = ('counts', 'total', 'count', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'calls': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_us': round(self.total / self.count * 1e6, 2) if self.count else 0.0,
+            'p50_us': round(self.quantile(0.50) * 1e6, 2),
+            'p99_us': round(self.quantile(0.99) * 1e6, 2),
+            'max_us': round(self.max * 1e6, 2)
+        }
+
+
+class StageMetrics:
+    """A registry of latency histograms keyed by (bot label, stage)."""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, bot: str, stage: str) -> LatencyHistogram:
+        key = (bot, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self, bot: str = None) -> Dict[str, Dict[str, Any]]:
+        """Per-stage call counts and latency figures, for one bot label or all of them."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (label, stage), histogram in sorted(self._histograms.items()):
+            if bot is None:
+                result.setdefault(label, {})[stage] = histogram.summary()
+            elif label == bot:
+                result[stage] = histogram.summary()
+        return result
+
+    def to_json(self) -> Dict[str, Any]:
+        """Summaries plus raw cumulative bucket counts, keyed by bot label and stage."""
+        document: Dict[str, Any] = {'buckets': list(LATENCY_BUCKETS), 'bots': {}}
+        for (label, stage), histogram in sorted(self._histograms.items()):
+            entry = histogram.summary()
+            entry['counts'] = list(histogram.counts)
+            document['bots'].setdefault(label, {})[stage] = entry
+        return document
+
+    def merge(self, document: Dict[str, Any]):
+        """Add the histograms from another registry's to_json() document (e.g. a worker process)."""
+        for label, stages in document.get('bots', {}).items():
+            for stage, entry in stages.items():
+                histogram = self.histogram(label, stage)
+                with histogram._lock:
+                    for index, bucket_count in enumerate(entry['counts']):
+                        histogram.counts[index] += bucket_count
+                    histogram.total += entry['total_ms'] / 1000
+                    histogram.count += entry['calls']
+                    histogram.max = max(histogram.max, entry['max_us'] / 1e6)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each chatbot processing stage.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        for (label, stage), histogram in sorted(self._histograms.items()):
+            labels = f'bot="{label}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{METRIC_NAME}_sum{{{labels}}} {histogram.total:.9f}')
+            lines.append(f'{METRIC_NAME}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+_default_metrics = StageMetrics()
+
+
+def get_metrics() -> StageMetrics:
+    """The process-wide registry used when instrument() is not given one."""
+    return _default_metrics
+
+
+def _timed(method, histogram: LatencyHistogram):
+    clock = time.perf_counter
+    record = histogram.record
+
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record(clock() - start)
+    return timed
+
+
+def instrument(bot, metrics: StageMetrics = None, label: str = None):
+    """
+    Time the bot's stages into metrics (the process-wide registry by default).
+
+    Only this instance is changed. Instrumenting an already instrumented bot
+    does nothing. Returns the bot so it can wrap a constructor call.
+    """
+    if getattr(bot, 'instrumentation', None) is not None:
+        return bot
+    metrics = metrics if metrics is not None else _default_metrics
+    label = label or type(bot).__name__
+    for method_name, stage in getattr(type(bot), 'STAGES', {'get_response': 'response'}).items():
+        method = getattr(bot, method_name, None)
+        if method is not None:
+            setattr(bot, method_name, _timed(method, metrics.histogram(label, stage)))
+    bot.instrumentation = metrics
+    bot.instrumentation_label = label
+    return bot
+
+
+def format_stage_table(stages: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Lines of a small per-stage latency table for the interactive stats commands."""
+    lines = [f"   {'Stage':<14} {'Calls':>7} {'Mean':>10} {'p50':>10} {'p99':>10}"]
+    for stage, figures in sorted(stages.items(), key=lambda item: -item[1]['total_ms']):
+        if not figures['calls']:
+            continue
+        lines.append(f"   {stage:<14} {figures['calls']:>7} {figures['mean_us']:>8.1f}µs "
+                     f"{figures['p50_us']:>8.1f}µs {figures['p99_us']:>8.1f}µs")
+    return lines
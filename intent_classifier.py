@@ -0,0 +1,637 @@
+#!/usr/bin/env python3
+"""
+Intent Classifier
+A trainable multinomial Naive Bayes intent model over hashed word n-grams.
+
+Messages become bags of hashed features (words, word pairs and a start
+marker) in a fixed number of buckets, so the model's size does not depend
+on the vocabulary and nothing but the weights has to be stored. Scoring a
+batch is one gather of weight rows and one segmented sum, so adding intents
+widens a vectorized operation instead of adding patterns to a cascade.
+NumPy is used when installed; otherwise the same model is scored in pure
+Python.
+
+A model can be bootstrapped from the bots' regex tables: label an
+unlabelled corpus with the regexes (bootstrap_examples), seed every intent
+with messages built from its patterns (pattern_examples), add hand-labelled
+examples on top and train. Predictions come with a softmax confidence; the
+NLP bot only asks the model about messages no pattern matches, and only
+trusts confident answers. A message without any word gets no prediction.
+
+For the bots' nine intents the model is a fallback, not a replacement: on
+data/intent_eval.tsv it scores about 70% against 81.8% for the regexes, and
+batch scoring (about 60k msg/s) is slower than the regexes (about 100k).
+Its cost stays flat as intents are added; a regex cascade's does not.
+
+Model files are little-endian and laid out so that the weights can be used
+straight from a memory map:
+
+    header   magic b'CBIC' | version u16 | reserved u16 | features u32 | classes u32 | rows u32 |
+             alpha f64 | labels length u32
+    labels   JSON list of intent names, padded to 64 bytes
+    priors   f32[classes], padded to 64 bytes
+    index    u32[rows], the features seen in training in ascending order, padded to 64 bytes
+    weights  f32[rows x classes], one row per index entry
+
+Buckets no example hit have no row, so a file takes 4 x (1 + intents)
+bytes per feature seen in training rather than per bucket. A vocabulary
+large enough to hit most buckets approaches the dense size again (about
+52 MB at 400 intents and 2**15 buckets); fewer buckets cap it.
+
+    python3 intent_classifier.py train --synthetic 20000 -o intent_model.bin
+    python3 intent_classifier.py train conversations/ --examples labelled.jsonl -o intent_model.bin
+    python3 intent_classifier.py predict --model intent_model.bin "hey, how's it going?"
+    python3 intent_classifier.py evaluate --model intent_model.bin   # held-out data/intent_eval.tsv
+"""
+
+import argparse
+import functools
+import importlib.util
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from intent_matcher import GENERAL_INTENT
+
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+DEFAULT_FEATURES = 1 << 15
+DEFAULT_ALPHA = 0.1
+# Hand-labelled examples count this many times as much as regex-labelled ones
+DEFAULT_EXAMPLE_WEIGHT = 20.0
+# Below this confidence a prediction is not trusted and the regexes decide
+DEFAULT_THRESHOLD = float(os.environ.get('CHATBOT_INTENT_THRESHOLD', '0.8'))
+DEFAULT_MODEL_PATH = os.environ.get('CHATBOT_INTENT_MODEL')
+# Generated examples per literal phrase of each intent pattern
+DEFAULT_PATTERN_EXAMPLES = 8
+# Hand-labelled phrases kept out of training, for evaluate
+EVAL_EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'intent_eval.tsv')
+
+FORMAT_VERSION = 2
+_MAGIC = b'CBIC'
+_HEADER = struct.Struct('<4sHHIIIdI')
+_ALIGN = 64
+_NATIVE_LITTLE = sys.byteorder == 'little'
+
+# Words, contractions and the punctuation that carries intent
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[?!]")
+_WORD = re.compile(r"[a-z0-9]", re.IGNORECASE)
+_START = '\x02'
+_MIX = 0x9E3779B1
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    return zlib.crc32(token.encode('utf-8'))
+
+
+_START_HASH = _token_hash(_START)
+
+
+def features(text: str, n_features: int = DEFAULT_FEATURES) -> List[int]:
+    """
+    Hashed feature indices of text: the start marker, every token and every adjacent pair.
+
+    n_features must be a power of two. Pair hashes are combined from the
+    (memoized) token hashes, so a message costs one dictionary lookup per
+    token plus integer arithmetic.
+    """
+    mask = n_features - 1
+    previous = _START_HASH
+    indices = [previous & mask]
+    append = indices.append
+    for current in map(_token_hash, _TOKEN.findall(text.lower())):
+        append(current & mask)
+        append(((previous * _MIX) ^ current) & mask)
+        previous = current
+    return indices
+
+
+def bootstrap_examples(texts: Iterable[str], matcher, default: str = GENERAL_INTENT) -> List[Tuple[str, str]]:
+    """Label texts with an IntentMatcher; texts no pattern matches get default."""
+    examples = []
+    for text in texts:
+        text = text.strip()
+        if text:
+            examples.append((text, matcher.detect(text, default=default)))
+    return examples
+
+
+# Message shapes for pattern_examples: a phrase, optionally followed by a tail word
+_CARRIERS = ('{}', '{}!', '{}?', 'oh, {}', '{} {}', 'well {} {}', '{} {} please', 'so {} {}!')
+_TAILS = ('there', 'you', 'bot', 'today', 'again', 'now', 'friend', 'everyone')
+
+
+def pattern_examples(patterns: Dict, matcher, per_phrase: int = DEFAULT_PATTERN_EXAMPLES,
+                     seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Short messages built around every literal phrase of every intent pattern, labelled by matcher.
+
+    Every intent gets examples even when the corpus never uses it. Labels
+    come from the matcher rather than from the phrase's own intent, so they
+    follow the bot's priorities ("hello my name is Bob" is a greeting).
+    """
+    import random
+    from message_corpus import NAMES, pattern_phrases
+    rng = random.Random(seed)
+    tails = _TAILS + tuple(NAMES)
+    examples = []
+    for phrases in pattern_phrases(patterns).values():
+        for phrase in phrases:
+            for _ in range(per_phrase):
+                text = rng.choice(_CARRIERS).format(phrase, rng.choice(tails))
+                examples.append((text, matcher.detect(text, default=GENERAL_INTENT)))
+    return examples
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """
+    Read labelled examples: JSONL objects with "text" (or "message") and "intent",
+    or tab-separated "intent<TAB>text" lines.
+    """
+    examples = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                text = record.get('text', record.get('message'))
+                if isinstance(text, str) and record.get('intent'):
+                    examples.append((text, record['intent']))
+            else:
+                intent, _, text = line.partition('\t')
+                if text:
+                    examples.append((text, intent))
+    return examples
+
+
+def read_corpus(paths: Iterable[str]) -> List[str]:
+    """Unlabelled messages from text files (one per line), JSONL transcripts or directories of them."""
+    messages = []
+    for path in paths:
+        if os.path.isdir(path):
+            messages.extend(read_corpus(os.path.join(path, name) for name in sorted(os.listdir(path))
+                                        if name.endswith(('.txt', '.jsonl'))))
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('{'):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    message = record.get('user', record.get('message', record.get('text')))
+                    if isinstance(message, str) and record.get('type', 'turn') == 'turn':
+                        messages.append(message)
+                elif line:
+                    messages.append(line)
+    return messages
+
+
+def _padding(position: int) -> int:
+    return -position % _ALIGN
+
+
+class IntentClassifier:
+    """
+    Multinomial Naive Bayes over hashed n-grams; thread-safe for prediction.
+
+    Only features seen in training carry weights: index is their sorted
+    list, and weights holds log P(feature | intent) as one row of one value
+    per intent for each of them. Every other feature scores zero. Build one
+    with train() or load(); a loaded model reads its index and weights
+    straight from the memory-mapped file.
+    """
+
+    def __init__(self, labels: Sequence[str], log_prior, index, weights, n_features: int,
+                 alpha: float = DEFAULT_ALPHA, source: mmap.mmap = None):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.labels = list(labels)
+        self.n_classes = len(self.labels)
+        self.n_features = n_features
+        self.alpha = alpha
+        self._source = source  # keeps a memory map alive for as long as its weights are used
+        self._fingerprint = None
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            self._log_prior = np.asarray(log_prior, dtype=np.float32)
+            self._index = np.asarray(index, dtype=np.uint32)
+            self._weights = np.asarray(weights, dtype=np.float32).reshape(len(self._index), len(self.labels))
+        else:
+            self._log_prior = list(log_prior)
+            self._index = index
+            self._weights = weights
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def n_rows(self) -> int:
+        """Features with stored weights."""
+        return len(self._index)
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple], n_features: int = DEFAULT_FEATURES,
+              alpha: float = DEFAULT_ALPHA) -> 'IntentClassifier':
+        """
+        Fit a model to (text, intent) or (text, intent, weight) examples with additive smoothing alpha.
+
+        A weight counts the example that many times, so a few hand-labelled
+        examples can outvote many regex-labelled ones. Features never seen in
+        training get no row, so they score zero in every intent; smoothed,
+        they would favour the intents with the fewest examples.
+        """
+        labelled = [(features(example[0], n_features), example[1], example[2] if len(example) > 2 else 1.0)
+                    for example in examples]
+        if not labelled:
+            raise ValueError("no training examples")
+        labels = sorted({intent for _, intent, _ in labelled})
+        column = {label: index for index, label in enumerate(labels)}
+        classes = len(labels)
+        documents = [0.0] * classes
+        for _, intent, weight in labelled:
+            documents[column[intent]] += weight
+        log_prior = [math.log(count / sum(documents)) for count in documents]
+
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            rows = np.fromiter(chain.from_iterable(indices for indices, _, _ in labelled), dtype=np.intp)
+            columns = np.fromiter(chain.from_iterable([column[intent]] * len(indices)
+                                                      for indices, intent, _ in labelled), dtype=np.intp)
+            amounts = np.fromiter(chain.from_iterable([weight] * len(indices)
+                                                      for indices, _, weight in labelled), dtype=np.float64)
+            index, rows = np.unique(rows, return_inverse=True)
+            counts = np.zeros((len(index), classes))
+            np.add.at(counts, (rows.reshape(-1), columns), amounts)
+            totals = counts.sum(axis=0)
+            weights = (np.log(counts + alpha) - np.log(totals + alpha * n_features)).astype(np.float32)
+            return cls(labels, log_prior, index, weights, n_features, alpha)
+
+        counts: Dict[int, List[float]] = {}
+        totals = [0.0] * classes
+        for indices, intent, weight in labelled:
+            offset = column[intent]
+            totals[offset] += len(indices) * weight
+            for index in indices:
+                row = counts.get(index)
+                if row is None:
+                    row = counts[index] = [0.0] * classes
+                row[offset] += weight
+        log_totals = [math.log(total + alpha * n_features) for total in totals]
+        index = array('I', sorted(counts))
+        weights = array('f', (math.log(count + alpha) - log_total
+                              for feature in index for count, log_total in zip(counts[feature], log_totals)))
+        return cls(labels, log_prior, index, weights, n_features, alpha)
+
+    def _rows(self, indices):
+        """Weight rows of NumPy feature indices, zero for features without a row."""
+        import numpy as np
+        positions = np.searchsorted(self._index, indices)
+        np.minimum(positions, len(self._index) - 1, out=positions)
+        rows = self._weights[positions]
+        rows[self._index[positions] != indices] = 0
+        return rows
+
+    def probabilities(self, texts: Sequence[str]):
+        """
+        Posterior probability of every intent for every text, as a texts x intents matrix.
+
+        A NumPy array when NumPy is installed, otherwise a list of lists.
+        """
+        n_features = self.n_features
+        batch = [features(text, n_features) for text in texts]
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            if not batch:
+                return np.zeros((0, len(self.labels)), dtype=np.float32)
+            lengths = np.fromiter((len(indices) for indices in batch), dtype=np.intp, count=len(batch))
+            starts = np.zeros(len(batch), dtype=np.intp)
+            np.cumsum(lengths[:-1], out=starts[1:])
+            flat = np.fromiter(chain.from_iterable(batch), dtype=np.uint32, count=int(lengths.sum()))
+            # Every text has the start feature, so no segment is empty
+            scores = np.add.reduceat(self._rows(flat), starts, axis=0)
+            scores += self._log_prior
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+            scores /= scores.sum(axis=1, keepdims=True)
+            return scores
+
+        results = []
+        for indices in batch:
+            scores = self._log_scores(indices)
+            top = max(scores)
+            exponentials = [math.exp(score - top) for score in scores]
+            total = sum(exponentials)
+            results.append([value / total for value in exponentials])
+        return results
+
+    def _log_scores(self, indices: List[int]):
+        """Unnormalized log posterior of every intent, for one message's features."""
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            scores = self._rows(np.array(indices, dtype=np.uint32)).sum(axis=0)
+            scores += self._log_prior
+            return scores
+        classes = self.n_classes
+        index, weights = self._index, self._weights
+        rows = []
+        for feature in indices:
+            position = bisect_left(index, feature)
+            if position < len(index) and index[position] == feature:
+                rows.append(weights[position * classes:(position + 1) * classes])
+        if not rows:
+            return list(self._log_prior)
+        return [prior + sum(column) for prior, column in zip(self._log_prior, zip(*rows))]
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """
+        The most likely (intent, confidence) for each text.
+
+        Texts without a single word ("!!!", "...") are (general, 0.0): the
+        start marker and punctuation alone only echo the class priors.
+        """
+        probabilities = self.probabilities(texts)
+        labels = self.labels
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            best = probabilities.argmax(axis=1)
+            confidence = probabilities[np.arange(len(best)), best]
+            results = [(labels[index], float(value)) for index, value in zip(best.tolist(), confidence.tolist())]
+        else:
+            results = []
+            for row in probabilities:
+                index = max(range(len(row)), key=row.__getitem__)
+                results.append((labels[index], row[index]))
+        for position, text in enumerate(texts):
+            if not _WORD.search(text):
+                results[position] = (GENERAL_INTENT, 0.0)
+        return results
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """The most likely intent of text and its confidence (0-1); (general, 0.0) without a word."""
+        if not _WORD.search(text):
+            return GENERAL_INTENT, 0.0
+        # One message skips the batch bookkeeping: a single gather-and-sum, and
+        # only the winner's probability is normalized
+        scores = self._log_scores(features(text, self.n_features))
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            best = int(scores.argmax())
+            return self.labels[best], 1.0 / float(np.exp(scores - scores[best]).sum())
+        top = max(scores)
+        best = scores.index(top)
+        return self.labels[best], 1.0 / sum(math.exp(score - top) for score in scores)
+
+    def rank(self, text: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """The limit most likely intents of text with their confidences, best first."""
+        row = [float(value) for value in self.probabilities([text])[0]]
+        order = sorted(range(len(row)), key=row.__getitem__, reverse=True)[:limit]
+        return [(self.labels[index], row[index]) for index in order]
+
+    def _weight_bytes(self) -> bytes:
+        if NUMPY_AVAILABLE:
+            return self._weights.astype('<f4', copy=False).tobytes()
+        weights = array('f', self._weights)
+        if not _NATIVE_LITTLE:
+            weights.byteswap()
+        return weights.tobytes()
+
+    def _index_bytes(self) -> bytes:
+        if NUMPY_AVAILABLE:
+            return self._index.astype('<u4', copy=False).tobytes()
+        index = array('I', self._index)
+        if not _NATIVE_LITTLE:
+            index.byteswap()
+        return index.tobytes()
+
+    def _prior_bytes(self) -> bytes:
+        prior = array('f', (float(value) for value in self._log_prior))
+        if not _NATIVE_LITTLE:
+            prior.byteswap()
+        return prior.tobytes()
+
+    @property
+    def fingerprint(self) -> str:
+        """A short hash of the labels and weights, e.g. for cache keys."""
+        if self._fingerprint is None:
+            digest = zlib.crc32(json.dumps(self.labels).encode('utf-8'))
+            digest = zlib.crc32(self._prior_bytes(), digest)
+            digest = zlib.crc32(self._index_bytes(), digest)
+            self._fingerprint = f"{zlib.crc32(self._weight_bytes(), digest):08x}"
+        return self._fingerprint
+
+    def save(self, path: str) -> str:
+        """Write the model file (atomically replacing any existing one); returns path."""
+        labels = json.dumps(self.labels, ensure_ascii=False).encode('utf-8')
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, 0, self.n_features, len(self.labels), self.n_rows,
+                              self.alpha, len(labels))
+        parts = [header, labels]
+        position = len(header) + len(labels)
+        for section in (self._prior_bytes(), self._index_bytes(), self._weight_bytes()):
+            parts += [b'\0' * _padding(position), section]
+            position += _padding(position) + len(section)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp{os.getpid()}"
+        with open(temporary, 'wb') as f:
+            for part in parts:
+                f.write(part)
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'IntentClassifier':
+        """Open a model file; its index and weights are read from a shared, read-only memory map."""
+        with open(path, 'rb') as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(source) < _HEADER.size:
+            raise ValueError(f"{path} is not an intent model")
+        magic, version, _, n_features, classes, rows, alpha, labels_length = _HEADER.unpack_from(source, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not an intent model")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} uses unsupported model version {version}")
+        position = _HEADER.size
+        labels = json.loads(source[position:position + labels_length])
+        position += labels_length
+        offsets = []
+        for size in (4 * classes, 4 * rows, 4 * rows * classes):
+            position += _padding(position)
+            offsets.append(position)
+            position += size
+        if position > len(source):
+            raise ValueError(f"{path} is truncated")
+        prior_offset, index_offset, weights_offset = offsets
+
+        prior = array('f', source[prior_offset:prior_offset + 4 * classes])
+        if not _NATIVE_LITTLE:
+            prior.byteswap()
+        if NUMPY_AVAILABLE:
+            import numpy as np
+            index = np.frombuffer(source, dtype='<u4', count=rows, offset=index_offset)
+            weights = np.frombuffer(source, dtype='<f4', count=rows * classes, offset=weights_offset)
+        elif _NATIVE_LITTLE:
+            index = memoryview(source)[index_offset:index_offset + 4 * rows].cast('I')
+            weights = memoryview(source)[weights_offset:weights_offset + 4 * rows * classes].cast('f')
+        else:
+            index = array('I', source[index_offset:index_offset + 4 * rows])
+            weights = array('f', source[weights_offset:weights_offset + 4 * rows * classes])
+            index.byteswap()
+            weights.byteswap()
+        return cls(labels, prior, index, weights, n_features, alpha, source=source)
+
+
+_classifiers: Dict[str, IntentClassifier] = {}
+_classifiers_lock = threading.Lock()
+
+
+def get_intent_classifier(path: str = None) -> Optional[IntentClassifier]:
+    """
+    The process-wide model loaded from path (CHATBOT_INTENT_MODEL by default).
+
+    Returns None when no model is configured. Every caller shares one memory
+    map of the file, and so does every process on the machine.
+    """
+    path = path or DEFAULT_MODEL_PATH
+    if not path:
+        return None
+    classifier = _classifiers.get(path)
+    if classifier is None:
+        with _classifiers_lock:
+            classifier = _classifiers.get(path)
+            if classifier is None:
+                classifier = _classifiers[path] = IntentClassifier.load(path)
+    return classifier
+
+
+def _synthetic_messages(size: int, seed: int) -> List[str]:
+    """Realistic template turns plus the load test's weighted message mix."""
+    import random
+    from message_corpus import MessageMix, realistic_corpus
+    rng = random.Random(seed)
+    mix = MessageMix()
+    half = size // 2
+    return realistic_corpus(half, seed) + [mix.message(rng)[1] for _ in range(size - half)]
+
+
+def main():
+    """Train, query and evaluate intent models from the command line."""
+    parser = argparse.ArgumentParser(description="Train and use the hashed n-gram intent classifier.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    trainer = commands.add_parser('train', help="bootstrap a model from the regexes plus labelled examples")
+    trainer.add_argument('corpus', nargs='*', help="unlabelled messages to label with the NLP bot's regexes")
+    trainer.add_argument('--examples', action='append', default=[], metavar='FILE',
+                         help="labelled examples (JSONL text/intent or intent<TAB>text); may repeat")
+    trainer.add_argument('--example-weight', type=float, default=DEFAULT_EXAMPLE_WEIGHT,
+                         help="regex-labelled messages one labelled example counts as "
+                              f"(default: {DEFAULT_EXAMPLE_WEIGHT:g})")
+    trainer.add_argument('--synthetic', type=int, default=0, metavar='N',
+                         help="also label N generated chat messages")
+    trainer.add_argument('--pattern-examples', type=int, default=DEFAULT_PATTERN_EXAMPLES, metavar='N',
+                         help="generated messages per phrase of each intent pattern "
+                              f"(default: {DEFAULT_PATTERN_EXAMPLES})")
+    trainer.add_argument('--features', type=int, default=DEFAULT_FEATURES,
+                         help=f"hash buckets, a power of two; caps the stored rows (default: {DEFAULT_FEATURES})")
+    trainer.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help=f"smoothing (default: {DEFAULT_ALPHA})")
+    trainer.add_argument('--seed', type=int, default=0)
+    trainer.add_argument('-o', '--output', required=True, help="model file to write")
+
+    predictor = commands.add_parser('predict', help="classify messages (arguments, or stdin lines)")
+    predictor.add_argument('messages', nargs='*')
+    predictor.add_argument('--model', default=DEFAULT_MODEL_PATH, required=DEFAULT_MODEL_PATH is None)
+    predictor.add_argument('--top', type=int, default=1, help="intents to show per message")
+
+    evaluator = commands.add_parser('evaluate', help="accuracy on held-out labelled examples and agreement with the regexes")
+    evaluator.add_argument('corpus', nargs='*')
+    evaluator.add_argument('--model', default=DEFAULT_MODEL_PATH, required=DEFAULT_MODEL_PATH is None)
+    evaluator.add_argument('--examples', action='append', default=[], metavar='FILE',
+                           help=f"labelled examples not used in training (default: {EVAL_EXAMPLES_PATH})")
+    evaluator.add_argument('--synthetic', type=int, default=0, metavar='N')
+    evaluator.add_argument('--seed', type=int, default=1)
+    evaluator.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        from nlp_chatbot import INTENT_PATTERNS, NLPChatBot
+        matcher = NLPChatBot(lazy=True).matcher
+        messages = read_corpus(args.corpus)
+        if args.synthetic:
+            messages += _synthetic_messages(args.synthetic, args.seed)
+        examples = bootstrap_examples(messages, matcher)
+        # Pattern examples are few but cover every intent, so they count like hand-labelled ones
+        seeded = [(text, intent, args.example_weight)
+                  for text, intent in pattern_examples(INTENT_PATTERNS, matcher, args.pattern_examples, args.seed)]
+        labelled = [(text, intent, args.example_weight)
+                    for path in args.examples for text, intent in load_examples(path)]
+        started = time.perf_counter()
+        classifier = IntentClassifier.train(examples + seeded + labelled, args.features, args.alpha)
+        classifier.save(args.output)
+        size = os.path.getsize(args.output)
+        print(f"🧠 Trained {len(classifier)} intents on {len(examples):,} regex-labelled, {len(seeded):,} pattern "
+              f"and {len(labelled):,} hand-labelled examples in {time.perf_counter() - started:.2f}s")
+        print(f"💾 Saved {args.output} ({size / 1024:,.0f} KiB, weights for {classifier.n_rows:,} "
+              f"of {classifier.n_features:,} features)")
+        return
+
+    classifier = IntentClassifier.load(args.model)
+    if args.command == 'predict':
+        messages = args.messages or [line.strip() for line in sys.stdin if line.strip()]
+        for message in messages:
+            ranked = classifier.rank(message, args.top)
+            print(f"{message}\t" + '  '.join(f"{intent} {confidence:.2f}" for intent, confidence in ranked))
+        return
+
+    from nlp_chatbot import NLPChatBot
+    bot = NLPChatBot(lazy=True, intent_classifier=classifier, intent_threshold=args.threshold)
+    matcher = bot.matcher
+    messages = read_corpus(args.corpus)
+    if args.synthetic:
+        messages += _synthetic_messages(args.synthetic, args.seed)
+    if messages:
+        started = time.perf_counter()
+        predictions = classifier.predict_batch(messages)
+        batch_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        regex_labels = [matcher.detect(message, default=GENERAL_INTENT) for message in messages]
+        regex_seconds = time.perf_counter() - started
+        confident = [(intent, label) for (intent, confidence), label in zip(predictions, regex_labels)
+                     if confidence >= args.threshold]
+        agreement = sum(intent == label for intent, label in confident)
+        print(f"📊 {len(messages):,} messages: {len(confident) / len(messages):.1%} above threshold "
+              f"{args.threshold:g}, {agreement / max(1, len(confident)):.1%} of those agree with the regexes")
+        print(f"   Batch scoring {len(messages) / batch_seconds:,.0f} msg/s, regexes {len(messages) / regex_seconds:,.0f} msg/s")
+    labelled = [example for path in args.examples or [EVAL_EXAMPLES_PATH] for example in load_examples(path)]
+    if not labelled:
+        return
+    texts = [text for text, _ in labelled]
+    answers = {
+        'regexes': [matcher.detect(text, default=GENERAL_INTENT) for text in texts],
+        'model': [intent for intent, _ in classifier.predict_batch(texts)],
+        # Patterns first, the model only for messages none of them match
+        'bot': [bot.detect_intent(text) for text in texts]
+    }
+    print(f"🎯 Accuracy on {len(labelled):,} labelled examples:")
+    for source, intents in answers.items():
+        correct = sum(intent == label for intent, (_, label) in zip(intents, labelled))
+        print(f"   {source:<8} {correct / len(labelled):.1%}")
+
+
+if __name__ == "__main__":
+    main()
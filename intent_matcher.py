@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Intent Matcher
+Dispatches a message to the few intent patterns that can match it, via a keyword index.
+
+Every pattern is parsed once to find literal words that any match must
+contain (at least one of "hello", "hi", "hey" for \b(hello|hi|hey)\b).
+A message is lowercased and split into words once, the words are looked up
+in the index, and only the patterns they point at are searched, in priority
+order. The first one that matches wins, exactly as in a cascade that tries
+every pattern in table order, but the cost follows the number of candidate
+patterns rather than the size of the table.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+PatternSpec = Union[str, "re.Pattern", Iterable[Union[str, "re.Pattern"]]]
+
+# The intent reported for a message no pattern matches, by every bot
+GENERAL_INTENT = 'general'
+
+
+class IntentMatch:
+    """Result of a combined match: the winning intent plus its own capture groups."""
+
+    __slots__ = ('intent', 'start', '_groups')
+
+    def __init__(self, intent: str, start: int, groups: Tuple[Optional[str], ...]):
+        self.intent = intent
+        self.start = start
+        self._groups = groups
+
+    def group(self, index: int = 0) -> Optional[str]:
+        """Return a capture group numbered as in the intent's original pattern."""
+        return self._groups[index]
+
+    def groups(self) -> Tuple[Optional[str], ...]:
+        return self._groups[1:]
+
+    def __repr__(self):
+        return f"IntentMatch(intent={self.intent!r}, start={self.start})"
+
+
+# A literal that any match of a pattern must contain, and how it sits in the message's words:
+# 'word' is a whole word, 'prefix'/'suffix' the start/end of a word, 'text' anywhere in the text
+Key = Tuple[str, str]
+
+_WORD = re.compile(r'\w+')
+_KIND_RANK = {'word': 3, 'prefix': 2, 'suffix': 2, 'text': 1}
+
+_LITERAL = sre_constants.LITERAL
+_REPEATS = tuple(getattr(sre_constants, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                 if hasattr(sre_constants, name))
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+# Anchors after which (before which) the next (previous) character starts (ends) a word, or there is none
+_LEFT_ANCHORS = frozenset((sre_constants.AT_BOUNDARY, sre_constants.AT_BEGINNING,
+                           sre_constants.AT_BEGINNING_STRING, sre_constants.AT_BEGINNING_LINE))
+_RIGHT_ANCHORS = frozenset((sre_constants.AT_BOUNDARY, sre_constants.AT_END,
+                            sre_constants.AT_END_STRING, sre_constants.AT_END_LINE))
+_SEPARATOR_CATEGORIES = frozenset((sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_NOT_WORD))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def _is_separator(item, anchors: FrozenSet, edge: int) -> bool:
+    """Whether item always puts a non-word character (or an anchor in anchors) at its edge (0 or -1)."""
+    op, av = item
+    if op is _LITERAL:
+        return not _is_word_char(chr(av))
+    if op is sre_constants.AT:
+        return av in anchors
+    if op is sre_constants.IN:
+        return bool(av) and all((kind is _LITERAL and not _is_word_char(chr(value)))
+                                or (kind is sre_constants.CATEGORY and value in _SEPARATOR_CATEGORIES)
+                                for kind, value in av)
+    if op in _REPEATS:
+        return av[0] >= 1 and len(av[2]) == 1 and _is_separator(av[2][0], anchors, edge)
+    if op is sre_constants.SUBPATTERN:
+        return len(av[-1]) > 0 and _is_separator(av[-1][edge], anchors, edge)
+    if op is sre_constants.BRANCH:
+        return all(len(branch) > 0 and _is_separator(branch[edge], anchors, edge) for branch in av[1])
+    return False
+
+
+def _score(keys: FrozenSet[Key]) -> Tuple[int, int, int]:
+    # The weakest key decides how selective a set is; fewer keys break ties
+    return min((_KIND_RANK[kind], len(word)) for kind, word in keys) + (-len(keys),)
+
+
+def _better(current: Optional[FrozenSet[Key]], candidate: Optional[FrozenSet[Key]]) -> Optional[FrozenSet[Key]]:
+    if candidate is None:
+        return current
+    if current is None or _score(candidate) > _score(current):
+        return candidate
+    return current
+
+
+def _literal_strings(items, limit: int = 64) -> Optional[List[str]]:
+    """
+    Every string items can match, when that is a short list of literals, else None.
+
+    The regex parser factors common prefixes out of alternations ("hello|hey"
+    becomes "he" + (llo|y)); expanding them again gives whole-word keys.
+    """
+    strings = ['']
+    for op, av in items:
+        if op is _LITERAL:
+            options = [chr(av)]
+        elif op is sre_constants.SUBPATTERN:
+            options = _literal_strings(av[-1], limit)
+        elif op is sre_constants.BRANCH:
+            options = []
+            for branch in av[1]:
+                expanded = _literal_strings(branch, limit)
+                if expanded is None:
+                    return None
+                options += expanded
+        elif op in _REPEATS and av[0] == 0 and av[1] == 1:
+            options = _literal_strings(av[2], limit)
+            options = None if options is None else [''] + options
+        else:
+            return None
+        if options is None or len(strings) * len(options) > limit:
+            return None
+        strings = [prefix + option for prefix in strings for option in options]
+    return strings
+
+
+def _run_keys(run: str, left: bool, right: bool) -> Optional[FrozenSet[Key]]:
+    """The best key for a run of literal characters; left/right say whether a word cannot continue past it."""
+    folded = run.casefold()
+    if not folded or not folded.isascii():
+        # Non-ASCII literals can match ASCII text case-insensitively ("K" for "k"), so they cannot be keys
+        return None
+    best = None
+    for word in _WORD.finditer(folded):
+        bounded_left = word.start() > 0 or left
+        bounded_right = word.end() < len(folded) or right
+        kind = ('word' if bounded_left and bounded_right else 'prefix' if bounded_left
+                else 'suffix' if bounded_right else None)
+        if kind:
+            best = _better(best, frozenset(((kind, word.group()),)))
+    return best or frozenset((('text', folded),))
+
+
+def _required_keys(items, left: bool, right: bool) -> Optional[FrozenSet[Key]]:
+    """
+    Keys of which every match of the parsed pattern items contains at least one, or None.
+
+    left/right say whether the items are preceded/followed by a word boundary.
+    """
+    items = list(items)
+    best = None
+    index = 0
+    while index < len(items):
+        before = left if index == 0 else _is_separator(items[index - 1], _LEFT_ANCHORS, -1)
+        # The longest stretch from here that only matches a short list of literal strings
+        strings, end = None, index
+        while end < len(items):
+            expanded = _literal_strings(items[index:end + 1])
+            if expanded is None:
+                break
+            strings, end = expanded, end + 1
+        if strings is not None:
+            after = right if end == len(items) else _is_separator(items[end], _RIGHT_ANCHORS, 0)
+            keys = [_run_keys(string, before, after) for string in strings]
+            if all(key is not None for key in keys):
+                best = _better(best, frozenset().union(*keys))
+            index = end
+            continue
+
+        op, av = items[index]
+        after = right if index == len(items) - 1 else _is_separator(items[index + 1], _RIGHT_ANCHORS, 0)
+        if op is sre_constants.SUBPATTERN:
+            keys = _required_keys(av[-1], before, after)
+        elif op is _ATOMIC_GROUP:
+            keys = _required_keys(av, before, after)
+        elif op is sre_constants.BRANCH:
+            branches = [_required_keys(branch, before, after) for branch in av[1]]
+            keys = None if any(branch is None for branch in branches) else frozenset().union(*branches)
+        elif op in _REPEATS and av[0] >= 1:
+            # Only a single repetition keeps the neighbours of its first and last character
+            single = av[1] == 1
+            keys = _required_keys(av[2], before and single, after and single)
+        else:
+            keys = None
+        best = _better(best, keys)
+        index += 1
+    return best
+
+
+def pattern_keys(pattern: "re.Pattern") -> Optional[FrozenSet[Key]]:
+    """Keys of which every match of pattern contains at least one, or None when there are none to rely on."""
+    try:
+        return _required_keys(sre_parse.parse(pattern.pattern, pattern.flags), False, False)
+    except Exception:
+        # Anything the analysis does not understand is simply searched for every message
+        return None
+
+
+# Lowercases ASCII word characters and turns every other ASCII character into a space,
+# so one translate() and split() give a message's lowercase \w+ words
+_FOLD = bytes(ord(chr(code).lower()) if _is_word_char(chr(code)) else 32 if code < 128 else code
+              for code in range(256))
+
+
+class _Plan:
+    """
+    The index for one skip/prefer combination.
+
+    Candidate patterns are an int bitmask with bit n set for the pattern at
+    priority n, so collecting them is a few ORs and the lowest set bit is
+    the next pattern to try.
+    """
+
+    __slots__ = ('patterns', 'always', 'everything', 'words', 'prefixes', 'suffixes', 'texts')
+
+    def __init__(self, patterns: List[Tuple[str, "re.Pattern"]], keys: List[Optional[FrozenSet[Key]]]):
+        self.patterns = patterns
+        self.always = 0
+        self.everything = (1 << len(patterns)) - 1
+        words: Dict[bytes, int] = {}
+        prefixes: Dict[int, Dict[bytes, int]] = {}
+        suffixes: Dict[int, Dict[bytes, int]] = {}
+        texts: Dict[bytes, int] = {}
+        for priority, pattern_key_set in enumerate(keys):
+            bit = 1 << priority
+            if pattern_key_set is None:
+                self.always |= bit
+                continue
+            for kind, word in pattern_key_set:
+                if kind == 'word':
+                    table = words
+                elif kind == 'prefix':
+                    table = prefixes.setdefault(len(word), {})
+                elif kind == 'suffix':
+                    table = suffixes.setdefault(len(word), {})
+                else:
+                    table = texts
+                key = word.encode('ascii')
+                table[key] = table.get(key, 0) | bit
+        self.words = words
+        self.prefixes = list(prefixes.items())
+        self.suffixes = list(suffixes.items())
+        self.texts = list(texts.items())
+
+    def candidates(self, text: str) -> int:
+        """Bitmask of the patterns that might match text."""
+        if not text.isascii():
+            # Case folding outside ASCII can change lengths and word boundaries; search everything
+            return self.everything
+        encoded = text.encode('ascii')
+        mask = self.always
+        words = self.words
+        prefixes, suffixes = self.prefixes, self.suffixes
+        for token in encoded.translate(_FOLD).split():
+            mask |= words.get(token, 0)
+            # A token shorter than length is never equal to a key of that length
+            for length, table in prefixes:
+                mask |= table.get(token[:length], 0)
+            for length, table in suffixes:
+                mask |= table.get(token[-length:], 0)
+        if self.texts:
+            lowered = encoded.lower()
+            for word, bits in self.texts:
+                if word in lowered:
+                    mask |= bits
+        return mask
+
+
+class IntentMatcher:
+    """
+    Match a message against an ordered table of intent patterns.
+
+    The result is the first pattern in table order that matches anywhere in
+    the message, as if every pattern were tried in turn, but only the
+    patterns whose keywords occur in the message are actually searched.
+    Patterns without a usable keyword (e.g. r'\?' or r'^\w+$') are always
+    searched, in their place in the order.
+    """
+
+    def __init__(self, patterns: Dict[str, PatternSpec], flags: int = re.IGNORECASE):
+        self.flags = flags
+        self._patterns: List[Tuple[str, "re.Pattern"]] = []
+        for intent, spec in patterns.items():
+            if isinstance(spec, (str, re.Pattern)):
+                spec = [spec]
+            for pattern in spec:
+                if not isinstance(pattern, re.Pattern):
+                    pattern = re.compile(pattern, flags)
+                self._patterns.append((intent, pattern))
+        self._keys = [pattern_keys(pattern) for _, pattern in self._patterns]
+        self.intents = list(dict.fromkeys(intent for intent, _ in self._patterns))
+        self._plans: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], _Plan] = {}
+        self._default = self._plan((), ())
+
+    def _plan(self, skip: Tuple[str, ...], prefer: Tuple[str, ...]) -> _Plan:
+        """Build (and cache) the index for one skip/prefer combination."""
+        key = (skip, prefer)
+        plan = self._plans.get(key)
+        if plan is None:
+            order = [index for intent in prefer for index, entry in enumerate(self._patterns) if entry[0] == intent]
+            order += [index for index, entry in enumerate(self._patterns) if entry[0] not in prefer]
+            order = [index for index in order if self._patterns[index][0] not in skip]
+            plan = self._plans[key] = _Plan([self._patterns[index] for index in order],
+                                            [self._keys[index] for index in order])
+        return plan
+
+    def match(self, text: str, skip: Iterable[str] = (), prefer: Iterable[str] = ()) -> Optional[IntentMatch]:
+        """
+        Return the winning intent for text, or None if nothing matches.
+
+        skip removes intents from consideration; prefer moves the given intents
+        (in the given order) ahead of the rest of the table.
+        """
+        plan = self._plan(tuple(skip), tuple(prefer)) if skip or prefer else self._default
+        patterns = plan.patterns
+        mask = plan.candidates(text)
+        while mask:
+            lowest = mask & -mask
+            intent, pattern = patterns[lowest.bit_length() - 1]
+            found = pattern.search(text)
+            if found:
+                return IntentMatch(intent, found.start(), (found.group(),) + found.groups())
+            mask ^= lowest
+        return None
+
+    def detect(self, text: str, default: Optional[str] = None, **kwargs) -> Optional[str]:
+        """Return only the name of the winning intent."""
+        found = self.match(text, **kwargs)
+        return found.intent if found else default
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Keyword Extractor
+Regex tokenization, memoized lemmatization and TF-IDF ranking of message keywords.
+
+Chat vocabulary is heavily Zipfian: a few thousand words cover almost every
+message, so lemmas are memoized in a bounded LRU and each distinct word is
+lemmatized once per process. Keywords are ranked by TF-IDF, where document
+frequencies come from the caller (the NLP bot uses its session's keyword
+counts), so words the user repeats every turn sink and new topics rise.
+"""
+
+import functools
+import math
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Mapping
+
+from text_utils import STOP_WORDS, tokenize
+
+DEFAULT_LEMMA_CACHE = 50000
+DEFAULT_KEYWORD_LIMIT = 5
+MIN_KEYWORD_LENGTH = 3
+
+# Plurals the suffix rules would get wrong
+IRREGULAR_PLURALS = {
+    'children': 'child', 'people': 'person', 'men': 'man', 'women': 'woman', 'feet': 'foot',
+    'teeth': 'tooth', 'mice': 'mouse', 'geese': 'goose', 'lives': 'life', 'wives': 'wife',
+    'knives': 'knife', 'leaves': 'leaf', 'halves': 'half', 'wolves': 'wolf', 'shelves': 'shelf',
+    'movies': 'movie', 'cookies': 'cookie', 'pies': 'pie', 'ties': 'tie', 'lies': 'lie',
+    'buses': 'bus', 'heroes': 'hero', 'potatoes': 'potato', 'tomatoes': 'tomato'
+}
+
+# Words ending in "s" that are not plurals
+_SINGULAR_ENDINGS = ('ss', 'us', 'is', 'ous', 'ics')
+INVARIANT_WORDS = frozenset((
+    'news', 'series', 'species', 'means', 'chaos', 'kudos', 'does', 'goes', 'yes', 'has', 'was',
+    'always', 'perhaps', 'sometimes', 'besides', 'lens', 'thanks', 'whereas', 'various'
+))
+
+
+def _is_word(token: str) -> bool:
+    # Letters and digits, possibly with a contraction ("sister's"), but not a bare number
+    return token[0].isalnum() and token.replace("'", '').isalnum() and not token.isdigit()
+
+
+def simple_lemma(word: str) -> str:
+    """
+    Singularize a regular English plural noun.
+
+    This is what WordNetLemmatizer does by default (noun lemmas) for the
+    regular cases, without needing nltk or its data.
+    """
+    if word.endswith("'s"):
+        word = word[:-2]
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if (len(word) <= 3 or not word.endswith('s') or word.endswith(_SINGULAR_ENDINGS)
+            or word in INVARIANT_WORDS):
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'xes', 'zes', 'ches', 'shes')):
+        return word[:-2]
+    return word[:-1]
+
+
+class KeywordExtractor:
+    """
+    Turn messages into lemmatized content terms and rank them.
+
+    lemmatize maps a lowercase word to its lemma (simple_lemma by default);
+    its results are memoized in an LRU of cache_size words, which is safe to
+    share between threads.
+    """
+
+    def __init__(self, lemmatize: Callable[[str], str] = None, cache_size: int = DEFAULT_LEMMA_CACHE,
+                 stop_words: Iterable[str] = STOP_WORDS):
+        self.stop_words = frozenset(stop_words)
+        self.lemma = functools.lru_cache(maxsize=cache_size)(lemmatize or simple_lemma)
+
+    def terms(self, text: str, tokens: Iterable[str] = None) -> List[str]:
+        """Lemmatized content words of text (or of its given tokens), in order."""
+        lemma, stop_words = self.lemma, self.stop_words
+        return [lemma(token) for token in (tokens if tokens is not None else tokenize(text))
+                if len(token) >= MIN_KEYWORD_LENGTH and token not in stop_words and _is_word(token)]
+
+    def rank(self, terms: Iterable[str], document_frequencies: Mapping[str, int] = None,
+             documents: int = 0, limit: int = DEFAULT_KEYWORD_LIMIT) -> List[str]:
+        """
+        The limit highest-scoring distinct terms by TF-IDF.
+
+        document_frequencies[term] is the number of the documents (e.g. past
+        turns) that contained term. Ties keep the order the terms appeared in.
+        """
+        counts = Counter(terms)
+        if document_frequencies:
+            frequency = document_frequencies.get
+
+            def score(term: str) -> float:
+                # Smoothed IDF, so unseen terms never divide by zero and seen ones stay positive
+                return counts[term] * (math.log((1 + documents) / (1 + frequency(term, 0))) + 1)
+        else:
+            score = counts.__getitem__
+        return sorted(counts, key=score, reverse=True)[:limit]
+
+    def extract(self, text: str, document_frequencies: Mapping[str, int] = None,
+                documents: int = 0, limit: int = DEFAULT_KEYWORD_LIMIT) -> List[str]:
+        """Terms of text ranked by rank()."""
+        return self.rank(self.terms(text), document_frequencies, documents, limit)
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self.lemma.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+_extractors: Dict[str, KeywordExtractor] = {}
+_extractors_lock = threading.Lock()
+
+
+def get_keyword_extractor(wordnet: bool = False) -> KeywordExtractor:
+    """
+    The process-wide extractor, built on first use.
+
+    wordnet=True lemmatizes with the NLP pool's WordNetLemmatizer (nltk and
+    its wordnet data must be installed); otherwise simple_lemma is used.
+    """
+    kind = 'wordnet' if wordnet else 'simple'
+    extractor = _extractors.get(kind)
+    if extractor is None:
+        with _extractors_lock:
+            extractor = _extractors.get(kind)
+            if extractor is None:
+                lemmatize = None
+                if wordnet:
+                    from nlp_pool import get_nlp_pool
+                    lemmatize = get_nlp_pool().lemmatizer.lemmatize
+                extractor = _extractors[kind] = KeywordExtractor(lemmatize)
+    return extractor
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Lexicon Sentiment
+A dependency-free, VADER-style sentiment scorer backed by a compiled binary lexicon.
+
+The lexicon source is data/sentiment_lexicon.txt (word<TAB>valence). It is
+compiled to data/sentiment_lexicon.bin, which loads with a couple of bulk
+reads instead of parsing text:
+
+    magic b'CBLX' | version u16 | count u32 | count x int8 valence*10 | '\\n'-joined words
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import re
+import struct
+import threading
+from array import array
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+LEXICON_SOURCE = os.path.join(DATA_DIR, 'sentiment_lexicon.txt')
+LEXICON_PATH = os.path.join(DATA_DIR, 'sentiment_lexicon.bin')
+
+# compound_scores runs as array operations over the whole batch when NumPy is installed
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+_MAGIC = b'CBLX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHI')
+
+# Scoring constants from VADER (Hutto & Gilbert, 2014)
+BOOSTER_INCREMENT = 0.293
+CAPS_INCREMENT = 0.733
+NEGATION_SCALAR = -0.74
+NORMALIZATION_ALPHA = 15
+EXCLAMATION_INCREMENT = 0.292
+QUESTION_INCREMENT = 0.18
+
+# Words that strengthen (or soften) the sentiment word that follows them
+BOOSTERS = {
+    **dict.fromkeys((
+        'absolutely', 'amazingly', 'awfully', 'completely', 'considerably', 'deeply', 'enormously',
+        'entirely', 'especially', 'exceptionally', 'extremely', 'fully', 'greatly', 'highly',
+        'hugely', 'incredibly', 'intensely', 'majorly', 'more', 'most', 'particularly', 'purely',
+        'quite', 'really', 'remarkably', 'so', 'substantially', 'thoroughly', 'totally',
+        'tremendously', 'truly', 'unbelievably', 'very', 'too'
+    ), BOOSTER_INCREMENT),
+    **dict.fromkeys((
+        'almost', 'barely', 'hardly', 'kinda', 'less', 'little', 'marginally',
+        'occasionally', 'partly', 'scarcely', 'slightly', 'somewhat', 'sorta'
+    ), -BOOSTER_INCREMENT)
+}
+
+NEGATIONS = frozenset((
+    'not', 'no', 'never', 'none', 'nobody', 'nothing', 'neither', 'nor', 'nowhere', 'cannot',
+    'without', 'rarely', 'seldom', "aint", "ain't", "isn't", "isnt", "aren't", "arent", "wasn't",
+    "wasnt", "weren't", "werent", "don't", "dont", "doesn't", "doesnt", "didn't", "didnt", "can't",
+    "cant", "couldn't", "couldnt", "won't", "wont", "wouldn't", "wouldnt", "shouldn't", "shouldnt",
+    "haven't", "havent", "hasn't", "hasnt", "hadn't", "hadnt", "mustn't", "mightn't", "needn't"
+))
+
+# Words, contractions and a few emoticons; case is kept to spot SHOUTED words
+_TOKEN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?|[:;=][-']?[()DPp/]|<3")
+
+
+def read_lexicon_source(path: str = LEXICON_SOURCE) -> Dict[str, float]:
+    """Parse the word<TAB>valence source file."""
+    lexicon = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            word, _, valence = line.partition('\t')
+            lexicon[word.lower()] = float(valence)
+    return lexicon
+
+
+def pack_lexicon(lexicon: Dict[str, float]) -> bytes:
+    words = sorted(lexicon)
+    valences = array('b', (max(-127, min(127, round(lexicon[word] * 10))) for word in words))
+    return (_HEADER.pack(_MAGIC, _VERSION, len(words)) + valences.tobytes()
+            + '\n'.join(words).encode('utf-8'))
+
+
+def unpack_lexicon(data: bytes) -> Dict[str, float]:
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a compiled sentiment lexicon (or an unsupported version)")
+    valences = array('b')
+    valences.frombytes(data[_HEADER.size:_HEADER.size + count])
+    words = data[_HEADER.size + count:].decode('utf-8').split('\n')
+    if len(words) != count:
+        raise ValueError("Compiled sentiment lexicon is truncated")
+    return {word: valence / 10 for word, valence in zip(words, valences)}
+
+
+def build_lexicon(source: str = LEXICON_SOURCE, path: str = LEXICON_PATH) -> int:
+    """Compile the source lexicon to its binary form; returns the number of words."""
+    lexicon = read_lexicon_source(source)
+    with open(path, 'wb') as f:
+        f.write(pack_lexicon(lexicon))
+    return len(lexicon)
+
+
+def load_lexicon(path: str = LEXICON_PATH, source: str = LEXICON_SOURCE) -> Dict[str, float]:
+    """Load the compiled lexicon, falling back to the text source if it is missing or stale."""
+    try:
+        if not os.path.exists(source) or os.path.getmtime(path) >= os.path.getmtime(source):
+            with open(path, 'rb') as f:
+                return unpack_lexicon(f.read())
+    except (OSError, ValueError, struct.error):
+        pass
+    return read_lexicon_source(source)
+
+
+class LexiconSentimentAnalyzer:
+    """
+    Score text the way VADER does, without nltk.
+
+    Each lexicon word's valence is raised or lowered by boosters in the three
+    words before it, emphasized when SHOUTED in otherwise mixed-case text and
+    flipped (and dampened) by a negation in the same window. Words before
+    "but" count half and words after it half again as much. Exclamation and
+    question marks push the total further in its direction, and the sum is
+    normalized into a compound score in [-1, 1]. polarity_scores returns the
+    same dict shape as nltk's SentimentIntensityAnalyzer.
+    """
+
+    def __init__(self, lexicon: Dict[str, float] = None):
+        self.lexicon = lexicon if lexicon is not None else load_lexicon()
+        self._tables = None
+
+    def _valences(self, text: str) -> List[float]:
+        tokens = _TOKEN.findall(text)
+        lowered = [token.lower() for token in tokens]
+        mixed_case = any(not token.isupper() for token in tokens if token.isalpha())
+        lexicon = self.lexicon
+        valences = []
+        for i, word in enumerate(lowered):
+            valence = lexicon.get(word)
+            if valence is None or word in BOOSTERS:
+                valences.append(0.0)
+                continue
+            if mixed_case and tokens[i].isupper() and len(tokens[i]) > 1:
+                valence += CAPS_INCREMENT if valence > 0 else -CAPS_INCREMENT
+            for distance in range(1, 4):
+                if i < distance:
+                    break
+                previous = lowered[i - distance]
+                boost = BOOSTERS.get(previous)
+                if boost:
+                    # Farther boosters count for less
+                    boost *= 1.0 - 0.05 * (distance - 1)
+                    valence += boost if valence > 0 else -boost
+                if previous in NEGATIONS:
+                    valence *= NEGATION_SCALAR
+            valences.append(valence)
+
+        if 'but' in lowered:
+            pivot = lowered.index('but')
+            valences = [v * 0.5 if i < pivot else v * 1.5 if i > pivot else v
+                        for i, v in enumerate(valences)]
+        return valences
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        """neg/neu/pos proportions and the normalized compound score for text."""
+        valences = self._valences(text)
+        total = sum(valences)
+        if total:
+            emphasis = min(text.count('!'), 4) * EXCLAMATION_INCREMENT
+            questions = text.count('?')
+            if questions > 1:
+                emphasis += min(questions * QUESTION_INCREMENT, 0.96)
+            total += emphasis if total > 0 else -emphasis
+        compound = total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+
+        positive = sum(v + 1 for v in valences if v > 0)
+        negative = sum(v - 1 for v in valences if v < 0)
+        neutral = sum(1 for v in valences if v == 0)
+        magnitude = positive - negative + neutral
+        if not magnitude:
+            return {'neg': 0.0, 'neu': 0.0, 'pos': 0.0, 'compound': 0.0}
+        return {
+            'neg': round(-negative / magnitude, 3),
+            'neu': round(neutral / magnitude, 3),
+            'pos': round(positive / magnitude, 3),
+            'compound': round(max(-1.0, min(1.0, compound)), 4)
+        }
+
+    def compound_scores(self, texts: Iterable[str]) -> List[float]:
+        """
+        Compound scores for many texts, equal to polarity_scores(text)['compound'] for each.
+
+        With NumPy, only tokenizing is done per text: the lexicon, booster
+        and negation lookups, the rules and the normalization each run once
+        over every token of the batch.
+        """
+        if not NUMPY_AVAILABLE:
+            polarity = self.polarity_scores
+            return [polarity(text)['compound'] for text in texts]
+        return self._compound_batch(list(texts))
+
+    def _lookup_tables(self):
+        """The words the rules know, sorted, with per-word valence, boost and flags; last row is 'unknown'."""
+        if self._tables is None:
+            import numpy as np
+            words = sorted(set(self.lexicon) | set(BOOSTERS) | NEGATIONS | {'but'})
+            unknown = [0.0]
+            self._tables = (
+                np.array(words),
+                np.array([self.lexicon.get(word, 0.0) for word in words] + unknown),
+                np.array([word in self.lexicon and word not in BOOSTERS for word in words] + [False]),
+                np.array([BOOSTERS.get(word, 0.0) for word in words] + unknown),
+                np.array([word in NEGATIONS for word in words] + [False])
+            )
+        return self._tables
+
+    def _compound_batch(self, texts: List[str]) -> List[float]:
+        import numpy as np
+        words, valences, scored, boosts, negations = self._lookup_tables()
+        tokenized = [_TOKEN.findall(text) for text in texts]
+        lengths = np.fromiter(map(len, tokenized), dtype=np.intp, count=len(texts))
+        total_tokens = int(lengths.sum())
+        if not total_tokens:
+            return [0.0] * len(texts)
+        flat = list(chain.from_iterable(tokenized))
+        tokens = np.array(flat)
+        lowered = np.array([token.lower() for token in flat])
+        owner = np.repeat(np.arange(len(texts)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        position = np.arange(total_tokens) - starts[owner]
+
+        # Lexicon lookup: one binary search for every token in the batch
+        ids = np.searchsorted(words, lowered)
+        np.minimum(ids, len(words) - 1, out=ids)
+        ids[words[ids] != lowered] = len(words)
+        has_valence = scored[ids]
+        valence = valences[ids]
+
+        # SHOUTED words count more when the rest of their text is not shouted
+        upper = np.char.isupper(tokens)
+        mixed_case = np.bincount(owner, weights=np.char.isalpha(tokens) & ~upper, minlength=len(texts)) > 0
+        shouted = has_valence & mixed_case[owner] & upper & (np.char.str_len(tokens) > 1)
+        valence[shouted] += np.where(valence[shouted] > 0, CAPS_INCREMENT, -CAPS_INCREMENT)
+
+        for distance in range(1, 4):
+            window = has_valence & (position >= distance)
+            previous = ids[np.flatnonzero(window) - distance]
+            boost = boosts[previous] * (1.0 - 0.05 * (distance - 1))
+            current = valence[window]
+            current += np.where(current > 0, boost, -boost)
+            current[negations[previous]] *= NEGATION_SCALAR
+            valence[window] = current
+        valence[~has_valence] = 0.0
+
+        # Words before the first "but" count half, words after it one and a half times
+        is_but = lowered == 'but'
+        pivot = np.full(len(texts), total_tokens)
+        np.minimum.at(pivot, owner[is_but], position[is_but])
+        text_pivot = pivot[owner]
+        has_pivot = text_pivot < total_tokens
+        valence[has_pivot & (position < text_pivot)] *= 0.5
+        valence[has_pivot & (position > text_pivot)] *= 1.5
+
+        total = np.bincount(owner, weights=valence, minlength=len(texts))
+        emphasis = np.array([min(text.count('!'), 4) * EXCLAMATION_INCREMENT
+                             + (min(questions * QUESTION_INCREMENT, 0.96) if questions > 1 else 0.0)
+                             for text, questions in zip(texts, (text.count('?') for text in texts))])
+        total += np.where(total > 0, emphasis, np.where(total < 0, -emphasis, 0.0))
+        compound = np.clip(total / np.sqrt(total * total + NORMALIZATION_ALPHA), -1.0, 1.0)
+        compound[lengths == 0] = 0.0
+        return [round(value, 4) for value in compound.tolist()]
+
+
+_default_analyzer: Optional[LexiconSentimentAnalyzer] = None
+_default_analyzer_lock = threading.Lock()
+
+
+def get_lexicon_analyzer() -> LexiconSentimentAnalyzer:
+    """The process-wide analyzer over the bundled lexicon, loaded on first use."""
+    global _default_analyzer
+    if _default_analyzer is None:
+        with _default_analyzer_lock:
+            if _default_analyzer is None:
+                _default_analyzer = LexiconSentimentAnalyzer()
+    return _default_analyzer
+
+
+def main():
+    """Compile the lexicon, or score the given text."""
+    parser = argparse.ArgumentParser(description="Build the sentiment lexicon or score text with it.")
+    parser.add_argument('--build', action='store_true', help=f"compile {LEXICON_SOURCE} to {LEXICON_PATH}")
+    parser.add_argument('text', nargs='*', help="text to score")
+    args = parser.parse_args()
+
+    if args.build:
+        count = build_lexicon()
+        print(f"✅ Compiled {count} words to {LEXICON_PATH} ({os.path.getsize(LEXICON_PATH):,} bytes)")
+    if args.text:
+        print(get_lexicon_analyzer().polarity_scores(' '.join(args.text)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Simulates many concurrent chat users to find how many conversations a host can sustain.
+
+Each simulated user opens a session, sends `turns` messages separated by an
+exponentially distributed think time, then starts over with a new session
+until the run ends. Messages are drawn from a weighted mix of categories
+built from the bots' own intent patterns and the emotion lexicon:
+
+    greeting  greetings and name introductions
+    intent    phrases from the other intent patterns (help, weather, how are you, ...)
+    remember  memory references to something said earlier
+    emotion   feelings from the emotion lexicon
+    ramble    long multi-sentence messages
+
+Bots run in-process, or behind chat_server.py: one started for the run
+(--server) or one already running (--url). Latency is measured from when a
+message was due rather than when it could be sent, so an overloaded host
+shows up as queueing delay instead of silently sending less. Several user
+counts can be stepped through in one run; results are saved as JSON and
+compared against a saved baseline like benchmark_suite.py.
+
+    python3 load_test.py --bot nlp --users 50,100,200 --think 1 --duration 20
+    python3 load_test.py --server --bot enhanced --users 500 --json run.json
+    python3 load_test.py --url http://127.0.0.1:8765 --server-pid 4242 --baseline run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from message_corpus import CATEGORIES, MessageMix
+
+DEFAULT_USERS = '50'
+DEFAULT_DURATION = 20.0
+DEFAULT_THINK = 1.0
+DEFAULT_TURNS = 20
+DEFAULT_INTERVAL = 1.0
+DEFAULT_TOLERANCE = 0.25
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse "greeting=1,emotion=3" into category weights; unlisted categories get 0."""
+    mix = dict.fromkeys(CATEGORIES, 0.0)
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"unknown message category {name!r} (expected one of {', '.join(CATEGORIES)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("the message mix needs at least one positive weight")
+    return mix
+
+
+def rss_bytes(pid: int = None) -> Optional[int]:
+    """Resident set size of a process (this one by default), or None where it cannot be read."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid is None:
+        try:
+            import resource
+        except ImportError:
+            return None
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+class InProcessTarget:
+    """
+    Bots in this process, answered on the event loop like a single-threaded host.
+
+    Turns block the loop while they run, so a message that comes due while
+    another is being answered waits for it, and that wait counts as latency.
+    """
+
+    def __init__(self):
+        from chat_server import BOT_CLASSES
+        self.bot_classes = BOT_CLASSES
+        self.label = 'in-process'
+        self.kind = 'in-process'
+        self.pid = None
+
+    async def open(self, bot_type: str):
+        return self.bot_classes[bot_type]()
+
+    async def send(self, session, message: str) -> str:
+        return session.respond(message)
+
+    async def close_session(self, session):
+        pass
+
+    async def close(self):
+        pass
+
+
+class HTTPTarget:
+    """A chat_server.py instance, one keep-alive connection per simulated user."""
+
+    def __init__(self, host: str, port: int, pid: int = None, process: subprocess.Popen = None):
+        self.host = host
+        self.port = port
+        self.pid = pid
+        self.process = process
+        self.label = f"http://{host}:{port}"
+        # A server started for the run, or one already running (whatever it is)
+        self.kind = 'server' if process is not None else 'url'
+
+    @classmethod
+    def start_local(cls, workers: int = 4) -> 'HTTPTarget':
+        """Start chat_server.py on a free port for the duration of the run."""
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_server.py')
+        process = subprocess.Popen([sys.executable, '-u', script, '--port', '0', '--workers', str(workers)],
+                                   stdout=subprocess.PIPE, text=True)
+        line = process.stdout.readline()
+        match = re.search(r'http://([^:]+):(\d+)', line)
+        if not match:
+            process.kill()
+            raise RuntimeError(f"chat_server.py did not start: {line.strip() or 'no output'}")
+        return cls(match.group(1), int(match.group(2)), process.pid, process)
+
+    async def _request(self, connection, method: str, path: str, body: Dict[str, Any] = None):
+        reader, writer = connection
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        payload = json.loads(await reader.readexactly(length)) if length else {}
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status}: {payload.get('error', '')}")
+        return payload
+
+    async def open(self, bot_type: str):
+        connection = await asyncio.open_connection(self.host, self.port)
+        try:
+            payload = await self._request(connection, 'POST', '/sessions', {'bot': bot_type})
+        except Exception:
+            connection[1].close()
+            raise
+        return connection, payload['session_id']
+
+    async def send(self, session, message: str) -> str:
+        connection, session_id = session
+        payload = await self._request(connection, 'POST', f"/sessions/{session_id}/messages", {'message': message})
+        return payload['response']
+
+    async def close_session(self, session):
+        connection, session_id = session
+        try:
+            await self._request(connection, 'DELETE', f"/sessions/{session_id}")
+        except (OSError, RuntimeError, asyncio.IncompleteReadError):
+            pass
+        connection[1].close()
+
+    async def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class LoadRecorder:
+    """Latencies and errors for a whole run, plus a per-interval timeline."""
+
+    def __init__(self, pid: int = None):
+        self.pid = pid
+        self.latencies = array('d')
+        self.errors: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.sessions = 0
+        self.active_users = 0
+        self.timeline: List[Dict[str, Any]] = []
+        self.rss: List[int] = []
+        self._window = array('d')
+        self._window_errors = 0
+
+    def record(self, category: str, latency: float):
+        self.latencies.append(latency)
+        self._window.append(latency)
+        self.categories[category] = self.categories.get(category, 0) + 1
+
+    def error(self, error: BaseException):
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+        self._window_errors += 1
+
+    def sample(self, elapsed: float, interval: float) -> Dict[str, Any]:
+        """Close the current interval and return its timeline row."""
+        window = sorted(self._window)
+        rss = rss_bytes(self.pid)
+        if rss is not None:
+            self.rss.append(rss)
+        row = {
+            'elapsed': round(elapsed, 1),
+            'users': self.active_users,
+            'turns': len(window),
+            'turns_per_sec': round(len(window) / interval, 1),
+            'p50_ms': round(_percentile(window, 0.50) * 1000, 2),
+            'p95_ms': round(_percentile(window, 0.95) * 1000, 2),
+            'p99_ms': round(_percentile(window, 0.99) * 1000, 2),
+            'errors': self._window_errors,
+            'rss_mib': round(rss / 1048576, 1) if rss is not None else None
+        }
+        self.timeline.append(row)
+        self._window = array('d')
+        self._window_errors = 0
+        return row
+
+    def summary(self, elapsed: float, rss_start: Optional[int]) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        turns = len(ordered)
+        errors = sum(self.errors.values())
+        mib = lambda value: round(value / 1048576, 1) if value is not None else None
+        rss_end = self.rss[-1] if self.rss else None
+        return {
+            'turns': turns,
+            'sessions': self.sessions,
+            'turns_per_sec': round(turns / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(_percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(_percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            'errors': errors,
+            'error_rate': round(errors / (turns + errors), 4) if turns + errors else 0.0,
+            'error_types': dict(self.errors),
+            'categories': dict(self.categories),
+            'rss_start_mib': mib(rss_start),
+            'rss_peak_mib': mib(max(self.rss)) if self.rss else None,
+            'rss_end_mib': mib(rss_end),
+            'rss_growth_mib': mib(rss_end - rss_start) if rss_end is not None and rss_start is not None else None
+        }
+
+
+async def _simulate_user(target, mix: MessageMix, recorder: LoadRecorder, bot_type: str, user: int,
+                         seed: int, start_delay: float, deadline: float, think: float, turns: int):
+    loop = asyncio.get_running_loop()
+    rng = random.Random(f"{seed}:{user}")
+    await asyncio.sleep(start_delay)
+    recorder.active_users += 1
+    try:
+        while loop.time() < deadline:
+            try:
+                session = await target.open(bot_type)
+            except Exception as e:
+                recorder.error(e)
+                await asyncio.sleep(max(think, 0.1))
+                continue
+            recorder.sessions += 1
+            try:
+                due = loop.time()
+                for turn in range(turns):
+                    await asyncio.sleep(max(0.0, due - loop.time()))
+                    if loop.time() >= deadline:
+                        break
+                    category, message = mix.message(rng, 'greeting' if turn == 0 else None)
+                    try:
+                        await target.send(session, message)
+                    except Exception as e:
+                        recorder.error(e)
+                    else:
+                        # Measured from when the message was due, so time spent waiting for the host counts
+                        recorder.record(category, loop.time() - due)
+                    due = loop.time() + (rng.expovariate(1 / think) if think > 0 else 0.0)
+            finally:
+                await target.close_session(session)
+    finally:
+        recorder.active_users -= 1
+
+
+async def run_level(target, mix: MessageMix, bot_type: str, users: int, duration: float, think: float,
+                    turns: int, ramp: float, interval: float, seed: int, quiet: bool = False) -> Dict[str, Any]:
+    """Run one load level and return its summary and timeline."""
+    loop = asyncio.get_running_loop()
+    recorder = LoadRecorder(target.pid)
+    rss_start = rss_bytes(target.pid)
+    started = loop.time()
+    deadline = started + duration
+    tasks = [
+        asyncio.create_task(_simulate_user(target, mix, recorder, bot_type, user, seed,
+                                           ramp * user / users, deadline, think, turns))
+        for user in range(users)
+    ]
+
+    next_sample = started + interval
+    while loop.time() < deadline:
+        await asyncio.sleep(max(0.0, min(next_sample, deadline) - loop.time()))
+        if loop.time() >= next_sample:
+            row = recorder.sample(loop.time() - started, interval)
+            next_sample += interval
+            if not quiet:
+                rss = f"{row['rss_mib']:>8.1f} MiB" if row['rss_mib'] is not None else '        n/a'
+                print(f"  {row['elapsed']:>6.1f}s {row['users']:>6} users {row['turns_per_sec']:>9,.1f} turns/s   "
+                      f"p50 {row['p50_ms']:>8.2f} ms   p95 {row['p95_ms']:>8.2f} ms   "
+                      f"p99 {row['p99_ms']:>8.2f} ms   errors {row['errors']:>4}   rss {rss}")
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    recorder.sample(elapsed, interval)
+    summary = recorder.summary(min(elapsed, duration), rss_start)
+    summary['users'] = users
+    return {'summary': summary, 'timeline': recorder.timeline}
+
+
+async def run_load_test(target, bot_type: str = 'nlp', user_levels: List[int] = (50,),
+                        duration: float = DEFAULT_DURATION, think: float = DEFAULT_THINK,
+                        turns: int = DEFAULT_TURNS, ramp: float = None, interval: float = DEFAULT_INTERVAL,
+                        mix: Dict[str, float] = None, seed: int = 0, quiet: bool = False) -> Dict[str, Any]:
+    """Run every user level against target and return the results document."""
+    message_mix = MessageMix(mix)
+    ramp = ramp if ramp is not None else min(think, duration / 4)
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'target': target.label,
+            'target_kind': target.kind,
+            'bot': bot_type,
+            'duration': duration,
+            'think': think,
+            'turns': turns,
+            'ramp': ramp,
+            'mix': dict(zip(message_mix.categories, message_mix.weights)),
+            'seed': seed
+        },
+        'levels': []
+    }
+    try:
+        for users in user_levels:
+            if not quiet:
+                print(f"👥 {users} users")
+            level = await run_level(target, message_mix, bot_type, users, duration, think, turns,
+                                    ramp, interval, seed, quiet)
+            results['levels'].append(level)
+    finally:
+        await target.close()
+    return results
+
+
+def incomparable(baseline: Dict[str, Any], bot_type: str, target_kind: str) -> Optional[str]:
+    """Why a run of bot_type against a target_kind target cannot be compared with baseline, or None."""
+    meta = baseline.get('meta', {})
+    if meta.get('bot') != bot_type:
+        return f"the baseline was recorded with the {meta.get('bot')} bot, not {bot_type}"
+    if meta.get('target_kind') != target_kind:
+        return f"the baseline target was {meta.get('target_kind', 'not recorded')}, not {target_kind}"
+    return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every user level that did worse than the same level in the baseline by more than tolerance."""
+    before_levels = {level['summary']['users']: level['summary'] for level in baseline.get('levels', ())}
+    regressions = []
+    for level in results['levels']:
+        stats = level['summary']
+        before = before_levels.get(stats['users'])
+        if not before:
+            continue
+        name = f"{stats['users']} users"
+        if stats['turns_per_sec'] < before['turns_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {stats['turns_per_sec']:,.1f} turns/s vs {before['turns_per_sec']:,.1f} baseline")
+        if stats['p99_ms'] > before['p99_ms'] * (1 + tolerance) * 2:
+            # p99 is noisy, so it only fails at twice the tolerance
+            regressions.append(f"{name}: p99 {stats['p99_ms']:.2f} ms vs {before['p99_ms']:.2f} ms baseline")
+        if stats['error_rate'] > before['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {stats['error_rate']:.2%} vs {before['error_rate']:.2%} baseline")
+        growth, before_growth = stats.get('rss_growth_mib'), before.get('rss_growth_mib')
+        if growth is not None and before_growth is not None and growth > max(before_growth, 0) * (1 + tolerance) + 8:
+            regressions.append(f"{name}: RSS grew {growth:,.1f} MiB vs {before_growth:,.1f} MiB baseline")
+    return regressions
+
+
+def print_summary(results: Dict[str, Any]):
+    print("=" * 100)
+    print(f"   {'Users':>6} {'Turns/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Errors':>8} {'RSS growth':>12}")
+    for level in results['levels']:
+        stats = level['summary']
+        growth = f"{stats['rss_growth_mib']:+.1f} MiB" if stats['rss_growth_mib'] is not None else 'n/a'
+        print(f"   {stats['users']:>6} {stats['turns_per_sec']:>10,.1f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['error_rate']:>8.2%} {growth:>12}")
+
+
+def main():
+    """Run the load test, optionally save results and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat users and measure what the host sustains.")
+    parser.add_argument('--bot', choices=('simple', 'enhanced', 'nlp'), default='nlp')
+    parser.add_argument('--users', default=DEFAULT_USERS,
+                        help=f"concurrent users, or a comma-separated list of levels to step through (default: {DEFAULT_USERS})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f"seconds per level (default: {DEFAULT_DURATION:g})")
+    parser.add_argument('--think', type=float, default=DEFAULT_THINK,
+                        help=f"mean seconds between a reply and the user's next message; 0 sends back to back (default: {DEFAULT_THINK:g})")
+    parser.add_argument('--turns', type=int, default=DEFAULT_TURNS,
+                        help=f"messages per conversation before the user starts a new one (default: {DEFAULT_TURNS})")
+    parser.add_argument('--ramp', type=float, help="seconds over which users join (default: the think time)")
+    parser.add_argument('--mix', help="category weights, e.g. greeting=1,intent=3,remember=1,emotion=3,ramble=1")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="seconds per timeline row (default: 1)")
+    parser.add_argument('--seed', type=int, default=0, help="message and think-time seed (default: 0)")
+    target_group = parser.add_mutually_exclusive_group()
+    target_group.add_argument('--server', action='store_true', help="start chat_server.py for the run and load it over HTTP")
+    target_group.add_argument('--url', help="load an already running chat server, e.g. http://127.0.0.1:8765")
+    parser.add_argument('--server-workers', type=int, default=4, help="thread pool size for --server (default: 4)")
+    parser.add_argument('--server-pid', type=int, help="process to sample RSS from with --url")
+    parser.add_argument('--json', metavar='FILE', help="write the results to FILE as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against results saved with --json")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown before a level fails (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    try:
+        user_levels = [int(users) for users in args.users.split(',')]
+        mix = parse_mix(args.mix) if args.mix else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        target_kind = 'url' if args.url else 'server' if args.server else 'in-process'
+        reason = incomparable(baseline, args.bot, target_kind)
+        if reason:
+            parser.error(f"cannot compare with {args.baseline}: {reason}")
+
+    if args.url:
+        match = re.match(r'^(?:http://)?([^:/]+):(\d+)/?$', args.url)
+        if not match:
+            parser.error(f"expected --url http://host:port, got {args.url!r}")
+        target = HTTPTarget(match.group(1), int(match.group(2)), args.server_pid)
+    elif args.server:
+        target = HTTPTarget.start_local(args.server_workers)
+    else:
+        target = InProcessTarget()
+
+    print(f"🚦 Load test: {args.bot} bot via {target.label}, {args.duration:g}s per level, "
+          f"think {args.think:g}s, {args.turns} turns per conversation")
+    print("=" * 100)
+    try:
+        results = asyncio.run(run_load_test(target, args.bot, user_levels, args.duration, args.think,
+                                            args.turns, args.ramp, args.interval, mix, args.seed))
+    except KeyboardInterrupt:
+        print("\n👋 Load test interrupted.")
+        sys.exit(130)
+    print_summary(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Message Corpus
+Seeded generators of chat messages shared by the benchmarks, the load test and the intent model.
+
+realistic_corpus fills templates shaped like real conversation turns
+(distinct_corpus extends them so that none repeats), synthetic_corpus
+strings pseudo-words together with occasional intent triggers, and
+MessageMix draws weighted categories of messages built from the bots' own
+intent patterns and the emotion lexicon. Everything takes a seed or a
+Random, so the same arguments always give the same messages.
+"""
+
+import random
+import re
+from typing import Any, Dict, List, Tuple
+
+from emotion_matcher import read_emotion_lexicon
+
+NAMES = ['Alice', 'Bob', 'Carmen', 'Dmitri', 'Esther', 'Farid', 'Grace', 'Hiro']
+TOPICS = ['my garden', 'the new job', 'python decorators', 'our trip to Lisbon', 'the football match',
+          'my sister', 'learning piano', 'the budget meeting', 'a sourdough recipe', 'moving house']
+FILLER = ['so', 'anyway', 'honestly', 'and then', 'I guess', 'you know', 'which is funny because',
+          'but', 'also', 'the thing is']
+FEELINGS = ['happy', 'excited', 'sad', 'worried', 'frustrated', 'nervous', 'thrilled', 'a bit down']
+WEATHER = ['sunny', 'rainy', 'cloudy', 'hot', 'cold']
+
+# Shapes of real conversation turns, filled in from the lists above
+TEMPLATES = [
+    "Hi, my name is {name}",
+    "hello there",
+    "How are you doing today?",
+    "I'm feeling {feeling} about {topic}",
+    "What do you think about {topic}?",
+    "Do you remember what I said about {topic}?",
+    "The weather is so {weather} today",
+    "You are an amazing bot, thank you!",
+    "I can't stop thinking about {topic} and it makes me {feeling}",
+    "Can you help me figure out {topic}?",
+    "I went out with {name} yesterday and we talked about {topic} for hours",
+    "Honestly I don't know what to say",
+    "bye for now, see you later",
+]
+
+# Words that trigger intents in the synthetic corpus
+TRIGGER_WORDS = ['hello', 'help', 'weather', 'bye', 'remember', 'happy', 'angry', 'scared', 'great', 'you', '?']
+
+CATEGORIES = ('greeting', 'intent', 'remember', 'emotion', 'ramble')
+DEFAULT_MIX = {'greeting': 1, 'intent': 3, 'remember': 1, 'emotion': 3, 'ramble': 1}
+
+# Plain alternatives inside a pattern's groups, e.g. (hello|hi|hey)
+_ALTERNATION = re.compile(r"\(((?:[a-z ]|\\')+(?:\|(?:[a-z ]|\\')+)+)\)")
+
+
+def pattern_phrases(patterns: Dict[str, Any]) -> Dict[str, List[str]]:
+    """The literal phrases each intent pattern matches, from the first (a|b|c) group of each pattern."""
+    phrases: Dict[str, List[str]] = {}
+    for intent, sources in patterns.items():
+        for source in ([sources] if isinstance(sources, str) else sources):
+            group = _ALTERNATION.search(source)
+            if group:
+                phrases.setdefault(intent, []).extend(
+                    phrase.replace("\\'", "'") for phrase in group.group(1).split('|'))
+    return phrases
+
+
+def intent_vocabulary() -> Dict[str, List[str]]:
+    """Phrases from all three bots' intent patterns, merged by intent name."""
+    from simple_chatbot import PATTERNS as SIMPLE_PATTERNS
+    from enhanced_chatbot import PATTERNS as ENHANCED_PATTERNS
+    from nlp_chatbot import INTENT_PATTERNS
+    vocabulary: Dict[str, List[str]] = {}
+    for patterns in (SIMPLE_PATTERNS, ENHANCED_PATTERNS, INTENT_PATTERNS):
+        for intent, phrases in pattern_phrases(patterns).items():
+            known = vocabulary.setdefault(intent.rstrip('s'), [])
+            known.extend(phrase for phrase in phrases if phrase not in known)
+    return vocabulary
+
+
+class MessageMix:
+    """Draws messages of weighted categories; every user passes its own Random."""
+
+    def __init__(self, weights: Dict[str, float] = None):
+        weights = weights or DEFAULT_MIX
+        self.categories = [name for name in CATEGORIES if weights.get(name)]
+        self.weights = [weights[name] for name in self.categories]
+        vocabulary = intent_vocabulary()
+        self.greetings = vocabulary.pop('greeting')
+        self.introductions = vocabulary.pop('name_response')
+        self.memory = vocabulary.pop('remember')
+        vocabulary.pop('goodbye', None)  # a goodbye mid-conversation is not a realistic turn
+        self.intents = [phrase for phrases in vocabulary.values() for phrase in phrases]
+        # Adjectives and nouns only: "I feel so sadly" is not something users say
+        self.feelings = [term for term, _ in read_emotion_lexicon() if not term.endswith('ly')]
+
+    def greeting(self, rng: random.Random) -> str:
+        greeting = rng.choice(self.greetings).capitalize()
+        if rng.random() < 0.5:
+            return f"{greeting}, {rng.choice(self.introductions)} {rng.choice(NAMES)}"
+        return f"{greeting}!"
+
+    def emotion(self, rng: random.Random) -> str:
+        return f"I feel so {rng.choice(self.feelings)} about {rng.choice(TOPICS)}"
+
+    def message(self, rng: random.Random, category: str = None) -> Tuple[str, str]:
+        """A (category, text) pair; category is drawn from the mix unless given."""
+        category = category or rng.choices(self.categories, self.weights)[0]
+        if category == 'greeting':
+            return category, self.greeting(rng)
+        if category == 'intent':
+            return category, f"{rng.choice(self.intents).capitalize()}? I was thinking about {rng.choice(TOPICS)}"
+        if category == 'remember':
+            phrase = rng.choice(self.memory)
+            if ' ' not in phrase and phrase not in ('earlier', 'before'):
+                return category, f"Do you {phrase} what I said about {rng.choice(TOPICS)}?"
+            return category, f"Going back to {rng.choice(TOPICS)} like {phrase}, what did I tell you?"
+        if category == 'emotion':
+            return category, self.emotion(rng)
+        sentences = []
+        for _ in range(rng.randint(4, 10)):
+            sentences.append(f"{rng.choice(FILLER).capitalize()} {rng.choice(TOPICS)} "
+                             f"{rng.choice(('made me', 'keeps me', 'left me'))} {rng.choice(self.feelings)}")
+        return 'ramble', '. '.join(sentences) + '.'
+
+
+def _pseudo_vocabulary(rng: random.Random, size: int = 3000) -> List[str]:
+    syllables = ['ka', 'lo', 'mi', 'ren', 'sto', 'vu', 'pel', 'dra', 'zin', 'ot', 'bre', 'quo']
+    return [''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def synthetic_corpus(size: int, seed: int) -> List[str]:
+    """Random messages over a pseudo-word vocabulary, with occasional intent triggers."""
+    rng = random.Random(seed)
+    vocabulary = _pseudo_vocabulary(rng)
+    messages = []
+    for _ in range(size):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(3, 25))]
+        if rng.random() < 0.4:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(TRIGGER_WORDS))
+        messages.append(' '.join(words))
+    return messages
+
+
+def realistic_corpus(size: int, seed: int) -> List[str]:
+    """Template-based messages resembling real chat turns."""
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(name=rng.choice(NAMES), topic=rng.choice(TOPICS),
+                                     feeling=rng.choice(FEELINGS), weather=rng.choice(WEATHER))
+        for _ in range(size)
+    ]
+
+
+def distinct_corpus(size: int, seed: int) -> List[str]:
+    """
+    size different chat turns: a template turn followed by a message from the default MessageMix.
+
+    realistic_corpus repeats a few hundred texts, so anything cached by text
+    mostly measures cache hits on it; no text here repeats.
+    """
+    rng = random.Random(seed)
+    turns = realistic_corpus(size, seed)
+    mix = MessageMix()
+    messages = []
+    seen = set()
+    while len(messages) < size:
+        text = f"{turns[len(messages)]} {mix.message(rng)[1]}"
+        if text not in seen:
+            seen.add(text)
+            messages.append(text)
+    return messages
+
+
+def synthetic_intents(count: int, seed: int) -> Dict[str, str]:
+    """An intent table of count word-alternation patterns over synthetic_corpus's vocabulary."""
+    vocabulary = _pseudo_vocabulary(random.Random(seed))
+    rng = random.Random(f"intents:{seed}")
+    return {
+        f"intent_{index}": r'\b(' + '|'.join(' '.join(rng.sample(vocabulary, rng.randint(1, 2)))
+                                              for _ in range(3)) + r')\b'
+        for index in range(count)
+    }
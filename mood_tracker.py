@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Mood Tracker
+A streaming mood engine: O(1) updates, EWMA smoothing and time-windowed trends over typed arrays.
+"""
+
+import time
+from array import array
+from datetime import datetime
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Dict, Iterator, Optional
+
+# Sentiment labels are stored as signed bytes instead of strings
+SENTIMENT_CODES = {'negative': -1, 'neutral': 0, 'positive': 1}
+SENTIMENT_LABELS = {code: label for label, code in SENTIMENT_CODES.items()}
+
+DEFAULT_MAX_SAMPLES = 1000
+
+# Average score at or beyond which the overall mood is positive/negative
+MOOD_THRESHOLD = 0.1
+# How far two averages must differ to count as improving/declining
+TREND_THRESHOLD = 0.1
+# The original "recent" window: the last three messages
+RECENT_WINDOW = 3
+
+
+def classify_mood(score: float) -> str:
+    if score >= MOOD_THRESHOLD:
+        return 'positive'
+    if score <= -MOOD_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def classify_trend(recent: float, earlier: float) -> str:
+    if recent > earlier + TREND_THRESHOLD:
+        return 'improving'
+    if recent < earlier - TREND_THRESHOLD:
+        return 'declining'
+    return 'stable'
+
+
+class MoodTracker:
+    """
+    Track sentiment scores for a session as a stream.
+
+    Each sample updates the all-time total, an exponentially weighted moving
+    average and a running prefix sum, all in O(1). Timestamps, scores, labels
+    and prefix sums live in parallel typed arrays holding the latest
+    max_samples (or up to twice that between trims), so "trend over the last
+    N minutes" is a binary search plus two prefix-sum lookups.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES, ewma_alpha: float = 0.3):
+        self.max_samples = max_samples
+        self.ewma_alpha = ewma_alpha
+        self.times = array('d')
+        self.scores = array('d')
+        self.codes = array('b')
+        self._prefix = array('d')  # all-time cumulative score up to and including each sample
+        self._base = 0.0           # cumulative score before the first retained sample
+        self.total = 0.0
+        self.count = 0
+        self.ewma: Optional[float] = None
+
+    def add(self, score: float, sentiment: str = None, timestamp: float = None):
+        """Record one message's sentiment score."""
+        if sentiment is None:
+            sentiment = classify_mood(score)
+        self.times.append(timestamp if timestamp is not None else time.time())
+        self.scores.append(score)
+        self.codes.append(SENTIMENT_CODES.get(sentiment, 0))
+        self.total += score
+        self.count += 1
+        self._prefix.append(self.total)
+        self.ewma = score if self.ewma is None else self.ewma + self.ewma_alpha * (score - self.ewma)
+
+        # Trim in bulk so each sample pays O(1) amortized
+        if len(self.times) > 2 * self.max_samples:
+            cut = len(self.times) - self.max_samples
+            self._base = self._prefix[cut - 1]
+            for column in (self.times, self.scores, self.codes, self._prefix):
+                del column[:cut]
+
+    def _sum_from(self, index: int) -> float:
+        """Sum of retained scores from index to the end."""
+        start = self._prefix[index - 1] if index > 0 else self._base
+        return self._prefix[-1] - start
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Retained samples in the mood_history dict shape."""
+        for timestamp, score, code in zip(self.times, self.scores, self.codes):
+            yield {
+                'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                'sentiment': SENTIMENT_LABELS[code],
+                'score': score
+            }
+
+    def get_trend(self, minutes: float, now: float = None) -> Dict[str, Any]:
+        """
+        Compare the average over the last `minutes` with everything before it.
+
+        The window can reach back at most max_samples messages.
+        """
+        now = now if now is not None else time.time()
+        index = bisect_left(self.times, now - minutes * 60)
+        window_count = len(self.times) - index
+        if not window_count:
+            return {'window_minutes': minutes, 'samples': 0, 'average': None, 'mood_trend': 'insufficient_data'}
+        window_total = self._sum_from(index)
+        window_average = window_total / window_count
+        earlier_count = self.count - window_count
+        if earlier_count:
+            trend = classify_trend(window_average, (self.total - window_total) / earlier_count)
+        else:
+            trend = 'insufficient_data'
+        return {
+            'window_minutes': minutes,
+            'samples': window_count,
+            'average': window_average,
+            'mood_trend': trend
+        }
+
+    def get_analysis(self) -> Dict[str, Any]:
+        """Overall mood in the get_mood_analysis shape, plus the smoothed score."""
+        if not self.count:
+            return {'average_sentiment': 'neutral', 'mood_trend': 'stable'}
+
+        average = self.total / self.count
+        if self.count >= RECENT_WINDOW and len(self.scores) >= RECENT_WINDOW:
+            recent_total = self._sum_from(len(self.scores) - RECENT_WINDOW)
+            earlier = (self.total - recent_total) / max(1, self.count - RECENT_WINDOW)
+            trend = classify_trend(recent_total / RECENT_WINDOW, earlier)
+        else:
+            trend = 'insufficient_data'
+
+        return {
+            'average_sentiment': classify_mood(average),
+            'mood_trend': trend,
+            'sentiment_score': average,
+            'ewma_score': self.ewma,
+            'ewma_sentiment': classify_mood(self.ewma)
+        }
+
+    def get_state(self) -> Dict[str, Any]:
+        """Running totals needed to rebuild the tracker alongside its arrays."""
+        return {'mood_total': self.total, 'mood_count': self.count, 'mood_ewma': self.ewma}
+
+    @classmethod
+    def from_arrays(cls, times, scores, codes, state: Dict[str, Any] = None,
+                    max_samples: int = DEFAULT_MAX_SAMPLES) -> 'MoodTracker':
+        """Rebuild a tracker from saved arrays and (optionally) its running totals."""
+        tracker = cls(max_samples)
+        # Built column-wise rather than through add(): restoring a session should not replay it
+        tracker.times = array('d', times or ())
+        tracker.scores = array('d', scores or ())
+        tracker.codes = array('b', codes or ())
+        tracker._prefix = array('d', accumulate(tracker.scores))
+        tracker.count = len(tracker.scores)
+        if tracker.count:
+            tracker.total = tracker._prefix[-1]
+            ewma = tracker.scores[0]
+            if not state or state.get('mood_ewma') is None:
+                for score in tracker.scores:
+                    ewma += tracker.ewma_alpha * (score - ewma)
+            tracker.ewma = ewma
+        # Same retention as add(): trimmed back to max_samples once it passes twice that
+        if tracker.count > 2 * max_samples:
+            cut = tracker.count - max_samples
+            tracker._base = tracker._prefix[cut - 1]
+            for column in (tracker.times, tracker.scores, tracker.codes, tracker._prefix):
+                del column[:cut]
+        if state and 'mood_count' in state:
+            # Older samples only exist in the totals; treat them as already trimmed
+            offset = state['mood_total'] - tracker.total
+            tracker.total = state['mood_total']
+            tracker.count = max(state['mood_count'], tracker.count)
+            tracker.ewma = state.get('mood_ewma', tracker.ewma)
+            tracker._base += offset
+            tracker._prefix = array('d', (value + offset for value in tracker._prefix))
+        return tracker
@@ -4,374 +4,764 @@ NLP-Powered Advanced Chatbot
 A sophisticated chatbot using natural language processing libraries for better understanding.
 """
 
+import os
 import re
 import random
 import json
+import threading
+from array import array
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
-
-# Check for optional NLP libraries
-try:
-    import nltk
-    from nltk.tokenize import word_tokenize, sent_tokenize
-    from nltk.corpus import stopwords
-    from nltk.stem import WordNetLemmatizer
-    from nltk.sentiment import SentimentIntensityAnalyzer
-    NLTK_AVAILABLE = True
-except ImportError:
-    NLTK_AVAILABLE = False
-
-try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
-except ImportError:
-    TEXTBLOB_AVAILABLE = False
+from typing import Dict, List, Any, Tuple, Iterable
+
+from bot_definitions import get_definition, session_rng
+from analysis_cache import AnalysisCache, get_shared_cache
+from session_store import SessionState
+from session_snapshot import DEFAULT_RESTORE_TAIL, SessionSnapshot, SnapshotError, encode_state
+from transcript_log import DEFAULT_LOG_DIR, get_transcript_logger
+from conversation_archive import ConversationArchive, get_archive, new_session_id
+from mood_tracker import MoodTracker, SENTIMENT_CODES, SENTIMENT_LABELS
+from conversation_history import ConversationHistory, DEFAULT_HISTORY_LIMIT
+from instrumentation import format_stage_table, instrument, instrumentation_enabled
+from lexicon_sentiment import LexiconSentimentAnalyzer, get_lexicon_analyzer
+from emotion_matcher import get_emotion_matcher
+from keyword_extractor import DEFAULT_KEYWORD_LIMIT, KeywordExtractor, get_keyword_extractor
+from intent_classifier import DEFAULT_THRESHOLD, IntentClassifier, get_intent_classifier
+from intent_matcher import GENERAL_INTENT, IntentMatch
+from nlp_pool import ALLOW_DOWNLOAD, LAZY_LOAD, NLTK_AVAILABLE, NLPPool, get_nlp_pool
+
+# VADER compound score thresholds (shared by single-message and batch scoring)
+SENTIMENT_POSITIVE_THRESHOLD = 0.05
+SENTIMENT_NEGATIVE_THRESHOLD = -0.05
+
+def classify_scores(scores: List[float]) -> List[str]:
+    """Map compound sentiment scores to positive/negative/neutral labels."""
+    return ['positive' if score >= SENTIMENT_POSITIVE_THRESHOLD
+            else 'negative' if score <= SENTIMENT_NEGATIVE_THRESHOLD
+            else 'neutral'
+            for score in scores]
+
+_UNSET = object()
+
+class MessageAnalysis:
+    """
+    NLP analysis of one user message, built once per turn and shared by every stage.
+    
+    Each field is computed lazily on first access and then reused, so a turn never
+    analyzes the same text twice and response paths that never look at a field
+    (keywords on a greeting, emotions on a question) never pay for it.
+    """
+
+    def __init__(self, bot: 'NLPChatBot', text: str):
+        self.bot = bot
+        self.text = text.strip()
+        self._lower = None
+        self._tokens = None
+        self._sentiment = None
+        self._intent_match = _UNSET
+        self._name = _UNSET
+        self._emotions = None
+        self._keywords = None
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._tokens is None:
+            self._tokens = self.bot.tokenize(self.lower)
+        return self._tokens
+
+    @property
+    def sentiment(self) -> Tuple[str, float]:
+        if self._sentiment is None:
+            self._sentiment = self.bot.analyze_sentiment(self.text)
+        return self._sentiment
+
+    @property
+    def intent_match(self):
+        if self._intent_match is _UNSET:
+            self._intent_match = self.bot.match_intent(self.text)
+        return self._intent_match
+
+    @property
+    def intent(self) -> str:
+        return self.intent_match.intent if self.intent_match else GENERAL_INTENT
+
+    @property
+    def name(self) -> str:
+        if self._name is _UNSET:
+            match = self.intent_match
+            # Only rescan when some higher-priority intent shadowed name_response
+            if match and match.intent != 'name_response':
+                match = self.bot.matcher.match(self.text, prefer=('name_response',))
+            if match and match.intent == 'name_response':
+                self._name = match.group(2).capitalize()
+            else:
+                self._name = None
+        return self._name
+
+    @property
+    def emotions(self) -> List[str]:
+        if self._emotions is None:
+            self._emotions = self.bot.detect_emotions(self.lower)
+        return self._emotions
+
+    @property
+    def keywords(self) -> List[str]:
+        if self._keywords is None:
+            self._keywords = self.bot.extract_keywords(self.text)
+        return self._keywords
+
+# Extended response patterns with sentiment-aware responses
+RESPONSES = {
+    'greetings': {
+        'positive': [
+            "Hello{name}! You seem to be in a great mood! How can I help you today?",
+            "Hi there{name}! I can sense your positive energy. What's making you happy?",
+            "Hey{name}! Your enthusiasm is contagious! What's on your mind?"
+        ],
+        'neutral': [
+            "Hello{name}! How can I help you today?",
+            "Hi there{name}! What's on your mind?",
+            "Hey{name}! Nice to see you!"
+        ],
+        'negative': [
+            "Hello{name}. I sense you might be having a tough time. I'm here to listen.",
+            "Hi{name}. How are you feeling? Sometimes it helps to talk.",
+            "Hey{name}. I'm here for you. What's troubling you?"
+        ]
+    },
+    'how_are_you': {
+        'positive': [
+            "I'm doing fantastic! It's wonderful to chat with someone so upbeat!",
+            "I'm great! Your positive attitude is really brightening my day!",
+            "I'm doing excellent! How has your day been treating you?"
+        ],
+        'neutral': [
+            "I'm doing well, thank you for asking! How are you?",
+            "I'm good! How about you? How's your day going?",
+            "I'm fine, thanks! What's been happening with you?"
+        ],
+        'negative': [
+            "I'm doing okay. More importantly, how are you holding up?",
+            "I'm alright. I'm sorry if you're going through a difficult time.",
+            "I'm here and ready to listen. How can I support you today?"
+        ]
+    },
+    'compliments': [
+        "Thank you so much{name}! That's very kind of you to say.",
+        "That's really sweet{name}! You've made my day brighter.",
+        "I appreciate that{name}! You're pretty awesome yourself!"
+    ],
+    'questions': [
+        "That's a thoughtful question{name}! Let me think about that...",
+        "Interesting question{name}! I'd love to explore that with you.",
+        "Great question{name}! What's your take on it?"
+    ],
+    'emotions': {
+        'joy': [
+            "That's wonderful{name}! I'm so happy to hear that!",
+            "How exciting{name}! I love your enthusiasm!",
+            "That's fantastic{name}! Your joy is infectious!"
+        ],
+        'sadness': [
+            "I'm sorry you're feeling this way{name}. It's okay to feel sad sometimes.",
+            "That sounds difficult{name}. Would you like to talk about it?",
+            "I understand{name}. Sometimes life can be challenging."
+        ],
+        'anger': [
+            "I can sense your frustration{name}. Take a deep breath.",
+            "That sounds really frustrating{name}. What's bothering you?",
+            "I understand you're upset{name}. Let's work through this together."
+        ],
+        'fear': [
+            "It's natural to feel scared sometimes{name}. You're not alone.",
+            "I understand your concerns{name}. What's making you anxious?",
+            "Fear can be overwhelming{name}. What can I do to help?"
+        ],
+        'surprise': [
+            "Wow, that sounds unexpected{name}! How did you react?",
+            "That must have caught you off guard{name}. Tell me more!",
+            "What a surprise{name}! Did you see it coming at all?"
+        ],
+        'disgust': [
+            "That sounds really unpleasant{name}. What happened?",
+            "Ugh, I can see why that put you off{name}.",
+            "That doesn't sound nice at all{name}. Want to talk about it?"
+        ]
+    },
+    'goodbye': [
+        "Goodbye{name}! It's been wonderful chatting with you!",
+        "Take care{name}! I've really enjoyed our conversation!",
+        "Farewell{name}! Thanks for the great chat!"
+    ],
+    'default': [
+        "That's interesting{name}! Tell me more about your thoughts on that.",
+        "I see{name}. What's your perspective on this?",
+        "Fascinating{name}! I'd love to hear more about your experience."
+    ]
+}
+
+# Intent patterns in priority order
+INTENT_PATTERNS = {
+    'greeting': [r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b'],
+    'how_are_you': [r'\b(how are you|how\'re you|how do you feel|what\'s up)\b'],
+    'name_question': [r'\b(what\'s your name|your name|who are you|what are you called)\b'],
+    'name_response': [r'\b(my name is|i\'m|call me|i am)\s+(\w+)'],
+    'compliment': [r'\b(good|great|awesome|amazing|wonderful|fantastic|nice|excellent)\b.*\b(bot|chatbot|you)\b'],
+    'question': [r'\?'],
+    'goodbye': [r'\b(bye|goodbye|see you|farewell|exit|quit)\b'],
+    'help': [r'\b(help|what can you do|commands|assist)\b'],
+}
+
+# Intents whose handling reads the pattern's capture groups, so the classifier
+# cannot stand in for their patterns
+CAPTURING_INTENTS = ('name_response',)
 
 class NLPChatBot:
-    def __init__(self):
-        self.name = "NLP ChatBot"
+    # Methods timed by instrument(), by stage name. "lemmatize" is the part of
+    # keyword extraction before ranking: tokenizing, stopword filtering and lemmas.
+    STAGES = {
+        'analyze_sentiment': 'sentiment',
+        'match_intent': 'intent',
+        'detect_intent': 'detect_intent',
+        'detect_emotions': 'emotions',
+        'tokenize': 'tokenize',
+        'extract_keywords': 'keywords',
+        '_extract_keywords': 'lemmatize',
+        'format_response': 'format',
+        'get_response': 'response',
+        'add_to_history': 'history'
+    }
+
+    def __init__(self, cache: AnalysisCache = None, lazy: bool = None, allow_download: bool = None,
+                 history_limit: int = DEFAULT_HISTORY_LIMIT, seed: int = None,
+                 intent_classifier: IntentClassifier = None, intent_threshold: float = DEFAULT_THRESHOLD,
+                 nlp_pool: NLPPool = None):
+        # Tables are built once per process and shared read-only by every instance
+        self.definition = get_definition('nlp', "NLP ChatBot", RESPONSES, INTENT_PATTERNS)
+        self.name = self.definition.name
+        self.responses = self.definition.responses
+        self.intent_patterns = self.definition.patterns
+        self.matcher = self.definition.matcher
+        # Each session draws responses from its own generator
+        self.rng = session_rng(seed)
         self.user_name = None
-        self.conversation_history = []
+        # Only the latest history_limit turns are kept; older ones live on in running totals
+        self.history_limit = history_limit
+        self.conversation_history = ConversationHistory(history_limit)
         self.user_info = {}
         self.session_start = datetime.now()
-        self.mood_history = []
+        self.transcript = None
+        self.instrumentation = None
+        self.mood = MoodTracker(history_limit)
+        # (snapshot, count) of turns restore() has not decoded yet
+        self._older_history = None
         
-        # Initialize NLP components if available
-        if NLTK_AVAILABLE:
+        # NLP components live in a process-wide pool, built on first use in lazy mode
+        # and by the first session otherwise; later sessions share them as they are.
+        # Downloads are opt-in (CHATBOT_NLTK_DOWNLOAD=1) so production never hits the network.
+        self.nlp = nlp_pool if nlp_pool is not None else get_nlp_pool()
+        self.lazy = lazy if lazy is not None else LAZY_LOAD
+        self.nlp_enabled = self.nlp.available(allow_download if allow_download is not None else ALLOW_DOWNLOAD)
+        if self.nlp_enabled and not self.lazy:
+            self._load_components()
+        
+        # Per-text analysis results are cached process-wide unless a cache is given
+        self.cache = cache if cache is not None else get_shared_cache()
+        
+        # Whole-word emotion lexicon, shared by every bot in the process
+        self.emotion_matcher = get_emotion_matcher()
+        
+        # Optional trained intent model (CHATBOT_INTENT_MODEL), consulted before the regexes
+        if intent_classifier is None:
             try:
-                # Download required NLTK data
-                self._setup_nltk()
-                self.lemmatizer = WordNetLemmatizer()
-                self.sentiment_analyzer = SentimentIntensityAnalyzer()
-                self.stop_words = set(stopwords.words('english'))
-                self.nlp_enabled = True
-            except Exception as e:
-                print(f"Warning: NLTK setup failed: {e}")
-                self.nlp_enabled = False
-        else:
+                intent_classifier = get_intent_classifier()
+            except (OSError, ValueError) as e:
+                print(f"Warning: intent model could not be loaded: {e}")
+        self.intent_classifier = intent_classifier
+        self.intent_threshold = intent_threshold
+        self._intent_kind = (f"intent:{intent_classifier.fingerprint}:{intent_threshold:g}"
+                             if intent_classifier is not None else 'intent')
+        
+        if instrumentation_enabled():
+            instrument(self)
+
+    def _load_components(self) -> Dict[str, Any]:
+        """The pool's lemmatizer, VADER analyzer and stopword set, built once per process."""
+        if not self.nlp_enabled:
+            return {}
+        components = self.nlp.components()
+        if not components:
             self.nlp_enabled = False
+        return components
+
+    @property
+    def lemmatizer(self):
+        return self._load_components().get('lemmatizer')
+
+    @property
+    def sentiment_analyzer(self):
+        return self._load_components().get('sentiment_analyzer')
+
+    @property
+    def stop_words(self):
+        return self._load_components().get('stop_words')
+
+    @property
+    def cache_namespace(self) -> str:
+        # Results depend on whether NLP is enabled, so that is part of the cache key
+        return f"{type(self).__name__}:{'nlp' if self.nlp_enabled else 'basic'}"
+
+    def warm_up(self, background: bool = True):
+        """
+        Load the shared NLP components (and the punkt tokenizer) ahead of the first message.
         
-        # Extended response patterns with sentiment-aware responses
-        self.responses = {
-            'greetings': {
-                'positive': [
-                    "Hello{name}! You seem to be in a great mood! How can I help you today?",
-                    "Hi there{name}! I can sense your positive energy. What's making you happy?",
-                    "Hey{name}! Your enthusiasm is contagious! What's on your mind?"
-                ],
-                'neutral': [
-                    "Hello{name}! How can I help you today?",
-                    "Hi there{name}! What's on your mind?",
-                    "Hey{name}! Nice to see you!"
-                ],
-                'negative': [
-                    "Hello{name}. I sense you might be having a tough time. I'm here to listen.",
-                    "Hi{name}. How are you feeling? Sometimes it helps to talk.",
-                    "Hey{name}. I'm here for you. What's troubling you?"
-                ]
-            },
-            'how_are_you': {
-                'positive': [
-                    "I'm doing fantastic! It's wonderful to chat with someone so upbeat!",
-                    "I'm great! Your positive attitude is really brightening my day!",
-                    "I'm doing excellent! How has your day been treating you?"
-                ],
-                'neutral': [
-                    "I'm doing well, thank you for asking! How are you?",
-                    "I'm good! How about you? How's your day going?",
-                    "I'm fine, thanks! What's been happening with you?"
-                ],
-                'negative': [
-                    "I'm doing okay. More importantly, how are you holding up?",
-                    "I'm alright. I'm sorry if you're going through a difficult time.",
-                    "I'm here and ready to listen. How can I support you today?"
-                ]
-            },
-            'compliments': [
-                "Thank you so much{name}! That's very kind of you to say.",
-                "That's really sweet{name}! You've made my day brighter.",
-                "I appreciate that{name}! You're pretty awesome yourself!"
-            ],
-            'questions': [
-                "That's a thoughtful question{name}! Let me think about that...",
-                "Interesting question{name}! I'd love to explore that with you.",
-                "Great question{name}! What's your take on it?"
-            ],
-            'emotions': {
-                'joy': [
-                    "That's wonderful{name}! I'm so happy to hear that!",
-                    "How exciting{name}! I love your enthusiasm!",
-                    "That's fantastic{name}! Your joy is infectious!"
-                ],
-                'sadness': [
-                    "I'm sorry you're feeling this way{name}. It's okay to feel sad sometimes.",
-                    "That sounds difficult{name}. Would you like to talk about it?",
-                    "I understand{name}. Sometimes life can be challenging."
-                ],
-                'anger': [
-                    "I can sense your frustration{name}. Take a deep breath.",
-                    "That sounds really frustrating{name}. What's bothering you?",
-                    "I understand you're upset{name}. Let's work through this together."
-                ],
-                'fear': [
-                    "It's natural to feel scared sometimes{name}. You're not alone.",
-                    "I understand your concerns{name}. What's making you anxious?",
-                    "Fear can be overwhelming{name}. What can I do to help?"
-                ]
-            },
-            'goodbye': [
-                "Goodbye{name}! It's been wonderful chatting with you!",
-                "Take care{name}! I've really enjoyed our conversation!",
-                "Farewell{name}! Thanks for the great chat!"
-            ],
-            'default': [
-                "That's interesting{name}! Tell me more about your thoughts on that.",
-                "I see{name}. What's your perspective on this?",
-                "Fascinating{name}! I'd love to hear more about your experience."
-            ]
-        }
+        With background=True the work runs on a daemon thread, which is returned.
+        """
+        def load():
+            if self.nlp_enabled:
+                self._load_components()
         
-        # Intent patterns with improved NLP
-        self.intent_patterns = {
-            'greeting': [r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b'],
-            'how_are_you': [r'\b(how are you|how\'re you|how do you feel|what\'s up)\b'],
-            'name_question': [r'\b(what\'s your name|your name|who are you|what are you called)\b'],
-            'name_response': [r'\b(my name is|i\'m|call me|i am)\s+(\w+)'],
-            'compliment': [r'\b(good|great|awesome|amazing|wonderful|fantastic|nice|excellent)\b.*\b(bot|chatbot|you)\b'],
-            'question': [r'\?'],
-            'goodbye': [r'\b(bye|goodbye|see you|farewell|exit|quit)\b'],
-            'help': [r'\b(help|what can you do|commands|assist)\b'],
-        }
-
-    def _setup_nltk(self):
-        """Setup NLTK by downloading required data."""
-        required_data = ['punkt', 'stopwords', 'wordnet', 'vader_lexicon']
-        for data in required_data:
-            try:
-                nltk.data.find(f'tokenizers/{data}' if data == 'punkt' else f'corpora/{data}' if data in ['stopwords', 'wordnet'] else f'vader_lexicon/{data}')
-            except LookupError:
-                print(f"Downloading NLTK data: {data}")
-                nltk.download(data, quiet=True)
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, name='nlp-warm-up', daemon=True)
+        thread.start()
+        return thread
 
     def analyze_sentiment(self, text: str) -> Tuple[str, float]:
         """Analyze the sentiment of the input text."""
-        if not self.nlp_enabled:
-            return 'neutral', 0.0
-        
+        return self.cache.get_or_compute(self.cache_namespace, 'sentiment', text,
+                                         lambda: self._score_sentiment(text))
+
+    def _score_sentiment(self, text: str) -> Tuple[str, float]:
+        """Score sentiment with VADER, or the built-in lexicon scorer without nltk."""
         try:
-            # Use NLTK's VADER sentiment analyzer
-            scores = self.sentiment_analyzer.polarity_scores(text)
-            compound_score = scores['compound']
-            
-            if compound_score >= 0.05:
-                return 'positive', compound_score
-            elif compound_score <= -0.05:
-                return 'negative', compound_score
-            else:
-                return 'neutral', compound_score
+            scores = self._sentiment_scorer().polarity_scores(text)
         except Exception:
-            # Fallback to TextBlob if available
-            if TEXTBLOB_AVAILABLE:
-                try:
-                    blob = TextBlob(text)
-                    polarity = blob.sentiment.polarity
-                    if polarity > 0.1:
-                        return 'positive', polarity
-                    elif polarity < -0.1:
-                        return 'negative', polarity
-                    else:
-                        return 'neutral', polarity
-                except Exception:
-                    pass
-            return 'neutral', 0.0
+            # VADER failed on this text; the lexicon scorer handles anything
+            scores = get_lexicon_analyzer().polarity_scores(text)
+        compound_score = scores['compound']
+        
+        if compound_score >= SENTIMENT_POSITIVE_THRESHOLD:
+            return 'positive', compound_score
+        elif compound_score <= SENTIMENT_NEGATIVE_THRESHOLD:
+            return 'negative', compound_score
+        else:
+            return 'neutral', compound_score
+
+    def _sentiment_scorer(self):
+        """NLTK's VADER analyzer when available, else the built-in lexicon analyzer."""
+        analyzer = self.sentiment_analyzer if self.nlp_enabled else None
+        return analyzer or get_lexicon_analyzer()
 
-    def extract_keywords(self, text: str) -> List[str]:
-        """Extract keywords from text using NLP techniques."""
+    def tokenize(self, text: str) -> List[str]:
+        """Split text into word tokens."""
         if not self.nlp_enabled:
             return text.split()
-        
         try:
-            tokens = word_tokenize(text.lower())
-            # Remove stopwords and punctuation
-            keywords = [self.lemmatizer.lemmatize(token) for token in tokens 
-                       if token.isalnum() and token not in self.stop_words and len(token) > 2]
-            return keywords[:5]  # Return top 5 keywords
+            from nltk.tokenize import word_tokenize
+            return word_tokenize(text)
         except Exception:
             return text.split()
 
-    def detect_intent(self, text: str) -> str:
-        """Detect user intent from input text."""
-        text = text.lower()
+    def analyze(self, text: str) -> MessageAnalysis:
+        """Start the lazy analysis pipeline for one message."""
+        return MessageAnalysis(self, text)
+
+    def analyze_batch(self, messages: Iterable[str]) -> List[MessageAnalysis]:
+        """
+        Analyze many messages together for offline jobs.
         
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    return intent
+        Duplicate messages are analyzed once and share one MessageAnalysis,
+        and texts already in the analysis cache are not scored again. Without
+        nltk the built-in lexicon scorer scores every remaining text in one
+        call, with its lookups, rules and normalization run as array
+        operations over the whole batch when NumPy is installed. VADER has no
+        batch form, so with nltk sentiment stays one call per distinct
+        uncached text. Results match analyze_sentiment exactly, including the
+        lexicon fallback for texts VADER fails on.
+        """
+        texts = [message.strip() for message in messages]
+        unique = {}
+        for text in texts:
+            if text not in unique:
+                unique[text] = MessageAnalysis(self, text)
         
-        return 'general'
-
-    def detect_emotions(self, text: str) -> List[str]:
-        """Detect emotional keywords in text."""
-        emotion_keywords = {
-            'joy': ['happy', 'excited', 'glad', 'thrilled', 'delighted', 'cheerful'],
-            'sadness': ['sad', 'depressed', 'upset', 'disappointed', 'down', 'blue'],
-            'anger': ['angry', 'mad', 'furious', 'annoyed', 'frustrated', 'irritated'],
-            'fear': ['scared', 'afraid', 'worried', 'anxious', 'nervous', 'frightened']
-        }
+        scored, scores = [], []
+        scorer = self._sentiment_scorer()
+        for text, analysis in unique.items():
+            cached = self.cache.lookup(self.cache_namespace, 'sentiment', text)
+            if cached is not None:
+                analysis._sentiment = cached
+            elif isinstance(scorer, LexiconSentimentAnalyzer):
+                scored.append(analysis)
+            else:
+                try:
+                    scores.append(scorer.polarity_scores(text)['compound'])
+                    scored.append(analysis)
+                except Exception:
+                    analysis._sentiment = self.analyze_sentiment(text)
+        if isinstance(scorer, LexiconSentimentAnalyzer):
+            # The built-in scorer takes the whole batch at once
+            scores = scorer.compound_scores([analysis.text for analysis in scored])
+        for analysis, label, score in zip(scored, classify_scores(scores), scores):
+            analysis._sentiment = (label, score)
+            self.cache.store(self.cache_namespace, 'sentiment', analysis.text, analysis._sentiment)
         
-        text_lower = text.lower()
-        detected_emotions = []
+        # The intent model scores the messages no pattern matches in one vectorized pass
+        if self.intent_classifier is not None:
+            pending = []
+            for analysis in unique.values():
+                if self.cache.lookup(self.cache_namespace, self._intent_kind, analysis.text, _UNSET) is _UNSET:
+                    analysis._intent_match = self.matcher.match(analysis.text)
+                    if analysis._intent_match is None:
+                        pending.append(analysis)
+                    else:
+                        self.cache.store(self.cache_namespace, self._intent_kind, analysis.text, analysis._intent_match)
+            predictions = self.intent_classifier.predict_batch([analysis.text for analysis in pending])
+            for analysis, prediction in zip(pending, predictions):
+                analysis._intent_match = self._predicted_match(analysis.text, prediction)
+                self.cache.store(self.cache_namespace, self._intent_kind, analysis.text, analysis._intent_match)
         
-        for emotion, keywords in emotion_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                detected_emotions.append(emotion)
+        return [unique[text] for text in texts]
+
+    def get_responses(self, messages: Iterable[str], seed: int = None,
+                      batch_size: int = 1000) -> List[str]:
+        """
+        Generate responses for many messages, as if each were sent in turn.
+        
+        Messages are analyzed in batches of batch_size; session state (name,
+        mood history) evolves exactly as with repeated get_response calls.
+        Pass seed to make the random response choices reproducible; without
+        it the bot's own generator is used.
+        """
+        rng = random.Random(seed) if seed is not None else self.rng
+        responses = []
+        batch = []
+        for message in messages:
+            batch.append(message)
+            if len(batch) >= batch_size:
+                responses.extend(self._respond_batch(batch, rng))
+                batch = []
+        if batch:
+            responses.extend(self._respond_batch(batch, rng))
+        return responses
+
+    def _respond_batch(self, messages: List[str], rng: random.Random) -> List[str]:
+        analyses = self.analyze_batch(messages)
+        return [self.get_response(message, analysis, rng=rng)
+                for message, analysis in zip(messages, analyses)]
+
+    def extract_keywords(self, text: str, tokens: List[str] = None,
+                         limit: int = DEFAULT_KEYWORD_LIMIT) -> List[str]:
+        """
+        The message's most distinctive content words, best first.
         
-        return detected_emotions
+        Terms are ranked by TF-IDF against this session's history: a turn
+        counts as a document, so words the user says every turn rank below
+        the new ones. Lemmas are memoized per word, which is cheaper than
+        caching whole texts, so keywords bypass the analysis cache.
+        """
+        history = self.conversation_history
+        return self.keyword_extractor.rank(self._extract_keywords(text, tokens), history.keyword_counts,
+                                           history.total_turns, limit)
+
+    def _extract_keywords(self, text: str, tokens: List[str] = None) -> List[str]:
+        """Lemmatized content words of text, in order."""
+        try:
+            return self.keyword_extractor.terms(text, tokens)
+        except LookupError:
+            # WordNet data went missing; the rule-based lemmas still work
+            return get_keyword_extractor().terms(text, tokens)
+
+    @property
+    def keyword_extractor(self) -> KeywordExtractor:
+        # WordNet lemmas when nltk is set up, suffix rules otherwise
+        return get_keyword_extractor(wordnet=self.nlp_enabled and self.lemmatizer is not None)
+
+    def match_intent(self, text: str):
+        """Find the winning intent for text (cached): the patterns', else the classifier's when confident."""
+        return self.cache.get_or_compute(self.cache_namespace, self._intent_kind, text,
+                                         lambda: self._classify_intent(text))
+
+    def _classify_intent(self, text: str):
+        match = self.matcher.match(text)
+        if match is None and self.intent_classifier is not None:
+            return self._predicted_match(text, self.intent_classifier.predict(text))
+        return match
+
+    def _predicted_match(self, text: str, prediction: Tuple[str, float]):
+        """The model's intent for a message no pattern matched, if it is confident and needs no groups."""
+        intent, confidence = prediction
+        if confidence < self.intent_threshold or intent == GENERAL_INTENT or intent in CAPTURING_INTENTS:
+            return None
+        return IntentMatch(intent, 0, (text,))
+
+    def detect_intent(self, text: str) -> str:
+        """Detect user intent from input text."""
+        match = self.match_intent(text)
+        return match.intent if match else GENERAL_INTENT
+
+    def detect_emotions(self, text: str) -> List[str]:
+        """Detect emotions in text, strongest first."""
+        return [emotion for emotion, _ in self.rank_emotions(text)]
+
+    def rank_emotions(self, text: str) -> List[Tuple[str, int]]:
+        """Detected emotions with how many of their words or phrases appear, strongest first."""
+        ranked = self.cache.get_or_compute(self.cache_namespace, 'emotions', text,
+                                           lambda: tuple(self.emotion_matcher.rank(text)))
+        return list(ranked)
 
     def extract_name(self, text: str) -> str:
         """Extract user's name from their input."""
-        pattern = re.search(r'\b(my name is|i\'m|call me|i am)\s+(\w+)', text, re.IGNORECASE)
-        if pattern:
-            return pattern.group(2).capitalize()
-        return None
+        return self.analyze(text).name
 
     def format_response(self, response: str, sentiment: str = 'neutral') -> str:
         """Format response with user's name and sentiment awareness."""
         name_part = f" {self.user_name}" if self.user_name else ""
         return response.format(name=name_part, user_name=self.user_name)
 
-    def get_response(self, user_input: str) -> str:
+    def track_mood(self, analysis: MessageAnalysis):
+        """Record the sentiment of a message in the mood history."""
+        sentiment, sentiment_score = analysis.sentiment
+        self.mood.add(sentiment_score, sentiment)
+
+    @property
+    def mood_history(self) -> List[Dict[str, Any]]:
+        """Retained mood samples as timestamp/sentiment/score dicts."""
+        return list(self.mood.entries())
+
+    def get_response(self, user_input: str, analysis: MessageAnalysis = None,
+                     rng: random.Random = None) -> str:
         """Generate an intelligent response using NLP analysis."""
-        user_input = user_input.strip()
-        
-        # Analyze sentiment
-        sentiment, sentiment_score = self.analyze_sentiment(user_input)
+        if analysis is None:
+            analysis = self.analyze(user_input)
+        rng = rng or self.rng
         
         # Track mood
-        self.mood_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'sentiment': sentiment,
-            'score': sentiment_score
-        })
+        self.track_mood(analysis)
+        sentiment = analysis.sentiment[0]
         
         # Extract name if provided
         if not self.user_name:
-            name = self.extract_name(user_input)
+            name = analysis.name
             if name:
                 self.user_name = name
+                if self.transcript:
+                    self.transcript.log_meta(user_name=name)
                 response = f"Nice to meet you, {name}! I'll remember that."
                 return response
         
-        # Detect intent
-        intent = self.detect_intent(user_input)
-        
-        # Detect emotions
-        emotions = self.detect_emotions(user_input)
+        intent = analysis.intent
         
         # Generate response based on intent and sentiment
         if intent == 'greeting' and 'greetings' in self.responses:
             responses = self.responses['greetings'].get(sentiment, self.responses['greetings']['neutral'])
-            response = random.choice(responses)
+            response = rng.choice(responses)
         elif intent == 'how_are_you' and 'how_are_you' in self.responses:
             responses = self.responses['how_are_you'].get(sentiment, self.responses['how_are_you']['neutral'])
-            response = random.choice(responses)
+            response = rng.choice(responses)
         elif intent == 'compliment':
-            response = random.choice(self.responses['compliments'])
+            response = rng.choice(self.responses['compliments'])
         elif intent == 'question':
-            response = random.choice(self.responses['questions'])
-        elif emotions:
+            response = rng.choice(self.responses['questions'])
+        elif analysis.emotions:
             # Respond to detected emotions
-            emotion = emotions[0]  # Use the first detected emotion
+            emotion = analysis.emotions[0]  # Use the strongest detected emotion
             if emotion in self.responses['emotions']:
-                response = random.choice(self.responses['emotions'][emotion])
+                response = rng.choice(self.responses['emotions'][emotion])
             else:
-                response = random.choice(self.responses['default'])
+                response = rng.choice(self.responses['default'])
         elif intent == 'goodbye':
-            response = random.choice(self.responses['goodbye'])
+            response = rng.choice(self.responses['goodbye'])
         else:
-            response = random.choice(self.responses['default'])
+            response = rng.choice(self.responses['default'])
         
         return self.format_response(response, sentiment)
 
-    def add_to_history(self, user_input: str, bot_response: str, sentiment: str, keywords: List[str]):
+    def add_to_history(self, user_input: str, bot_response: str, sentiment: str = None,
+                       keywords: List[str] = None, analysis: MessageAnalysis = None):
         """Add interaction to conversation history with NLP analysis."""
+        if analysis is None:
+            analysis = self.analyze(user_input)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.conversation_history.append({
+        entry = {
             'timestamp': timestamp,
             'user': user_input,
             'bot': bot_response,
-            'sentiment': sentiment,
-            'keywords': keywords,
-            'intent': self.detect_intent(user_input)
-        })
+            'sentiment': sentiment if sentiment is not None else analysis.sentiment[0],
+            'keywords': keywords if keywords is not None else analysis.keywords,
+            'intent': analysis.intent
+        }
+        self.conversation_history.append(entry)
+        if self.transcript:
+            self.transcript.log_turn(entry)
 
-    def get_mood_analysis(self) -> Dict[str, Any]:
-        """Get analysis of user's mood throughout the conversation."""
-        if not self.mood_history:
-            return {'average_sentiment': 'neutral', 'mood_trend': 'stable'}
-        
-        sentiments = [entry['score'] for entry in self.mood_history]
-        avg_sentiment = sum(sentiments) / len(sentiments)
-        
-        if avg_sentiment >= 0.1:
-            avg_mood = 'positive'
-        elif avg_sentiment <= -0.1:
-            avg_mood = 'negative'
-        else:
-            avg_mood = 'neutral'
-        
-        # Simple trend analysis
-        if len(sentiments) >= 3:
-            recent_trend = sum(sentiments[-3:]) / 3
-            earlier_trend = sum(sentiments[:-3]) / max(1, len(sentiments) - 3)
-            
-            if recent_trend > earlier_trend + 0.1:
-                trend = 'improving'
-            elif recent_trend < earlier_trend - 0.1:
-                trend = 'declining'
-            else:
-                trend = 'stable'
-        else:
-            trend = 'insufficient_data'
-        
+    def respond(self, user_input: str) -> str:
+        """Handle one chat turn (analysis, response, history) without any terminal I/O."""
+        analysis = self.analyze(user_input)
+        response = self.get_response(user_input, analysis)
+        self.add_to_history(user_input, response, analysis=analysis)
+        return response
+
+    def export_state(self) -> SessionState:
+        """Copy the per-user data into a compact SessionState."""
+        self.load_history()
+        state = SessionState('nlp', self.session_start.timestamp())
+        state.user_name = self.user_name
+        state.user_info = dict(self.user_info) or None
+        if self.conversation_history:
+            state.history = [
+                (datetime.strptime(entry['timestamp'], "%Y-%m-%d %H:%M:%S").timestamp(),
+                 entry['user'], entry['bot'], SENTIMENT_CODES.get(entry['sentiment'], 0),
+                 tuple(entry['keywords']), entry['intent'])
+                for entry in self.conversation_history
+            ]
+        if self.mood:
+            state.mood_times = array('d', self.mood.times)
+            state.mood_scores = array('d', self.mood.scores)
+            state.mood_codes = array('b', self.mood.codes)
+        state.aggregates = dict(self.conversation_history.get_aggregates(), **self.mood.get_state())
+        return state
+
+    def load_state(self, state: SessionState):
+        """Restore per-user data from a SessionState."""
+        self.session_start = datetime.fromtimestamp(state.session_start)
+        self.user_name = state.user_name
+        self.user_info = dict(state.user_info or {})
+        self.conversation_history = ConversationHistory(
+            self.history_limit, (self._history_entry(turn) for turn in state.history or ()))
+        aggregates = state.aggregates or {}
+        self.conversation_history.restore_aggregates(aggregates)
+        self.mood = MoodTracker.from_arrays(state.mood_times, state.mood_scores, state.mood_codes,
+                                            aggregates, self.history_limit)
+        self._older_history = None
+
+    @staticmethod
+    def _history_entry(turn) -> Dict[str, Any]:
+        timestamp, user, bot, code, keywords, intent = turn
         return {
-            'average_sentiment': avg_mood,
-            'mood_trend': trend,
-            'sentiment_score': avg_sentiment
+            'timestamp': datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            'user': user,
+            'bot': bot,
+            'sentiment': SENTIMENT_LABELS[code],
+            'keywords': list(keywords),
+            'intent': intent
         }
 
+    def snapshot(self) -> bytes:
+        """The session's user data, history, mood samples and totals in the binary snapshot format."""
+        return encode_state(self.export_state())
+
+    def restore(self, data, tail: int = DEFAULT_RESTORE_TAIL):
+        """
+        Resume a session from snapshot() bytes (or a read_snapshot() mapping).
+
+        Mood samples and session totals are restored in full, but only the
+        last tail turns of history are decoded now; older ones are decoded
+        the first time something needs them (saving, export). tail=None
+        decodes everything at once.
+        """
+        snapshot = SessionSnapshot(data)
+        if snapshot.bot_type != 'nlp':
+            raise SnapshotError(f"snapshot is of a {snapshot.bot_type!r} session, not 'nlp'")
+        self.load_state(snapshot.to_state(tail))
+        older = snapshot.older_turns(tail)
+        if older:
+            self._older_history = (snapshot, older)
+
+    def load_history(self):
+        """Decode the turns restore() left in the snapshot, as many as the history limit has room for."""
+        if self._older_history is None:
+            return
+        snapshot, older = self._older_history
+        self._older_history = None
+        room = self.history_limit - len(self.conversation_history)
+        if room > 0:
+            turns = snapshot.history(max(0, older - room), older)
+            self.conversation_history.prepend(self._history_entry(turn) for turn in turns)
+
+    def get_mood_analysis(self) -> Dict[str, Any]:
+        """Get analysis of user's mood throughout the conversation."""
+        return self.mood.get_analysis()
+
+    def get_mood_trend(self, minutes: float = 10) -> Dict[str, Any]:
+        """Get the mood trend over the last few minutes compared with the rest of the session."""
+        return self.mood.get_trend(minutes)
+
     def get_stats(self) -> Dict[str, Any]:
         """Get comprehensive conversation statistics."""
         duration = datetime.now() - self.session_start
         mood_analysis = self.get_mood_analysis()
         
-        return {
+        stats = {
             'session_duration': str(duration).split('.')[0],
-            'messages_exchanged': len(self.conversation_history),
+            'messages_exchanged': self.conversation_history.total_turns,
             'user_name': self.user_name or "Unknown",
             'nlp_enabled': self.nlp_enabled,
             'average_mood': mood_analysis['average_sentiment'],
             'mood_trend': mood_analysis['mood_trend'],
-            'total_keywords': len(set([kw for entry in self.conversation_history for kw in entry.get('keywords', [])]))
+            'total_keywords': self.conversation_history.distinct_keywords,
+            'cache': self.cache.get_stats()
         }
+        if self.instrumentation:
+            stats['stages'] = self.instrumentation.summary(self.instrumentation_label)
+        return stats
 
-    def save_conversation(self, filename: str = None):
-        """Save detailed conversation with NLP analysis."""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"/Users/pratyushpandey/python-chatbot/nlp_conversation_{timestamp}.json"
-        
-        conversation_data = {
+    def start_transcript(self, directory: str = None, session_id: str = None) -> str:
+        """Stream this session to an append-only JSONL transcript; returns its path."""
+        if not session_id:
+            session_id = f"nlp_conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        logger = get_transcript_logger(directory)
+        self.transcript = logger.open_session(session_id, start_time=self.session_start.isoformat(),
+                                              user_name=self.user_name, nlp_enabled=self.nlp_enabled,
+                                              bot='nlp')
+        return self.transcript.path
+
+    def end_transcript(self) -> str:
+        """Write the closing stats line and release the transcript; returns its path."""
+        if not self.transcript:
+            return None
+        path = self.transcript.close(stats=self.get_stats(), mood_analysis=self.get_mood_analysis())
+        self.transcript = None
+        return path
+
+    def conversation_document(self) -> Dict[str, Any]:
+        """The session_info/conversation/stats document that save_conversation writes."""
+        self.load_history()
+        return {
             'session_info': {
                 'start_time': self.session_start.isoformat(),
                 'end_time': datetime.now().isoformat(),
                 'user_name': self.user_name,
-                'nlp_enabled': self.nlp_enabled
+                'nlp_enabled': self.nlp_enabled,
+                'bot': 'nlp'
             },
-            'conversation': self.conversation_history,
+            'conversation': self.conversation_history.to_list(),
             'mood_analysis': self.get_mood_analysis(),
             'stats': self.get_stats()
         }
+
+    def archive_conversation(self, archive: ConversationArchive = None, session_id: str = None) -> str:
+        """Append the conversation to the compressed archive (CHATBOT_ARCHIVE_DIR by default); returns its ID."""
+        session_id = session_id or new_session_id('nlp_conversation')
+        # An empty archive is falsy (it has a length), so test for None explicitly
+        (archive if archive is not None else get_archive()).append(session_id, self.conversation_document())
+        return session_id
+
+    def save_conversation(self, filename: str = None):
+        """Save detailed conversation with NLP analysis."""
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            os.makedirs(DEFAULT_LOG_DIR, exist_ok=True)
+            filename = os.path.join(DEFAULT_LOG_DIR, f"nlp_conversation_{timestamp}.json")
+        
+        conversation_data = self.conversation_document()
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
@@ -383,7 +773,7 @@ class NLPChatBot:
 
     def chat(self):
         """Main chat loop with NLP features."""
-        nlp_status = "✅ Enabled" if self.nlp_enabled else "❌ Disabled (install nltk/textblob)"
+        nlp_status = "✅ Enabled" if self.nlp_enabled else "❌ Disabled (install nltk; using built-in sentiment)"
         
         print(f"🤖 {self.name}: Hello! I'm an advanced NLP-powered chatbot.")
         print(f"   🧠 Natural Language Processing: {nlp_status}")
@@ -391,6 +781,13 @@ class NLPChatBot:
         print("   Commands: 'quit', 'bye', 'stats', 'mood' for mood analysis")
         print("=" * 80)
         
+        # Stream the conversation to disk as it happens
+        self.start_transcript()
+        
+        # Load NLP components while the user types their first message
+        if self.lazy:
+            self.warm_up()
+        
         while True:
             try:
                 user_input = input("👤 You: ").strip()
@@ -409,6 +806,11 @@ class NLPChatBot:
                     print(f"   Average Mood: {stats['average_mood']}")
                     print(f"   Mood Trend: {stats['mood_trend']}")
                     print(f"   Unique Keywords: {stats['total_keywords']}")
+                    print(f"   Analysis Cache: {stats['cache']['hit_rate']:.0%} hit rate "
+                          f"({stats['cache']['entries']} entries, {stats['cache']['evictions']} evictions)")
+                    if 'stages' in stats:
+                        print("⏱️  Stage Latency:")
+                        print("\n".join(format_stage_table(stats['stages'])))
                     continue
                 
                 if user_input.lower() == 'mood':
@@ -418,16 +820,20 @@ class NLPChatBot:
                     print(f"   Mood Trend: {mood_analysis['mood_trend']}")
                     if 'sentiment_score' in mood_analysis:
                         print(f"   Sentiment Score: {mood_analysis['sentiment_score']:.3f}")
+                        print(f"   Recent Mood (smoothed): {mood_analysis['ewma_sentiment']} "
+                              f"({mood_analysis['ewma_score']:.3f})")
+                    recent = self.get_mood_trend(10)
+                    if recent['samples']:
+                        print(f"   Last 10 Minutes: {recent['mood_trend']} over {recent['samples']} messages")
                     continue
                 
                 # Check for exit commands
                 if re.search(r'\b(quit|exit|bye|goodbye)\b', user_input, re.IGNORECASE):
-                    sentiment, _ = self.analyze_sentiment(user_input)
                     response = self.get_response(user_input)
                     print(f"🤖 {self.name}: {response}")
                     
-                    # Save conversation
-                    filename = self.save_conversation()
+                    # Close the streamed transcript
+                    filename = self.end_transcript()
                     if filename:
                         print(f"💾 Conversation with NLP analysis saved to: {filename}")
                     
@@ -435,10 +841,10 @@ class NLPChatBot:
                     print(f"📊 Final Stats: {stats['messages_exchanged']} messages, {stats['average_mood']} mood")
                     break
                 
-                # Analyze input and generate response
-                sentiment, _ = self.analyze_sentiment(user_input)
-                keywords = self.extract_keywords(user_input)
-                response = self.get_response(user_input)
+                # Analyze input once and generate response
+                analysis = self.analyze(user_input)
+                response = self.get_response(user_input, analysis)
+                sentiment = analysis.sentiment[0]
                 
                 # Display sentiment indicator if NLP is enabled
                 if self.nlp_enabled:
@@ -448,11 +854,11 @@ class NLPChatBot:
                     print(f"🤖 {self.name}: {response}")
                 
                 # Add to conversation history
-                self.add_to_history(user_input, response, sentiment, keywords)
+                self.add_to_history(user_input, response, analysis=analysis)
                 
             except KeyboardInterrupt:
                 print(f"\n🤖 {self.name}: Goodbye! Thanks for the enlightening conversation!")
-                filename = self.save_conversation()
+                filename = self.end_transcript()
                 if filename:
                     print(f"💾 Conversation saved to: {filename}")
                 break
@@ -461,13 +867,14 @@ class NLPChatBot:
 
 def main():
     """Main function to run the NLP chatbot."""
-    if not NLTK_AVAILABLE and not TEXTBLOB_AVAILABLE:
-        print("⚠️  Warning: Neither NLTK nor TextBlob is installed.")
-        print("   The chatbot will run in basic mode without NLP features.")
-        print("   Install with: pip install nltk textblob")
+    if not NLTK_AVAILABLE:
+        print("⚠️  Warning: NLTK is not installed.")
+        print("   The chatbot will use its built-in sentiment lexicon and basic text processing.")
+        print("   Install with: pip install nltk")
         print()
     
-    chatbot = NLPChatBot()
+    # The interactive script may fetch missing NLTK data, as it always has
+    chatbot = NLPChatBot(allow_download=True)
     chatbot.chat()
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+NLP Pool
+The process-wide NLTK components shared by every NLPChatBot session.
+
+VADER parses its lexicon when constructed, WordNet loads its corpus on the
+first lemma and punkt unpickles its model on the first tokenization, so each
+is built (and warmed) once per process under a lock and then used read-only
+by every session on every thread. Creating a session only looks the pool up.
+"""
+
+import importlib.util
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Check for nltk without importing it; it is only imported when the pool loads
+NLTK_AVAILABLE = importlib.util.find_spec('nltk') is not None
+
+# NLTK data packages the bot needs, with the paths nltk.data.find expects
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'vader_lexicon': 'vader_lexicon/vader_lexicon'
+}
+
+# Where a successful resource probe is remembered between processes
+PROBE_CACHE_PATH = os.path.join(
+    os.environ.get('CHATBOT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'python-chatbot')),
+    'nltk_resources.json'
+)
+
+# Load the components on first use instead of when the first session is created
+LAZY_LOAD = os.environ.get('CHATBOT_LAZY_NLP') == '1'
+# Downloads are opt-in so production never hits the network
+ALLOW_DOWNLOAD = os.environ.get('CHATBOT_NLTK_DOWNLOAD') == '1'
+
+
+def _probe_cache_key() -> str:
+    """Identify the nltk install and data search path a probe result applies to."""
+    spec = importlib.util.find_spec('nltk')
+    origin = spec.origin if spec else ''
+    mtime = os.path.getmtime(origin) if origin and os.path.exists(origin) else 0
+    return f"{origin}:{mtime}:{os.environ.get('NLTK_DATA', '')}"
+
+
+def probe_nltk_resources(allow_download: bool = False, cache_path: str = PROBE_CACHE_PATH) -> bool:
+    """
+    Check that the NLTK data packages are installed.
+
+    A successful probe is cached on disk, so later processes skip importing
+    nltk just to look for its data. Missing packages are only downloaded when
+    allow_download is set; otherwise the probe fails and NLP stays disabled.
+    """
+    if not NLTK_AVAILABLE:
+        return False
+
+    key = _probe_cache_key()
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('key') == key:
+                return True
+    except (OSError, ValueError):
+        pass
+
+    import nltk
+    for data, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if not allow_download:
+                return False
+            print(f"Downloading NLTK data: {data}")
+            if not nltk.download(data, quiet=True):
+                return False
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'resources': sorted(NLTK_RESOURCES)}, f)
+    except OSError:
+        pass
+    return True
+
+
+class NLPPool:
+    """
+    Lazily built NLTK components: a WordNet lemmatizer, a VADER analyzer and the stopword set.
+
+    The resource probe runs once (again only if a later caller allows
+    downloads the first one did not), and the components are built once.
+    Both are safe to request from any number of threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._available: Optional[bool] = None
+        self._downloads_tried = False
+        self._components: Optional[Dict[str, Any]] = None
+        self.load_seconds = 0.0
+
+    def available(self, allow_download: bool = False) -> bool:
+        """Whether nltk and its data are installed and the components can be (or were) built."""
+        if self._available is None or (allow_download and not self._available and not self._downloads_tried):
+            with self._lock:
+                if self._available is None or (allow_download and not self._available
+                                               and not self._downloads_tried):
+                    self._available = probe_nltk_resources(allow_download)
+                    self._downloads_tried = self._downloads_tried or allow_download
+        return self._available
+
+    @property
+    def loaded(self) -> bool:
+        return self._components is not None
+
+    def components(self) -> Dict[str, Any]:
+        """The shared components, built on first call; empty when nltk cannot be used."""
+        if self._components is None:
+            if not self.available():
+                return {}
+            with self._lock:
+                if self._components is None:
+                    self._components = self._build()
+        return self._components
+
+    def _build(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            from nltk.tokenize import word_tokenize
+            lemmatizer = WordNetLemmatizer()
+            # Corpus readers and punkt load on first use, which is not thread-safe;
+            # touch them here, under the lock, so sessions only ever read them
+            lemmatizer.lemmatize('warming')
+            word_tokenize('warm up')
+            components = {
+                'lemmatizer': lemmatizer,
+                'sentiment_analyzer': SentimentIntensityAnalyzer(),
+                'stop_words': frozenset(stopwords.words('english'))
+            }
+        except Exception as e:
+            print(f"Warning: NLTK setup failed: {e}")
+            self._available = False
+            self._downloads_tried = True
+            components = {}
+        self.load_seconds = time.perf_counter() - start
+        return components
+
+    @property
+    def lemmatizer(self):
+        return self.components().get('lemmatizer')
+
+    @property
+    def sentiment_analyzer(self):
+        return self.components().get('sentiment_analyzer')
+
+    @property
+    def stop_words(self):
+        return self.components().get('stop_words')
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Build the components ahead of the first message.
+
+        With background=True the work runs on a daemon thread, which is
+        returned; sessions that need the components meanwhile wait for it.
+        """
+        if not background:
+            self.components()
+            return None
+        thread = threading.Thread(target=self.components, name='nlp-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {'available': bool(self._available), 'loaded': self.loaded,
+                'load_seconds': round(self.load_seconds, 3)}
+
+
+_pool: Optional[NLPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_nlp_pool() -> NLPPool:
+    """The process-wide pool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = NLPPool()
+    return _pool
+
+
+def warm_up(background: bool = True, allow_download: bool = ALLOW_DOWNLOAD) -> Optional[threading.Thread]:
+    """Probe for nltk and build the shared components, e.g. when a server starts."""
+    pool = get_nlp_pool()
+    if not pool.available(allow_download):
+        return None
+    return pool.warm_up(background)
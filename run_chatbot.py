@@ -4,8 +4,27 @@ Chatbot Launcher
 Easy way to run different versions of the chatbot.
 """
 
+import argparse
+import importlib
+import json
 import sys
 import os
+from collections import OrderedDict
+
+# Bots the headless mode can run, as (module, class); imported on demand
+HEADLESS_BOTS = {
+    'simple': ('simple_chatbot', 'SimpleChatBot'),
+    'enhanced': ('enhanced_chatbot', 'EnhancedChatBot'),
+    'nlp': ('nlp_chatbot', 'NLPChatBot')
+}
+
+MESSAGE_FIELDS = ('message', 'text', 'user')
+SESSION_FIELDS = ('session', 'session_id', 'conversation', 'conversation_id')
+
+# Bytes read from stdin at a time; answers are written and flushed once per chunk, not per line
+READ_CHUNK = 64 * 1024
+# Sessions with a bot of their own; past this the least recently used one is dropped
+MAX_HEADLESS_SESSIONS = int(os.environ.get('CHATBOT_HEADLESS_SESSIONS', '10000'))
 
 def print_menu():
     """Display the chatbot selection menu."""
@@ -29,7 +48,7 @@ def print_menu():
     print("   - Emotion detection")
     print("   - Intent recognition")
     print("   - Advanced NLP features")
-    print("   - Requires: nltk, textblob")
+    print("   - Uses nltk when installed")
     print()
     print("0. Exit")
     print("=" * 40)
@@ -63,7 +82,7 @@ def run_chatbot(choice):
             except ImportError as e:
                 print(f"❌ Error importing {filename}: {e}")
                 if choice == '3':
-                    print("💡 Tip: Install NLP dependencies with: pip install nltk textblob")
+                    print("💡 Tip: Install NLP dependencies with: pip install nltk")
             except Exception as e:
                 print(f"❌ Error running {filename}: {e}")
         else:
@@ -71,8 +90,132 @@ def run_chatbot(choice):
     else:
         print("❌ Invalid choice!")
 
-def main():
-    """Main launcher function."""
+def _parse_line(line: str, input_format: str):
+    """
+    (message, session, error) of an input line.
+
+    JSONL input may mix JSON objects and plain-text lines; text input takes
+    every line as a message, even one that looks like JSON.
+    """
+    if input_format == 'jsonl' and line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return line, None, None
+        if isinstance(record, dict):
+            message = next((record[field] for field in MESSAGE_FIELDS if field in record), None)
+            session = next((record[field] for field in SESSION_FIELDS if field in record), None)
+            if session is not None and (isinstance(session, bool) or not isinstance(session, (str, int))):
+                return None, None, "session must be a string or an integer"
+            if not isinstance(message, str):
+                return None, session, "no message field"
+            return message, session, None
+    return line, None, None
+
+
+def run_headless(bot_type: str, infile=None, outfile=None, output_format: str = 'jsonl',
+                 seed: int = None, input_format: str = 'jsonl',
+                 max_sessions: int = MAX_HEADLESS_SESSIONS) -> int:
+    """
+    Answer messages from infile line by line, without prompts or banners.
+
+    In jsonl input each line may also be a JSON object with a "message" and
+    an optional "session" (a string or integer), which gets a bot of its
+    own; only the max_sessions most recently used sessions keep theirs, so
+    a session idle for longer starts over. Each answer is one JSON object
+    per line in jsonl output and one line in text output; a line that
+    cannot be answered gets an "error" instead. Answers are written in one
+    block per chunk of input, so a pipe gets large writes while a process
+    talking to us line by line still gets each reply as soon as it is ready.
+    Returns the number of messages answered.
+    """
+    infile = infile if infile is not None else sys.stdin.buffer
+    outfile = outfile if outfile is not None else sys.stdout.buffer
+    module, class_name = HEADLESS_BOTS[bot_type]
+    bot_class = getattr(importlib.import_module(module), class_name)
+    bots = OrderedDict()
+    turns = {}
+    read = getattr(infile, 'read1', infile.read)
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    answered = 0
+    pending = b''
+
+    try:
+        while True:
+            chunk = read(READ_CHUNK)
+            if chunk:
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+            else:
+                lines = [pending]
+            output = []
+            for raw in lines:
+                line = raw.decode('utf-8', 'replace').strip()
+                if not line:
+                    continue
+                message, session, error = _parse_line(line, input_format)
+                response = None
+                if error is None:
+                    try:
+                        bot = bots.get(session)
+                        if bot is None:
+                            if len(bots) >= max_sessions:
+                                evicted, _ = bots.popitem(last=False)
+                                turns.pop(evicted, None)
+                            bot = bots[session] = bot_class(seed=seed)
+                        else:
+                            bots.move_to_end(session)
+                        response = bot.respond(message)
+                        answered += 1
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+
+                if output_format == 'text':
+                    if error:
+                        print(f"❌ {error}", file=sys.stderr)
+                    output.append((response or '').replace('\n', ' '))
+                    continue
+                result = {'response': response}
+                if session is not None:
+                    result['session'] = session
+                if error:
+                    result['error'] = error
+                if message is not None:
+                    result['turn'] = turns.get(session, 0)
+                    turns[session] = result['turn'] + 1
+                output.append(dumps(result))
+            if output:
+                output.append('')
+                outfile.write('\n'.join(output).encode('utf-8'))
+                outfile.flush()
+            if not chunk:
+                return answered
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly
+        sys.stdout = None
+        return answered
+
+
+def main(argv=None):
+    """Main launcher function: the interactive menu, or headless mode with --stdin."""
+    parser = argparse.ArgumentParser(description="Run one of the chatbots interactively or in a pipeline.")
+    parser.add_argument('--bot', choices=sorted(HEADLESS_BOTS), help="bot to run (skips the menu)")
+    parser.add_argument('--stdin', action='store_true',
+                        help="headless: read messages line by line from stdin, answers to stdout")
+    parser.add_argument('--format', choices=('jsonl', 'text'), default='jsonl',
+                        help="headless output: one JSON object or one plain response per line (default: jsonl)")
+    parser.add_argument('--input', choices=('jsonl', 'text'), default='jsonl',
+                        help="headless input: JSON objects or plain lines, or plain lines only (default: jsonl)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for response selection")
+    args = parser.parse_args(argv)
+
+    if args.stdin:
+        run_headless(args.bot or 'simple', output_format=args.format, seed=args.seed, input_format=args.input)
+        return
+    if args.bot:
+        run_chatbot({'simple': '1', 'enhanced': '2', 'nlp': '3'}[args.bot])
+        return
+
     try:
         while True:
             print_menu()
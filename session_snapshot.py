@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Session Snapshot
+A compact, versioned binary encoding of a SessionState that restores the recent turns first.
+
+Layout (little-endian):
+
+    header   magic b'CBSN' | version u8 | flags u8 | reserved u16 | session_start f64 | turns u32 | meta length u32
+    meta     compact JSON: bot type, user name and info, running aggregates, intent names
+    mood     samples u32 | times f64[] | scores f64[] | codes i8[]
+    turns    per turn: timestamp f64 | sentiment i8 | intent u16 | lengths u32 x3 | user | bot | keywords
+    offsets  u64 per turn plus the end of the last one
+    trailer  offsets position u64 | magic b'CBSE'
+
+The offsets table lets a reader decode just the last few turns, so a
+returning user's session is usable after reading the header, the meta block
+and a handful of records; older turns are decoded only when asked for.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+from session_store import SessionState
+
+FORMAT_VERSION = 1
+# Turns decoded by a restore before any older history is asked for
+DEFAULT_RESTORE_TAIL = 50
+
+_MAGIC = b'CBSN'
+_END_MAGIC = b'CBSE'
+_HEADER = struct.Struct('<4sBBHdII')
+_TRAILER = struct.Struct('<Q4s')
+_TURN = struct.Struct('<dbHIII')
+_COUNT = struct.Struct('<I')
+
+# Flags
+_ANALYZED = 1  # turns carry sentiment, keywords and intent (NLP bot)
+
+_NO_INTENT = 0xFFFF
+_SWAP = sys.byteorder != 'little'
+
+
+class SnapshotError(ValueError):
+    """The data is not a session snapshot, is truncated, or uses an unsupported version."""
+
+
+def _array_bytes(typecode: str, values) -> bytes:
+    column = array(typecode, values or ())
+    if _SWAP:
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_array(typecode: str, data, start: int, count: int) -> Tuple[array, int]:
+    column = array(typecode)
+    end = start + count * column.itemsize
+    column.frombytes(data[start:end])
+    if _SWAP:
+        column.byteswap()
+    return column, end
+
+
+def encode_state(state: SessionState) -> bytes:
+    """Serialize a SessionState (as returned by a bot's export_state) to snapshot bytes."""
+    history = state.history or ()
+    analyzed = bool(history) and len(history[0]) == 6
+    intents: Dict[str, int] = {}
+    meta = {
+        'bot': state.bot_type,
+        'user_name': state.user_name,
+        'user_info': state.user_info,
+        'aggregates': state.aggregates,
+        'intents': None
+    }
+
+    parts = []
+    offsets = array('Q')
+    position = 0
+    for turn in history:
+        if analyzed:
+            timestamp, user, bot, code, keywords, intent = turn
+            intent_code = intents.setdefault(intent, len(intents)) if intent is not None else _NO_INTENT
+            keyword_bytes = ' '.join(keywords).encode('utf-8')
+        else:
+            timestamp, user, bot = turn
+            code, intent_code, keyword_bytes = 0, _NO_INTENT, b''
+        user_bytes, bot_bytes = user.encode('utf-8'), bot.encode('utf-8')
+        offsets.append(position)
+        record = _TURN.pack(timestamp, code, intent_code, len(user_bytes), len(bot_bytes), len(keyword_bytes))
+        parts += (record, user_bytes, bot_bytes, keyword_bytes)
+        position += len(record) + len(user_bytes) + len(bot_bytes) + len(keyword_bytes)
+    offsets.append(position)
+    if len(intents) >= _NO_INTENT:
+        raise SnapshotError("too many distinct intents for a snapshot")
+    meta['intents'] = list(intents) or None
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    samples = len(state.mood_scores or ())
+    mood = b''.join((_COUNT.pack(samples), _array_bytes('d', state.mood_times),
+                     _array_bytes('d', state.mood_scores), _array_bytes('b', state.mood_codes)))
+    header = _HEADER.pack(_MAGIC, FORMAT_VERSION, _ANALYZED if analyzed else 0, 0,
+                          state.session_start, len(history), len(meta_bytes))
+
+    turns_start = len(header) + len(meta_bytes) + len(mood)
+    # Offsets are stored relative to the start of the snapshot
+    offsets = array('Q', (offset + turns_start for offset in offsets))
+    offsets_position = turns_start + position
+    return b''.join((header, meta_bytes, mood, *parts, _array_bytes('Q', offsets),
+                     _TRAILER.pack(offsets_position, _END_MAGIC)))
+
+
+class SessionSnapshot:
+    """
+    A parsed snapshot over bytes, a memoryview or an mmap.
+
+    Only the header, meta block and offsets are decoded up front; turns are
+    decoded on request. The snapshot keeps a reference to data, so an mmap
+    must stay open for as long as older turns may still be loaded.
+    """
+
+    def __init__(self, data):
+        if len(data) < _HEADER.size + _TRAILER.size:
+            raise SnapshotError("snapshot is truncated")
+        magic, version, flags, _, session_start, turns, meta_length = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise SnapshotError("not a session snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"unsupported snapshot version {version}")
+        offsets_position, end_magic = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+        if end_magic != _END_MAGIC or offsets_position + (turns + 1) * 8 + _TRAILER.size != len(data):
+            raise SnapshotError("snapshot is truncated")
+
+        self.data = data
+        self.session_start = session_start
+        self.analyzed = bool(flags & _ANALYZED)
+        self.turns = turns
+        position = _HEADER.size + meta_length
+        meta = json.loads(bytes(data[_HEADER.size:position]))
+        self.bot_type: str = meta['bot']
+        self.user_name = meta.get('user_name')
+        self.user_info = meta.get('user_info')
+        self.aggregates = meta.get('aggregates')
+        self._intents: List[str] = meta.get('intents') or []
+
+        samples, = _COUNT.unpack_from(data, position)
+        position += _COUNT.size
+        self.mood_times, position = _read_array('d', data, position, samples)
+        self.mood_scores, position = _read_array('d', data, position, samples)
+        self.mood_codes, position = _read_array('b', data, position, samples)
+        self._offsets, _ = _read_array('Q', data, offsets_position, turns + 1)
+
+    def history(self, start: int = 0, stop: int = None) -> List[Tuple]:
+        """Turns start..stop (oldest first) as SessionState history tuples."""
+        data, offsets, intents = self.data, self._offsets, self._intents
+        unpack = _TURN.unpack_from
+        size = _TURN.size
+        stop = self.turns if stop is None else min(stop, self.turns)
+        turns = []
+        for index in range(max(start, 0), stop):
+            position = offsets[index]
+            timestamp, code, intent_code, user_length, bot_length, keyword_length = unpack(data, position)
+            position += size
+            user = str(data[position:position + user_length], 'utf-8')
+            position += user_length
+            bot = str(data[position:position + bot_length], 'utf-8')
+            if self.analyzed:
+                position += bot_length
+                keywords = str(data[position:position + keyword_length], 'utf-8')
+                intent = intents[intent_code] if intent_code != _NO_INTENT else None
+                turns.append((timestamp, user, bot, code, tuple(keywords.split()), intent))
+            else:
+                turns.append((timestamp, user, bot))
+        return turns
+
+    def to_state(self, tail: int = None) -> SessionState:
+        """A SessionState holding everything but the history older than the last tail turns."""
+        state = SessionState(self.bot_type, self.session_start)
+        state.user_name = self.user_name
+        state.user_info = self.user_info
+        state.aggregates = self.aggregates
+        if self.mood_scores:
+            state.mood_times, state.mood_scores, state.mood_codes = self.mood_times, self.mood_scores, self.mood_codes
+        start = self.turns - tail if tail is not None else 0
+        state.history = self.history(start) or None
+        return state
+
+    def older_turns(self, tail: int) -> int:
+        """How many turns to_state(tail) leaves out."""
+        return max(0, self.turns - tail) if tail is not None else 0
+
+
+def decode_state(data) -> SessionState:
+    """The full SessionState stored in snapshot bytes."""
+    return SessionSnapshot(data).to_state()
+
+
+def write_snapshot(path: str, data: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def read_snapshot(path: str):
+    """Map a snapshot file into memory, so restoring it only touches the pages it decodes."""
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return f.read()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Session Store
+Compact per-session state with idle eviction and spill-to-disk for many mostly-idle chats.
+
+A session lives in one of three tiers:
+    active   - a full bot instance, ready to answer immediately
+    idle     - only a compact SessionState (bot instance dropped) after idle_seconds
+    spilled  - the SessionState pickled to spill_dir after spill_seconds; nothing in memory
+Any access rehydrates the session back to active.
+"""
+
+import os
+import pickle
+import re
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+_SESSION_ID = re.compile(r'^[0-9a-zA-Z_-]{1,64}$')
+
+
+class SessionLost(Exception):
+    """A session that was created is neither in memory nor spilled, e.g. its process died."""
+
+
+class SessionState:
+    """
+    Everything that belongs to one user's session and nothing that belongs to the bot.
+
+    History turns are plain tuples with float timestamps, mood samples live in
+    typed arrays, and empty containers are stored as None, so an idle session
+    costs a few hundred bytes plus its message text.
+    """
+
+    __slots__ = ('bot_type', 'user_name', 'user_info', 'session_start',
+                 'history', 'mood_times', 'mood_scores', 'mood_codes', 'aggregates')
+
+    def __init__(self, bot_type: str, session_start: float = None):
+        self.bot_type = bot_type
+        self.user_name: Optional[str] = None
+        self.user_info: Optional[Dict[str, Any]] = None
+        self.session_start = session_start if session_start is not None else time.time()
+        # (timestamp, user, bot) or (timestamp, user, bot, sentiment, keywords, intent)
+        self.history: Optional[List[Tuple]] = None
+        self.mood_times: Optional[array] = None
+        self.mood_scores: Optional[array] = None
+        self.mood_codes: Optional[array] = None
+        # Running totals that outlive the retained history (turn counts, keywords, mood sums)
+        self.aggregates: Optional[Dict[str, Any]] = None
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        # States pickled before a slot existed leave it at None
+        for slot in self.__slots__:
+            setattr(self, slot, None)
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+
+class _Entry:
+    __slots__ = ('bot', 'state', 'bot_type', 'last_active')
+
+    def __init__(self, bot_type: str, bot: Any = None, state: SessionState = None):
+        self.bot_type = bot_type
+        self.bot = bot
+        self.state = state
+        self.last_active = time.monotonic()
+
+
+class SessionStore:
+    """
+    Keep chat sessions in the cheapest tier that their activity allows.
+
+    bot_factory builds a fresh bot for a bot type. Bots provide export_state()
+    and load_state(state) so the store can drop and rebuild them at will.
+    Call sweep() periodically (the chat server does) to demote idle sessions.
+    The store is thread-safe; callers serialize turns within one session.
+    """
+
+    def __init__(self, bot_factory: Callable[[str], Any], spill_dir: str = None,
+                 idle_seconds: float = 300, spill_seconds: float = 3600):
+        self.bot_factory = bot_factory
+        self.spill_dir = spill_dir
+        self.idle_seconds = idle_seconds
+        self.spill_seconds = spill_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # least recently used first
+        self._lock = threading.RLock()
+        self._spilling = set()  # sessions whose spill file a sweep is writing
+        self.compactions = 0
+        self.spills = 0
+        self.rehydrations = 0
+        self.spilled_count = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.spilled_count = sum(1 for name in os.listdir(spill_dir) if name.endswith('.session'))
+
+    def _spill_path(self, session_id: str) -> str:
+        if not _SESSION_ID.match(session_id):
+            raise KeyError(session_id)
+        return os.path.join(self.spill_dir, f"{session_id}.session")
+
+    def create(self, session_id: str, bot_type: str, bot: Any = None) -> Any:
+        """Register a new active session, building its bot unless one is given."""
+        if bot is None:
+            bot = self.bot_factory(bot_type)
+        with self._lock:
+            self._entries[session_id] = _Entry(bot_type, bot=bot)
+        return bot
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self._entries:
+                return True
+        if not self.spill_dir:
+            return False
+        try:
+            return os.path.exists(self._spill_path(session_id))
+        except KeyError:
+            return False
+
+    def get_bot(self, session_id: str) -> Any:
+        """Return the session's bot, rehydrating it from memory or disk if needed."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._load_spilled(session_id)
+            self._entries.move_to_end(session_id)
+            entry.last_active = time.monotonic()
+            if entry.bot is None:
+                bot = self.bot_factory(entry.bot_type)
+                bot.load_state(entry.state)
+                entry.bot, entry.state = bot, None
+                self.rehydrations += 1
+            return entry.bot
+
+    def is_active(self, session_id: str) -> bool:
+        """Whether the session currently has a live bot instance."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            return entry is not None and entry.bot is not None
+
+    def bot_type(self, session_id: str) -> str:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._load_spilled(session_id)
+            return entry.bot_type
+
+    def _load_spilled(self, session_id: str) -> _Entry:
+        if not self.spill_dir:
+            raise KeyError(session_id)
+        path = self._spill_path(session_id)
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(session_id)
+        os.remove(path)
+        self.spilled_count -= 1
+        entry = _Entry(state.bot_type, state=state)
+        self._entries[session_id] = entry
+        return entry
+
+    def delete(self, session_id: str):
+        """Forget a session in every tier."""
+        with self._lock:
+            found = self._entries.pop(session_id, None) is not None
+            # A file a sweep is still writing was never counted as spilled
+            counted = session_id not in self._spilling
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(session_id))
+                if counted:
+                    with self._lock:
+                        self.spilled_count -= 1
+                found = True
+            except (FileNotFoundError, KeyError):
+                pass
+        if not found:
+            raise KeyError(session_id)
+
+    def sweep(self, now: float = None, busy: Iterable[str] = ()) -> Tuple[int, int]:
+        """
+        Demote idle sessions; returns (compacted, spilled) counts.
+        
+        Sessions listed in busy (e.g. mid-turn) are left alone this round.
+        Spilled states are pickled and written without holding the lock, so
+        turns of other sessions are not held up by the disk; a session used
+        while its file is written stays in memory and the file is removed.
+        """
+        now = now if now is not None else time.monotonic()
+        busy = set(busy)
+        compacted = 0
+        pending = []
+        with self._lock:
+            # Entries are ordered by last access, so stop at the first recent one
+            for session_id, entry in self._entries.items():
+                idle = now - entry.last_active
+                if idle < self.idle_seconds:
+                    break
+                if session_id in busy or session_id in self._spilling:
+                    continue
+                if entry.bot is not None:
+                    entry.state = entry.bot.export_state()
+                    entry.bot = None
+                    compacted += 1
+                if self.spill_dir and idle >= self.spill_seconds:
+                    self._spilling.add(session_id)
+                    pending.append((session_id, entry, entry.last_active))
+            self.compactions += compacted
+
+        spilled = 0
+        for session_id, entry, last_active in pending:
+            path = self._spill_path(session_id)
+            try:
+                with open(path, 'wb') as f:
+                    pickle.dump(entry.state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                with self._lock:
+                    if (self._entries.get(session_id) is entry and entry.bot is None
+                            and entry.last_active == last_active):
+                        del self._entries[session_id]
+                        spilled += 1
+                        self.spills += 1
+                        self.spilled_count += 1
+                        continue
+                # Rehydrated or deleted while the file was written: memory wins
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            finally:
+                with self._lock:
+                    self._spilling.discard(session_id)
+        return compacted, spilled
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tier session counts and lifetime eviction counters."""
+        with self._lock:
+            active = sum(1 for entry in self._entries.values() if entry.bot is not None)
+            idle = len(self._entries) - active
+        return {
+            'active_sessions': active,
+            'idle_sessions': idle,
+            'spilled_sessions': self.spilled_count,
+            'compactions': self.compactions,
+            'spills': self.spills,
+            'rehydrations': self.rehydrations
+        }
+
+
+def measure_session_memory(bot_factory: Callable[[str], Any], bot_type: str,
+                           turns: int = 10, sessions: int = 200) -> Dict[str, float]:
+    """
+    Measure bytes per session for active bots and for compact idle states.
+
+    Each session exchanges `turns` messages first. Shared, process-wide
+    structures (compiled patterns, caches) are created before measuring so
+    only per-session memory is counted.
+    """
+    messages = ["Hi, my name is Sam", "How are you?", "I'm feeling a bit worried about work",
+                "What's the weather like?", "Do you remember what I said earlier?"]
+    warm = bot_factory(bot_type)
+    for message in messages:
+        warm.respond(message)
+    warm.load_state(warm.export_state())
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    bots = [bot_factory(bot_type) for _ in range(sessions)]
+    for bot in bots:
+        for i in range(turns):
+            bot.respond(messages[i % len(messages)])
+    active = tracemalloc.take_snapshot()
+    states = [bot.export_state() for bot in bots]
+    del bots
+    idle = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    def total(snapshot):
+        return sum(stat.size_diff for stat in snapshot.compare_to(baseline, 'filename'))
+
+    return {
+        'bot_type': bot_type,
+        'turns': turns,
+        'active_bytes_per_session': total(active) / sessions,
+        'idle_bytes_per_session': total(idle) / len(states),
+        'spilled_bytes_per_session': sum(len(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+                                         for state in states) / len(states)
+    }
+
+
+def main():
+    """Print the per-session memory figures for each stateful bot."""
+    from enhanced_chatbot import EnhancedChatBot
+    from nlp_chatbot import NLPChatBot
+    classes = {'enhanced': EnhancedChatBot, 'nlp': NLPChatBot}
+
+    print("📏 Per-session memory (10 turns each)")
+    print("=" * 60)
+    for bot_type in classes:
+        figures = measure_session_memory(lambda kind: classes[kind](), bot_type)
+        print(f"{bot_type:>9}: active {figures['active_bytes_per_session'] / 1024:.1f} KiB, "
+              f"idle {figures['idle_bytes_per_session'] / 1024:.1f} KiB, "
+              f"spilled {figures['spilled_bytes_per_session'] / 1024:.1f} KiB on disk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Shard Dispatcher
+Spreads chat sessions over worker processes with sticky, consistent-hash routing.
+
+Each worker process hosts a SessionStore shard of sessions and answers
+their turns. Every request for a session goes to the worker that owns its
+session ID on a consistent hash ring, so history, mood samples and the
+user's name stay in that one process and never cross a pipe.
+
+When a worker dies its ring points are removed (or taken over by a
+restarted worker with the same ID) and only the dead worker's sessions
+move. Those sessions start again from their spilled state when spill_dir
+is set (the directory is shared by all workers), otherwise from an empty
+session. Idempotent requests it had in flight are sent to the new owner;
+turns fail with ShardUnavailable, because the dead worker may already
+have applied them. A session that was never spilled is gone: requests
+for it fail with SessionLost (HTTP 410) instead of quietly answering
+from a fresh session.
+
+    python3 shard_dispatcher.py --shards 4 --port 8765
+
+serves the chat_server HTTP API with turns spread over four processes;
+/health lists the queue depth of every worker.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect
+from concurrent.futures import Future, wait
+from itertools import count
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from chat_server import BOT_CLASSES, ChatServer, HTTPError
+from instrumentation import StageMetrics, get_metrics, instrument
+from nlp_pool import warm_up
+from session_store import SessionLost, SessionStore
+
+# Virtual points per worker on the hash ring; more points even out the shard sizes
+DEFAULT_REPLICAS = 64
+
+# How often a request is re-sent after the worker handling it died
+MAX_ATTEMPTS = 3
+
+# Commands that are safe to run again on another worker; a 'message' turn is not
+RETRIED_COMMANDS = frozenset(('create', 'stats', 'delete'))
+
+
+class ShardUnavailable(Exception):
+    """No live worker could take the request."""
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring from string keys to nodes.
+
+    Each node owns `replicas` points on a 64-bit ring; a key belongs to the
+    first point at or after its hash. Adding or removing a node only moves
+    the keys on that node's arcs.
+    """
+
+    def __init__(self, nodes: Iterable[int] = (), replicas: int = DEFAULT_REPLICAS):
+        self.replicas = replicas
+        self._points = array('Q')
+        self._owners: List[int] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(set(self._owners))
+
+    def __contains__(self, node: int) -> bool:
+        return node in self._owners
+
+    def _rebuild(self, points: List[Tuple[int, int]]):
+        points.sort()
+        self._points = array('Q', (point for point, _ in points))
+        self._owners = [node for _, node in points]
+
+    def add(self, node: int):
+        if node in self._owners:
+            return
+        points = list(zip(self._points, self._owners))
+        points.extend((_hash(f"shard-{node}#{replica}"), node) for replica in range(self.replicas))
+        self._rebuild(points)
+
+    def remove(self, node: int):
+        self._rebuild([(point, owner) for point, owner in zip(self._points, self._owners) if owner != node])
+
+    def lookup(self, key: str) -> Optional[int]:
+        """The node that owns key, or None when the ring is empty."""
+        if not self._owners:
+            return None
+        return self._owners[bisect(self._points, _hash(key)) % len(self._owners)]
+
+
+class _ShardHost:
+    """The sessions of one worker process and the commands it answers."""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.instrument = options.get('instrument', False)
+        self.store = SessionStore(self._build_bot, options.get('spill_dir'),
+                                  options.get('idle_seconds', 300), options.get('spill_seconds', 3600))
+        # The spill directory is shared, so its file count says nothing about this shard;
+        # the dispatcher counts the directory itself
+        self.store.spilled_count = 0
+        self.turns = 0
+        self.lost = 0
+
+    def _build_bot(self, bot_type: str):
+        bot = BOT_CLASSES[bot_type]()
+        return instrument(bot) if self.instrument else bot
+
+    def _bot(self, session_id: str, bot_type: str):
+        try:
+            return self.store.get_bot(session_id)
+        except KeyError:
+            # Hosted by a worker that died before the session was spilled
+            self.lost += 1
+            raise SessionLost(session_id)
+
+    def create(self, session_id: str, bot_type: str) -> bool:
+        self.store.create(session_id, bot_type)
+        return True
+
+    def message(self, session_id: str, bot_type: str, message: str) -> str:
+        response = self._bot(session_id, bot_type).respond(message)
+        self.turns += 1
+        return response
+
+    def stats(self, session_id: str, bot_type: str) -> Dict[str, Any]:
+        bot = self._bot(session_id, bot_type)
+        return bot.get_stats() if hasattr(bot, 'get_stats') else {'bot': bot_type}
+
+    def delete(self, session_id: str) -> bool:
+        try:
+            self.store.delete(session_id)
+        except KeyError:
+            pass  # lost with a dead worker; it is gone either way
+        return True
+
+    def health(self) -> Dict[str, Any]:
+        return {'pid': os.getpid(), 'turns': self.turns, 'lost_sessions': self.lost,
+                **self.store.get_stats()}
+
+    def metrics(self) -> Dict[str, Any]:
+        return get_metrics().to_json()
+
+
+def _worker_main(conn, options: Dict[str, Any]):
+    """Answer requests from the dispatcher until told to stop or the pipe closes."""
+    # Ctrl-C goes to the whole process group; the dispatcher decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm_up()
+    host = _ShardHost(options)
+    sweep_interval = options.get('sweep_interval', 30)
+    next_sweep = time.monotonic() + sweep_interval
+    while True:
+        if conn.poll(max(0.0, next_sweep - time.monotonic())):
+            try:
+                request_id, command, args = conn.recv()
+            except (EOFError, OSError):
+                break
+            if command == 'stop':
+                break
+            try:
+                reply = (request_id, True, getattr(host, command)(*args))
+            except Exception as e:
+                reply = (request_id, False, e)
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                break
+            except Exception as e:
+                # The result or exception could not be pickled
+                conn.send((request_id, False, RuntimeError(f"{type(e).__name__}: {e}")))
+        if time.monotonic() >= next_sweep:
+            host.store.sweep()
+            next_sweep = time.monotonic() + sweep_interval
+
+
+class _Worker:
+    """The dispatcher's end of one worker process: its pipe, reader thread and pending requests."""
+
+    def __init__(self, dispatcher: 'ShardDispatcher', shard: int, generation: int):
+        self.dispatcher = dispatcher
+        self.shard = shard
+        self.generation = generation
+        self.conn, child = dispatcher.context.Pipe()
+        self.process = dispatcher.context.Process(
+            target=_worker_main, args=(child, dispatcher.options),
+            name=f"chat-shard-{shard}", daemon=True)
+        self.process.start()
+        child.close()
+        self.alive = True
+        # request_id -> (command, args, future, attempts)
+        self.pending: Dict[int, Tuple[str, tuple, Future, int]] = {}
+        self.requests = 0
+        self._ids = count()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, name=f"chat-shard-{shard}-reader", daemon=True)
+        self._reader.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests sent to this worker and not answered yet."""
+        return len(self.pending)
+
+    def send(self, command: str, args: tuple, future: Future, attempts: int) -> bool:
+        """Queue a request; False if the worker is dead and the request must go elsewhere."""
+        with self._lock:
+            if not self.alive:
+                return False
+            request_id = next(self._ids)
+            self.pending[request_id] = (command, args, future, attempts)
+            try:
+                self.conn.send((request_id, command, args))
+            except (EOFError, OSError, ValueError):
+                del self.pending[request_id]
+                return False
+            self.requests += 1
+            return True
+
+    def _read_replies(self):
+        while True:
+            try:
+                request_id, ok, value = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                entry = self.pending.pop(request_id, None)
+            if entry is None or entry[2].done():
+                continue
+            if ok:
+                entry[2].set_result(value)
+            else:
+                entry[2].set_exception(value)
+        self.dispatcher._worker_lost(self)
+
+    def detach(self) -> List[Tuple[str, tuple, Future, int]]:
+        """Mark the worker dead and hand back the requests it never answered."""
+        with self._lock:
+            self.alive = False
+            pending = list(self.pending.values())
+            self.pending.clear()
+        return pending
+
+    def stop(self, timeout: float):
+        with self._lock:
+            self.alive = False
+            try:
+                self.conn.send((None, 'stop', ()))
+            except (EOFError, OSError, ValueError):
+                pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class ShardDispatcher:
+    """
+    Route session requests to worker processes by consistent hashing on session ID.
+
+    All methods return concurrent.futures.Future objects, so the dispatcher
+    can be driven from threads or, through asyncio.wrap_future, from an
+    event loop. Requests for one worker are answered in the order they were
+    sent, so turns within a session keep their order.
+
+    Dead workers are replaced when restart is set (the replacement takes
+    over the same ring points, so no other session moves) and otherwise
+    dropped from the ring, spreading their sessions over the survivors.
+    """
+
+    def __init__(self, shards: int = None, spill_dir: str = None, idle_seconds: float = 300,
+                 spill_seconds: float = 3600, sweep_interval: float = 30, instrument: bool = False,
+                 replicas: int = DEFAULT_REPLICAS, restart: bool = True):
+        self.shards = shards or os.cpu_count() or 1
+        self.options = {
+            'spill_dir': spill_dir,
+            'idle_seconds': idle_seconds,
+            'spill_seconds': spill_seconds,
+            'sweep_interval': sweep_interval,
+            'instrument': instrument
+        }
+        self.restart = restart
+        # Workers are spawned, not forked: the dispatcher runs reader threads
+        self.context = multiprocessing.get_context('spawn')
+        self.ring = HashRing(replicas=replicas)
+        self.workers: Dict[int, _Worker] = {}
+        self.sessions: Dict[str, str] = {}  # session_id -> bot type
+        self.restarts = 0
+        self.closing = False
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Start the worker processes."""
+        with self._lock:
+            for shard in range(self.shards):
+                self._spawn(shard)
+
+    def _spawn(self, shard: int, generation: int = 0):
+        self.workers[shard] = _Worker(self, shard, generation)
+        self.ring.add(shard)
+
+    def close(self, timeout: float = 5.0):
+        """Stop every worker; requests still pending fail with ShardUnavailable."""
+        with self._lock:
+            self.closing = True
+            workers = list(self.workers.values())
+            self.workers.clear()
+            self.ring = HashRing(replicas=self.ring.replicas)
+        for worker in workers:
+            worker.stop(timeout)
+            for _, _, future, _ in worker.detach():
+                if not future.done():
+                    future.set_exception(ShardUnavailable("Dispatcher closed"))
+
+    def _worker_lost(self, worker: _Worker):
+        """Take a dead worker off the ring, restart it if asked and re-send what it owed."""
+        with self._lock:
+            if self.workers.get(worker.shard) is not worker:
+                return  # already handled, or shutting down
+            del self.workers[worker.shard]
+            self.ring.remove(worker.shard)
+            if self.restart and not self.closing:
+                self._spawn(worker.shard, worker.generation + 1)
+                self.restarts += 1
+        for command, args, future, attempts in worker.detach():
+            if command in RETRIED_COMMANDS:
+                self._dispatch(command, args, future, attempts + 1)
+            elif not future.done():
+                future.set_exception(ShardUnavailable(
+                    f"Shard {worker.shard} died during the request; session {args[0]} may have been reset"))
+
+    def _dispatch(self, command: str, args: tuple, future: Future, attempts: int = 0):
+        while not future.done():
+            if attempts >= MAX_ATTEMPTS:
+                future.set_exception(ShardUnavailable(f"Request failed on {attempts} workers"))
+                return
+            with self._lock:
+                shard = self.ring.lookup(args[0])
+                worker = self.workers.get(shard) if shard is not None else None
+            if worker is None:
+                future.set_exception(ShardUnavailable("No live workers"))
+                return
+            if worker.send(command, args, future, attempts):
+                return
+            # The worker died between lookup and send
+            self._worker_lost(worker)
+            attempts += 1
+
+    def submit(self, session_id: str, command: str, *args) -> Future:
+        """Send command to the worker that owns session_id."""
+        future = Future()
+        self._dispatch(command, (session_id,) + args, future)
+        return future
+
+    def owner(self, session_id: str) -> Optional[int]:
+        """The shard that currently owns session_id."""
+        with self._lock:
+            return self.ring.lookup(session_id)
+
+    # Session operations
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def create(self, bot_type: str, session_id: str = None) -> Tuple[str, Future]:
+        """Register a new session; returns its ID and a future that completes once its worker has it."""
+        if bot_type not in BOT_CLASSES:
+            raise ValueError(f"Unknown bot type: {bot_type!r}")
+        session_id = session_id or uuid.uuid4().hex
+        self.sessions[session_id] = bot_type
+        return session_id, self.submit(session_id, 'create', bot_type)
+
+    def respond(self, session_id: str, message: str) -> Future:
+        """
+        The bot's answer to message, as a future.
+
+        It fails with SessionLost when the session died with its worker
+        before it was spilled; the session is then unknown from here on.
+        """
+        return self.submit(session_id, 'message', self.sessions[session_id], message)
+
+    def stats(self, session_id: str) -> Future:
+        return self.submit(session_id, 'stats', self.sessions[session_id])
+
+    def delete(self, session_id: str) -> Future:
+        del self.sessions[session_id]
+        return self.submit(session_id, 'delete')
+
+    # Worker-level views
+
+    def spilled_count(self) -> int:
+        """Sessions currently spilled to the shared spill directory."""
+        spill_dir = self.options['spill_dir']
+        if not spill_dir or not os.path.isdir(spill_dir):
+            return 0
+        with os.scandir(spill_dir) as entries:
+            return sum(1 for entry in entries if entry.name.endswith('.session'))
+
+    def queue_depths(self) -> Dict[int, int]:
+        """Unanswered requests per shard."""
+        with self._lock:
+            return {shard: worker.queue_depth for shard, worker in sorted(self.workers.items())}
+
+    def broadcast(self, command: str) -> Dict[int, Future]:
+        """Send a session-less command to every live worker."""
+        with self._lock:
+            workers = list(self.workers.values())
+        futures = {}
+        for worker in workers:
+            future = futures[worker.shard] = Future()
+            if not worker.send(command, (), future, 0):
+                future.set_exception(ShardUnavailable(f"Shard {worker.shard} is down"))
+        return futures
+
+    def worker_stats(self, timeout: float = 5.0) -> List[Dict[str, Any]]:
+        """Queue depth, request count and session tiers of every worker."""
+        futures = self.broadcast('health')
+        wait(list(futures.values()), timeout)
+        with self._lock:
+            workers = dict(self.workers)
+        stats = []
+        for shard, future in sorted(futures.items()):
+            worker = workers.get(shard)
+            entry = {
+                'shard': shard,
+                'queue_depth': worker.queue_depth if worker else 0,
+                'requests': worker.requests if worker else 0,
+                'restarts': worker.generation if worker else 0
+            }
+            if future.done() and future.exception() is None:
+                entry.update(future.result())
+            else:
+                entry['status'] = 'unavailable'
+            stats.append(entry)
+        return stats
+
+    def stage_metrics(self, timeout: float = 5.0) -> StageMetrics:
+        """The workers' stage latency histograms merged into one registry."""
+        futures = self.broadcast('metrics')
+        wait(list(futures.values()), timeout)
+        merged = StageMetrics()
+        for future in futures.values():
+            if future.done() and future.exception() is None:
+                merged.merge(future.result())
+        return merged
+
+
+class ShardedChatServer(ChatServer):
+    """
+    The chat server HTTP API in front of a ShardDispatcher.
+
+    The front process only parses HTTP and keeps the session registry; bot
+    turns, session stores, idle sweeps and the NLP components all live in
+    the worker processes, so none of ChatServer's own are built here.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, shards: int = None,
+                 spill_dir: str = None, idle_seconds: float = 300, spill_seconds: float = 3600,
+                 sweep_interval: float = 30, instrument: bool = False, restart: bool = True):
+        self.host = host
+        self.port = port
+        self.instrument = instrument
+        self.locks: Dict[str, list] = {}
+        self.sweep_interval = sweep_interval
+        self.started = time.time()
+        self.turns = 0
+        self._server = None
+        self._sweeper = None
+        self.dispatcher = ShardDispatcher(shards, spill_dir, idle_seconds, spill_seconds,
+                                          sweep_interval, instrument, restart=restart)
+
+    async def start(self):
+        self.dispatcher.start()
+        await self._listen()
+
+    async def close(self):
+        await self._stop_listening()
+        await asyncio.get_running_loop().run_in_executor(None, self.dispatcher.close)
+
+    async def _sweep_periodically(self):
+        """Workers sweep their own stores."""
+
+    async def _call(self, future: Future) -> Any:
+        try:
+            return await asyncio.wrap_future(future)
+        except ShardUnavailable as e:
+            raise HTTPError(500, str(e))
+
+    async def _session_call(self, session_id: str, request: Callable[[str], Future]) -> Any:
+        """Run a request for a known session; a session lost with its worker is forgotten and reported."""
+        try:
+            return await self._call(request(session_id))
+        except KeyError:
+            raise HTTPError(404, f"No such session: {session_id}")
+        except SessionLost:
+            self.dispatcher.sessions.pop(session_id, None)
+            raise HTTPError(410, f"Session {session_id} was lost when its worker died; create a new one")
+
+    async def create_session(self, bot_type: str) -> str:
+        if bot_type not in BOT_CLASSES:
+            raise HTTPError(400, f"Unknown bot type: {bot_type!r}")
+        session_id, created = self.dispatcher.create(bot_type)
+        await self._call(created)
+        return session_id
+
+    def check_session(self, session_id: str):
+        if session_id not in self.dispatcher:
+            raise HTTPError(404, f"No such session: {session_id}")
+
+    async def delete_session(self, session_id: str):
+        try:
+            deleted = self.dispatcher.delete(session_id)
+        except KeyError:
+            raise HTTPError(404, f"No such session: {session_id}")
+        await self._call(deleted)
+
+    async def _run_turn(self, session_id: str, message: str) -> str:
+        return await self._session_call(session_id, lambda session: self.dispatcher.respond(session, message))
+
+    async def session_stats(self, session_id: str) -> Dict[str, Any]:
+        return await self._session_call(session_id, self.dispatcher.stats)
+
+    async def health(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        shards = await loop.run_in_executor(None, self.dispatcher.worker_stats)
+        totals = {key: sum(shard.get(key, 0) for shard in shards)
+                  for key in ('active_sessions', 'idle_sessions', 'compactions', 'spills',
+                              'rehydrations', 'lost_sessions')}
+        totals['spilled_sessions'] = await loop.run_in_executor(None, self.dispatcher.spilled_count)
+        for shard in shards:
+            shard.pop('spilled_sessions', None)
+        return {
+            'status': 'ok' if all('status' not in shard for shard in shards) else 'degraded',
+            'turns': self.turns,
+            'sessions': len(self.dispatcher.sessions),
+            **totals,
+            'restarts': self.dispatcher.restarts,
+            'shards': shards,
+            'uptime_seconds': round(time.time() - self.started, 3)
+        }
+
+    async def collect_metrics(self) -> Tuple[StageMetrics, List[str]]:
+        metrics = await asyncio.get_running_loop().run_in_executor(None, self.dispatcher.stage_metrics)
+        _, lines = await super().collect_metrics()
+        lines += [
+            "# HELP chatbot_shard_queue_depth Requests sent to a worker and not answered yet.",
+            "# TYPE chatbot_shard_queue_depth gauge"
+        ]
+        lines += [f'chatbot_shard_queue_depth{{shard="{shard}"}} {depth}'
+                  for shard, depth in self.dispatcher.queue_depths().items()]
+        lines += [
+            "# HELP chatbot_shard_restarts_total Worker processes restarted after dying.",
+            "# TYPE chatbot_shard_restarts_total counter",
+            f"chatbot_shard_restarts_total {self.dispatcher.restarts}"
+        ]
+        return metrics, lines
+
+
+def main():
+    """Run the sharded chat server until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve chat sessions from several worker processes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--spill-dir', help="directory for sessions evicted to disk, shared by all workers")
+    parser.add_argument('--idle-seconds', type=float, default=300, help="compact sessions idle this long")
+    parser.add_argument('--spill-seconds', type=float, default=3600, help="spill sessions idle this long")
+    parser.add_argument('--no-restart', action='store_true',
+                        help="spread a dead worker's sessions over the others instead of restarting it")
+    parser.add_argument('--instrument', action='store_true', help="record per-stage latency for /metrics")
+    args = parser.parse_args()
+
+    server = ShardedChatServer(args.host, args.port, args.shards, args.spill_dir, args.idle_seconds,
+                               args.spill_seconds, instrument=args.instrument, restart=not args.no_restart)
+
+    async def run():
+        await server.start()
+        print(f"🤖 Sharded chat server listening on http://{server.host}:{server.port} "
+              f"({server.dispatcher.shards} workers)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n👋 Chat server stopped.")
+
+
+if __name__ == "__main__":
+    main()
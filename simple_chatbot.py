@@ -5,76 +5,117 @@ A basic chatbot that responds to user input using pattern matching.
 """
 
 import re
-import random
+
+from bot_definitions import get_definition, session_rng
+from session_store import SessionState
+from instrumentation import instrument, instrumentation_enabled
+
+_UNSET = object()
+
+# Default response templates; "{bot_name}" is filled in with the bot's name
+RESPONSES = {
+    'greetings': [
+        "Hello! How can I help you today?",
+        "Hi there! What's on your mind?",
+        "Hey! Nice to meet you!",
+        "Hello! I'm here to chat with you."
+    ],
+    'how_are_you': [
+        "I'm doing great, thank you for asking!",
+        "I'm fantastic! How are you?",
+        "I'm doing well. How about you?",
+        "All good here! Thanks for asking."
+    ],
+    'name_questions': [
+        "My name is {bot_name}. What's yours?",
+        "I'm {bot_name}! Nice to meet you!",
+        "You can call me {bot_name}. What should I call you?"
+    ],
+    'help': [
+        "I can chat with you about various topics! Try asking me about myself, the weather, or just say hello!",
+        "I'm here to have a conversation with you. Ask me anything!",
+        "I can help with basic conversations. What would you like to talk about?"
+    ],
+    'goodbye': [
+        "Goodbye! It was nice chatting with you!",
+        "See you later! Have a great day!",
+        "Bye! Come back anytime for another chat!",
+        "Farewell! Take care!"
+    ],
+    'weather': [
+        "I don't have access to real weather data, but I hope it's nice where you are!",
+        "I can't check the weather, but I hope you're having a beautiful day!",
+        "Weather-wise, I'm not connected to any weather services, but I hope it's pleasant!"
+    ],
+    'default': [
+        "That's interesting! Tell me more.",
+        "I see. What else would you like to talk about?",
+        "Hmm, I'm not sure how to respond to that. Can you rephrase?",
+        "That's a good point. What do you think about it?",
+        "I'd love to hear more about that!",
+        "Could you elaborate on that?"
+    ]
+}
+
+# Intent patterns in priority order
+PATTERNS = {
+    'greetings': r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b',
+    'how_are_you': r'\b(how are you|how\'re you|how do you feel|what\'s up)\b',
+    'name_questions': r'\b(what\'s your name|your name|who are you|what are you called)\b',
+    'help': r'\b(help|what can you do|commands|assist)\b',
+    'goodbye': r'\b(bye|goodbye|see you|farewell|exit|quit)\b',
+    'weather': r'\b(weather|temperature|sunny|rainy|cloudy|hot|cold)\b'
+}
 
 class SimpleChatBot:
-    def __init__(self):
-        self.name = "ChatBot"
-        self.responses = {
-            'greetings': [
-                "Hello! How can I help you today?",
-                "Hi there! What's on your mind?",
-                "Hey! Nice to meet you!",
-                "Hello! I'm here to chat with you."
-            ],
-            'how_are_you': [
-                "I'm doing great, thank you for asking!",
-                "I'm fantastic! How are you?",
-                "I'm doing well. How about you?",
-                "All good here! Thanks for asking."
-            ],
-            'name_questions': [
-                f"My name is {self.name}. What's yours?",
-                f"I'm {self.name}! Nice to meet you!",
-                f"You can call me {self.name}. What should I call you?"
-            ],
-            'help': [
-                "I can chat with you about various topics! Try asking me about myself, the weather, or just say hello!",
-                "I'm here to have a conversation with you. Ask me anything!",
-                "I can help with basic conversations. What would you like to talk about?"
-            ],
-            'goodbye': [
-                "Goodbye! It was nice chatting with you!",
-                "See you later! Have a great day!",
-                "Bye! Come back anytime for another chat!",
-                "Farewell! Take care!"
-            ],
-            'weather': [
-                "I don't have access to real weather data, but I hope it's nice where you are!",
-                "I can't check the weather, but I hope you're having a beautiful day!",
-                "Weather-wise, I'm not connected to any weather services, but I hope it's pleasant!"
-            ],
-            'default': [
-                "That's interesting! Tell me more.",
-                "I see. What else would you like to talk about?",
-                "Hmm, I'm not sure how to respond to that. Can you rephrase?",
-                "That's a good point. What do you think about it?",
-                "I'd love to hear more about that!",
-                "Could you elaborate on that?"
-            ]
-        }
+    # Methods timed by instrument(), by stage name
+    STAGES = {'match_intent': 'intent', 'get_response': 'response'}
+
+    def __init__(self, seed: int = None):
+        # Tables are built once per process and shared read-only by every instance
+        self.definition = get_definition('simple', "ChatBot", RESPONSES, PATTERNS)
+        self.name = self.definition.name
+        self.responses = self.definition.responses
+        self.patterns = self.definition.patterns
+        self.matcher = self.definition.matcher
+        # Each session draws responses from its own generator
+        self.rng = session_rng(seed)
+        self.instrumentation = None
         
-        # Compile regex patterns for better performance
-        self.patterns = {
-            'greetings': re.compile(r'\b(hello|hi|hey|greetings|good morning|good afternoon|good evening)\b', re.IGNORECASE),
-            'how_are_you': re.compile(r'\b(how are you|how\'re you|how do you feel|what\'s up)\b', re.IGNORECASE),
-            'name_questions': re.compile(r'\b(what\'s your name|your name|who are you|what are you called)\b', re.IGNORECASE),
-            'help': re.compile(r'\b(help|what can you do|commands|assist)\b', re.IGNORECASE),
-            'goodbye': re.compile(r'\b(bye|goodbye|see you|farewell|exit|quit)\b', re.IGNORECASE),
-            'weather': re.compile(r'\b(weather|temperature|sunny|rainy|cloudy|hot|cold)\b', re.IGNORECASE)
-        }
+        if instrumentation_enabled():
+            instrument(self)
 
-    def get_response(self, user_input):
-        """Generate a response based on user input using pattern matching."""
+    def match_intent(self, user_input):
+        """Find the first matching intent in pattern order."""
+        return self.matcher.match(user_input.strip())
+
+    def get_response(self, user_input, match=_UNSET):
+        """
+        Generate a response based on user input using pattern matching.
+        
+        match is the result of match_intent(user_input) when the caller already has it.
+        """
         user_input = user_input.strip()
         
-        # Check each pattern
-        for intent, pattern in self.patterns.items():
-            if pattern.search(user_input):
-                return random.choice(self.responses[intent])
+        # Find the first matching intent in pattern order
+        if match is _UNSET:
+            match = self.match_intent(user_input)
+        if match:
+            return self.rng.choice(self.responses[match.intent])
         
         # Default response if no pattern matches
-        return random.choice(self.responses['default'])
+        return self.rng.choice(self.responses['default'])
+
+    def respond(self, user_input):
+        """Handle one chat turn without any terminal I/O."""
+        return self.get_response(user_input)
+
+    def export_state(self):
+        """The simple bot keeps no per-user data, so its state is empty."""
+        return SessionState('simple')
+
+    def load_state(self, state):
+        """Nothing to restore for the stateless simple bot."""
 
     def chat(self):
         """Main chat loop."""
@@ -90,7 +131,7 @@ class SimpleChatBot:
                 
                 # Check for exit commands
                 if re.search(r'\b(quit|exit|bye|goodbye)\b', user_input, re.IGNORECASE):
-                    print(f"🤖 {self.name}: {random.choice(self.responses['goodbye'])}")
+                    print(f"🤖 {self.name}: {self.rng.choice(self.responses['goodbye'])}")
                     break
                 
                 # Get and display response
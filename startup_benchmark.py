@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures NLPChatBot cold start: module import time and time to the first response.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so every sample is a true cold start
+PROBE_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+import nlp_chatbot
+imported = time.perf_counter()
+bot = nlp_chatbot.NLPChatBot(lazy={lazy})
+created = time.perf_counter()
+bot.get_response("Hello there, how are you?")
+responded = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (created - imported) * 1000,
+    'first_response_ms': (responded - created) * 1000,
+    'time_to_first_response_ms': (responded - start) * 1000,
+    'nlp_enabled': bot.nlp_enabled
+}}))
+'''
+
+def run_sample(lazy: bool) -> dict:
+    """Start one interpreter, import the bot and answer one message."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.pop('CHATBOT_NLTK_DOWNLOAD', None)
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE_SCRIPT.format(lazy=lazy)],
+        cwd=here, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize(samples: list) -> dict:
+    """Median of each timing across samples."""
+    keys = [key for key in samples[0] if key.endswith('_ms')]
+    summary = {key: round(statistics.median(s[key] for s in samples), 2) for key in keys}
+    summary['nlp_enabled'] = samples[0]['nlp_enabled']
+    return summary
+
+def main():
+    """Run the benchmark for eager and lazy initialization and print a report."""
+    parser = argparse.ArgumentParser(description="Measure NLPChatBot import time and time-to-first-response.")
+    parser.add_argument('--runs', type=int, default=5, help="cold starts per mode (default: 5)")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, lazy in (('eager', False), ('lazy', True)):
+        results[mode] = summarize([run_sample(lazy) for _ in range(args.runs)])
+
+    print(f"⏱️  NLPChatBot startup (median of {args.runs} cold starts)")
+    print("=" * 60)
+    for mode, summary in results.items():
+        print(f"{mode:>6}: import {summary['import_ms']:.1f} ms, "
+              f"init {summary['init_ms']:.1f} ms, "
+              f"first response {summary['first_response_ms']:.1f} ms, "
+              f"total {summary['time_to_first_response_ms']:.1f} ms "
+              f"(NLP {'on' if summary['nlp_enabled'] else 'off'})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
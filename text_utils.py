@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Text Utilities
+Dependency-free tokenization and stopwords shared by the chatbot's text-processing modules.
+"""
+
+import re
+from typing import List
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# A compact English stopword list (close to NLTK's), so nothing here needs nltk
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are aren't as at be because been
+before being below between both but by can can't cannot could couldn't did didn't do
+does doesn't doing don't down during each few for from further had hadn't has hasn't
+have haven't having he he'd he'll he's her here here's hers herself him himself his how
+how's i i'd i'll i'm i've if in into is isn't it it's its itself let's me more most
+mustn't my myself no nor not of off on once only or other ought our ours ourselves out
+over own same shan't she she'd she'll she's should shouldn't so some such than that
+that's the their theirs them themselves then there there's these they they'd they'll
+they're they've this those through to too under until up very was wasn't we we'd we'll
+we're we've were weren't what what's when when's where where's which while who who's
+whom why why's with won't would wouldn't you you'd you'll you're you've your yours
+yourself yourselves just also really yeah ok okay oh
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into word tokens (keeping contractions whole)."""
+    return _TOKEN.findall(text.lower())
+
+
+def content_words(text: str) -> List[str]:
+    """Tokens of text with stopwords removed."""
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Transcript Log
+Append-only JSONL conversation transcripts written by a background thread.
+
+Each session gets one file of compact JSON lines:
+    {"type": "session", "start_time": ..., "bot": ...}     first line
+    {"type": "turn", "timestamp": ..., "user": ..., ...}   one per exchange
+    {"type": "meta", "user_name": ...}                     when session details change
+    {"type": "end", "end_time": ..., "stats": {...}}       when the session closes cleanly
+load_transcript() rebuilds the session_info/conversation/stats document that
+save_conversation writes, even for sessions that never reached their end line.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_LOG_DIR = os.environ.get('CHATBOT_LOG_DIR', os.path.join(os.getcwd(), 'conversations'))
+
+_CLOSE = object()
+_STOP = object()
+
+
+class TranscriptLogger:
+    """
+    Write transcript lines for any number of sessions from one background thread.
+
+    Callers only enqueue lines, so logging never blocks a response on disk
+    I/O. The writer batches whatever is queued, flushes files every
+    flush_interval seconds and fsyncs them every fsync_interval seconds (None
+    disables fsync). At most max_open_files handles are kept open.
+    """
+
+    def __init__(self, directory: str = DEFAULT_LOG_DIR, flush_interval: float = 1.0,
+                 fsync_interval: Optional[float] = 5.0, max_open_files: int = 256):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_open_files = max_open_files
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._files: "OrderedDict[str, Any]" = OrderedDict()
+        self._dirty = set()
+        self._unsynced = set()
+        self.lines_written = 0
+        self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+        self._thread.start()
+
+    def path_for(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def open_session(self, session_id: str, **details) -> 'SessionTranscript':
+        """Start a transcript, writing its session header line."""
+        transcript = SessionTranscript(self, self.path_for(session_id))
+        transcript.log({'type': 'session', 'start_time': datetime.now().isoformat(), **details})
+        return transcript
+
+    def write(self, path: str, record: Dict[str, Any]):
+        """Queue one record; the line is encoded here so the writer only does I/O."""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self._queue.put((path, line))
+
+    def close_file(self, path: str):
+        self._queue.put((path, _CLOSE))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far is written and flushed."""
+        done = threading.Event()
+        self._queue.put((None, done))
+        return done.wait(timeout)
+
+    def close(self):
+        """Write everything still queued, sync and close all files, and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put((None, _STOP))
+            self._thread.join()
+
+    # Writer thread
+
+    def _handle(self, path: str):
+        handle = self._files.get(path)
+        if handle is None:
+            handle = open(path, 'a', encoding='utf-8')
+            self._files[path] = handle
+            while len(self._files) > self.max_open_files:
+                _, oldest = self._files.popitem(last=False)
+                self._finish(oldest)
+        else:
+            self._files.move_to_end(path)
+        return handle
+
+    def _finish(self, handle):
+        handle.flush()
+        if self.fsync_interval is not None:
+            os.fsync(handle.fileno())
+        handle.close()
+        self._dirty.discard(handle)
+        self._unsynced.discard(handle)
+
+    def _flush_dirty(self, sync: bool):
+        for handle in self._dirty:
+            handle.flush()
+        self._unsynced |= self._dirty
+        self._dirty.clear()
+        if sync:
+            for handle in self._unsynced:
+                os.fsync(handle.fileno())
+            self._unsynced.clear()
+
+    def _run(self):
+        last_flush = last_sync = time.monotonic()
+        running = True
+        while running:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                items = []
+            # Drain whatever else is already queued into the same batch
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            barriers = []
+            for path, payload in items:
+                if payload is _STOP:
+                    running = False
+                elif isinstance(payload, threading.Event):
+                    barriers.append(payload)
+                elif payload is _CLOSE:
+                    handle = self._files.pop(path, None)
+                    if handle is not None:
+                        self._finish(handle)
+                else:
+                    handle = self._handle(path)
+                    handle.write(payload)
+                    self._dirty.add(handle)
+                    self.lines_written += 1
+
+            now = time.monotonic()
+            if barriers or not running or now - last_flush >= self.flush_interval:
+                sync = self.fsync_interval is not None and (
+                    not running or now - last_sync >= self.fsync_interval)
+                self._flush_dirty(sync)
+                last_flush = now
+                if sync:
+                    last_sync = now
+            for barrier in barriers:
+                barrier.set()
+
+        for handle in list(self._files.values()):
+            self._finish(handle)
+        self._files.clear()
+
+
+class SessionTranscript:
+    """Handle for one session's transcript file."""
+
+    def __init__(self, logger: TranscriptLogger, path: str):
+        self.logger = logger
+        self.path = path
+        self.closed = False
+
+    def log(self, record: Dict[str, Any]):
+        if not self.closed:
+            self.logger.write(self.path, record)
+
+    def log_turn(self, entry: Dict[str, Any]):
+        self.log({'type': 'turn', **entry})
+
+    def log_meta(self, **details):
+        self.log({'type': 'meta', **details})
+
+    def close(self, **summary) -> str:
+        """Write the end line (end_time plus any summary) and release the file."""
+        if not self.closed:
+            self.log({'type': 'end', 'end_time': datetime.now().isoformat(), **summary})
+            self.logger.close_file(self.path)
+            self.closed = True
+        return self.path
+
+
+_shared_loggers: Dict[str, TranscriptLogger] = {}
+_shared_loggers_lock = threading.Lock()
+
+
+def get_transcript_logger(directory: str = None) -> TranscriptLogger:
+    """Get the process-wide logger for a directory (CHATBOT_LOG_DIR by default)."""
+    directory = os.path.abspath(directory or DEFAULT_LOG_DIR)
+    with _shared_loggers_lock:
+        logger = _shared_loggers.get(directory)
+        if logger is None:
+            logger = _shared_loggers[directory] = TranscriptLogger(directory)
+            # Don't lose queued lines when the interpreter exits
+            atexit.register(logger.close)
+        return logger
+
+
+def read_transcript(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a transcript, skipping a torn final line from a crash."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_transcript(path: str) -> Dict[str, Any]:
+    """Rebuild the save_conversation document from a transcript file."""
+    session_info: Dict[str, Any] = {'start_time': None, 'end_time': None, 'user_name': None}
+    conversation = []
+    end: Dict[str, Any] = {}
+    for record in read_transcript(path):
+        kind = record.pop('type', None)
+        if kind == 'session':
+            session_info.update(record)
+        elif kind == 'meta':
+            session_info.update(record)
+        elif kind == 'turn':
+            conversation.append(record)
+        elif kind == 'end':
+            end = record
+
+    if end.get('end_time'):
+        session_info['end_time'] = end['end_time']
+    elif conversation:
+        # Unclosed session: the last turn is the best end time we have
+        session_info['end_time'] = datetime.strptime(
+            conversation[-1]['timestamp'], "%Y-%m-%d %H:%M:%S").isoformat()
+
+    stats = end.get('stats')
+    if stats is None:
+        duration = ''
+        if session_info['start_time'] and session_info['end_time']:
+            elapsed = (datetime.fromisoformat(session_info['end_time'])
+                       - datetime.fromisoformat(session_info['start_time']))
+            duration = str(elapsed).split('.')[0]
+        stats = {
+            'session_duration': duration,
+            'messages_exchanged': len(conversation),
+            'user_name': session_info.get('user_name') or "Unknown"
+        }
+
+    document = {'session_info': session_info, 'conversation': conversation}
+    if 'mood_analysis' in end:
+        document['mood_analysis'] = end['mood_analysis']
+    document['stats'] = stats
+    return document